@@ -0,0 +1,227 @@
+"""
+翻译流程的压力测试 (bench-translate)：在本地模拟服务器 (mock_llm_server.py) 上并发运行
+真实的 `translate_file`，离线测量吞吐量与重试行为。
+
+以 data/ 中的原文为素材生成 `--tables` 张待翻译的表 (每张 `--items` 条，清空目标语言的
+译文)，由 `--concurrency` 个线程同时翻译，每个线程使用自己的客户端：
+    anthropic  Anthropic SDK (SDK 自带 429/529 重试)
+    claude / openai / gemini  LLMAPIClient 的对应格式
+
+结束后逐条核对译文：缺失或与原文错位都算失败，返回非 0。`--save-baseline` 把耗时写入
+benchmarks/baseline.json，之后超过基线 `--max-regression` 倍时同样返回非 0。
+
+用法：
+    python benchmarks/bench_translate.py --api openai --concurrency 8 --latency lognormal:0.2,0.5
+    python benchmarks/bench_translate.py --rate-limit 0.1 --overloaded 0.05 --truncate 0.1 --mismatch 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from generate import scale_text  # noqa: E402
+from mock_llm_server import MockLLMServer, add_config_arguments, config_from_args, mock_translation  # noqa: E402
+from src.model.localization import I18nLanguage, TranslatedItem, dump_items, load_items  # noqa: E402
+
+BASELINE_FILE = ROOT / "benchmarks" / "baseline.json"
+
+apis = ["anthropic", "claude", "openai", "gemini"]
+
+
+def make_tables(work: Path, tables: int, items: int, locales: List[str]) -> List[Path]:
+    """从 data/ 取原文生成待翻译的表，原文不够时按 generate.scale_text 追加后缀"""
+    raws = sorted({item.raw for file in sorted((ROOT / "data").glob("*.json")) for item in load_items(file)})
+    files = []
+    for t in range(tables):
+        table_items = []
+        for i in range(items):
+            index = t * items + i
+            raw = scale_text(raws[index % len(raws)], index // len(raws))
+            table_items.append(TranslatedItem.empty(raw, locales))
+        table_items.sort(key=lambda item: item.raw)
+        file = work / f"BenchTable{t:03d}.json"
+        dump_items(table_items, file)
+        files.append(file)
+    return files
+
+
+def make_client(api: str, url: str, max_retries: int):
+    if api == "anthropic":
+        from src.translate.claude import setup_client
+        return setup_client("mock-key", url, max_retries=max_retries)
+
+    from src.translate.api import APIConfig, APIProvider, LLMAPIClient
+    base_url = {"claude": url, "openai": f"{url}/v1", "gemini": f"{url}/v1beta"}[api]
+    return LLMAPIClient(APIConfig(
+        provider=APIProvider(api),
+        api_key="mock-key",
+        base_url=base_url,
+        model=f"mock-{api}",
+        max_tokens=4000,
+        timeout=60,
+        max_retries=max_retries,
+    ))
+
+
+def check_tables(files: List[Path], locales: List[str]) -> dict:
+    """统计译文：正确、缺失、与原文不符 (错位)"""
+    multi = len(locales) > 1
+    result = {"ok": 0, "missing": 0, "wrong": 0}
+    for file in files:
+        for item in load_items(file):
+            for locale in locales:
+                if not item.has_text(locale):
+                    result["missing"] += 1
+                elif item.get_text(locale) == mock_translation(item.raw, locale if multi else None):
+                    result["ok"] += 1
+                else:
+                    result["wrong"] += 1
+    return result
+
+
+def run(args: argparse.Namespace) -> dict:
+    from src.translate import translate_file
+    from src.translate.telemetry import Telemetry, summarize
+
+    languages = [I18nLanguage(locale) for locale in args.locales.split(",") if locale]
+    locales = [language.value for language in languages]
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        server = MockLLMServer(config_from_args(args)).start()
+        url = server.url
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-translate-") as work:
+            files = make_tables(Path(work), args.tables, args.items, locales)
+            telemetries = []
+            clients = []
+            errors = []
+
+            def worker(file: Path) -> None:
+                client = make_client(args.api, url, args.max_retries)
+                telemetry = Telemetry()
+                clients.append(client)
+                telemetries.append(telemetry)
+                try:
+                    translate_file(client, file, languages if len(languages) > 1 else languages[0], telemetry=telemetry)
+                except Exception as e:
+                    errors.append(f"{file.stem}: {type(e).__name__}: {e}")
+
+            output = sys.stdout if args.verbose else open(os.devnull, "w")
+            try:
+                with redirect_stdout(output):
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                        list(pool.map(worker, files))
+                    seconds = time.perf_counter() - started
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+
+            checked = check_tables(files, locales)
+    finally:
+        if server is not None:
+            server_stats = server.stats()
+            server.stop()
+        else:
+            import requests
+            server_stats = requests.get(f"{url}/stats", timeout=10).json()
+
+    # Anthropic SDK 的重试在 SDK 内部进行，无法统计
+    retries = [getattr(client, "retries", None) for client in clients]
+    events = [event for telemetry in telemetries for event in telemetry.events]
+    summary = summarize([dict(event, table="bench") for event in events])
+    row = summary[0] if summary else {}
+    return {
+        "seconds": seconds,
+        "items": args.tables * args.items * len(locales),
+        "translated": checked["ok"],
+        "missing": checked["missing"],
+        "wrong": checked["wrong"],
+        "chunks": len(events),
+        "requests": server_stats["requests"],
+        "status": server_stats["by_status"],
+        "http_retries": None if None in retries else sum(retries),
+        "requeued": row.get("retries", 0),
+        "truncated": row.get("truncated", 0),
+        "validation_failures": row.get("validation_failures", 0),
+        "latency_p50": row.get("latency_p50", 0.0),
+        "latency_p95": row.get("latency_p95", 0.0),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地模拟服务器上并发运行翻译流程，测量吞吐量与重试")
+    parser.add_argument('--api', choices=apis, default="anthropic", help='客户端与接口格式 (默认: anthropic，即 Anthropic SDK)')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='同时翻译的表数 (默认: 4)')
+    parser.add_argument('--tables', type=int, default=8, help='生成的表数 (默认: 8)')
+    parser.add_argument('--items', type=int, default=200, help='每张表的条目数 (默认: 200)')
+    parser.add_argument('--locales', default="zh-CN", help='目标语言，逗号分隔 (默认: zh-CN)')
+    parser.add_argument('--max-retries', type=int, default=2, help='客户端对 429/529 等错误的最大重试次数 (默认: 2)')
+    parser.add_argument('--url', help='使用已启动的模拟服务器，而不是在进程内启动 (此时忽略延迟与故障参数)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='显示翻译过程的输出')
+    parser.add_argument('--json', action='store_true', help='以 json 输出结果')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次耗时写入 benchmarks/baseline.json')
+    parser.add_argument('--max-regression', type=float, default=1.5, help='耗时超过基线的倍数时失败 (默认: 1.5)')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config_from_args(args)
+        [I18nLanguage(locale) for locale in args.locales.split(",") if locale]
+    except ValueError as e:
+        parser.error(str(e))
+
+    result = run(args)
+    key = f"bench_translate@{args.api}-c{args.concurrency}"
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        throughput = result["translated"] / result["seconds"] if result["seconds"] else 0
+        status = ", ".join(f"{code}: {count}" for code, count in sorted(result["status"].items()))
+        print(f"{key}: {args.tables} 张表 x {args.items} 条, 并发 {args.concurrency}")
+        print(f"  耗时 {result['seconds']:.2f}s, 译文 {result['translated']}/{result['items']} ({throughput:.0f} 条/秒)")
+        print(f"  请求 {result['requests']} ({status}), HTTP 重试 {'-' if result['http_retries'] is None else result['http_retries']}, 重新排队 {result['requeued']}, 截断 {result['truncated']}")
+        print(f"  分块 {result['chunks']}, 延迟 p50 {result['latency_p50']:.2f}s / p95 {result['latency_p95']:.2f}s, 校验失败 {result['validation_failures']}")
+        for error in result["errors"]:
+            print(f"  错误: {error}")
+
+    failed = False
+    if result["missing"] or result["wrong"]:
+        print(f"译文缺失 {result['missing']} 条，错位 {result['wrong']} 条")
+        failed = True
+
+    baseline = {}
+    if BASELINE_FILE.exists():
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if key in baseline and baseline[key]["seconds"] and not args.save_baseline:
+        ratio = result["seconds"] / baseline[key]["seconds"]
+        print(f"基线比 {ratio:.2f}")
+        if ratio > args.max_regression:
+            print(f"性能回退 (超过基线 {args.max_regression} 倍): {key}")
+            failed = True
+    if args.save_baseline:
+        baseline[key] = {"seconds": round(result["seconds"], 4), "items": result["items"], "requests": result["requests"]}
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {BASELINE_FILE}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
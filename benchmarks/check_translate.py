@@ -0,0 +1,216 @@
+"""
+翻译流程出错路径的回归检查 (check-translate)，不发起真实的网络请求。
+
+    failed-chunk  第一个请求在返回任何译文前失败：该分块的原文消耗一次尝试后重新排队，
+                  其余分块照常翻译，最终全部译完
+    truncated     在本地模拟服务器 (mock_llm_server.py) 上依次使用 Anthropic SDK 以及
+                  LLMAPIClient 的 claude / openai / gemini 流式 (SSE) 格式，强制截断第一个
+                  响应：流式解析得到的是按顺序、内容正确的前缀，截断结束原因被识别；
+                  translate_file 写入这段前缀，其余原文重新排队并在之后的分块中译完
+    queue-lease   工作队列 (workqueue.py) 的租约出错：上报失败的租约被释放并计一次尝试，
+                  run_queue 继续领取之后的租约并最终全部译完；一直失败时连续
+                  max_failures 个租约后停止，而不是耗尽所有租约的尝试次数
+
+用法：
+    python benchmarks/check_translate.py
+    python benchmarks/check_translate.py failed-chunk -v
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_translate import make_client  # noqa: E402
+from mock_llm_server import MockLLMServer, mock_translation  # noqa: E402
+from stub_llm import StubLLMClient  # noqa: E402
+from src.model.localization import I18nLanguage, TranslatedItem, dump_items, load_items  # noqa: E402
+from src.translate.workqueue import WorkQueue  # noqa: E402
+
+
+class FailingStubClient(StubLLMClient):
+    """前 `failures` 个请求直接抛出异常的桩"""
+
+    def __init__(self, failures: int = 1):
+        super().__init__()
+        self.failures = failures
+
+    def stream_chat_completion(self, messages, temperature=None, max_tokens=None, **kwargs):
+        if self.requests < self.failures:
+            self.requests += 1
+            raise RuntimeError("simulated outage")
+        return super().stream_chat_completion(messages, temperature, max_tokens, **kwargs)
+
+
+class TruncatingServer(MockLLMServer):
+    """截断接下来 `truncations` 个成功响应的模拟服务器"""
+
+    truncations = 0
+
+    def plan(self, api: str):
+        status, latency, truncate, mismatch = super().plan(api)
+        with self._lock:
+            if status is None and self.truncations:
+                self.truncations -= 1
+                truncate = True
+        return status, latency, truncate, mismatch
+
+
+class FlakyQueue(WorkQueue):
+    """前 `failures` 次上报抛出数据库锁定错误的工作队列"""
+
+    failures = 0
+
+    def report(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().report(*args, **kwargs)
+
+
+def make_table(file: Path, items: int, locales: List[str]) -> List[str]:
+    raws = [f"チェック用テキスト{i:03d}" for i in range(items)]
+    dump_items([TranslatedItem.empty(raw, locales) for raw in raws], file)
+    return raws
+
+
+def check_failed_chunk(work: Path) -> List[str]:
+    from src.translate import translate_file
+    from src.translate.telemetry import Telemetry
+
+    file = work / "FailedChunk.json"
+    raws = make_table(file, 60, ["zh-CN"])
+    client = FailingStubClient(failures=1)
+    telemetry = Telemetry()
+    translate_file(client, file, I18nLanguage.ZH_CN, chunk_size=10, telemetry=telemetry)
+
+    errors = []
+    translated = {item.raw for item in load_items(file) if item.has_text("zh-CN")}
+    if len(translated) != len(raws):
+        errors.append(f"译完 {len(translated)}/{len(raws)} 条，失败分块的原文没有重新排队")
+    first = telemetry.events[0] if telemetry.events else {}
+    if not first.get("error") or first.get("applied"):
+        errors.append(f"失败分块的遥测事件不正确: {first}")
+    if client.requests < 2:
+        errors.append("失败后没有继续请求")
+    return errors
+
+
+def check_truncated(work: Path) -> List[str]:
+    from src.translate import translate_file
+    from src.translate.stream import JsonObjectStreamParser, open_stream
+    from src.translate.telemetry import Telemetry
+
+    errors = []
+    with TruncatingServer() as server:
+        for api in ("anthropic", "claude", "openai", "gemini"):
+            client = make_client(api, server.url, 0)
+
+            # 截断的流：解析出的成员是请求的前缀，且译文与原文对应
+            texts = {f"t{i}": f"截断テスト{i:02d}" for i in range(20)}
+            prompt = f"## Original Texts to Translate:\n{json.dumps(texts, ensure_ascii=False)}\n\n## Output Format:\n"
+            server.truncations = 1
+            stream = open_stream(client, "mock-model", prompt, 4000)
+            parser = JsonObjectStreamParser()
+            pairs = [pair for delta in stream for pair in parser.feed(delta)]
+            expected = [(text_id, mock_translation(raw)) for text_id, raw in texts.items()]
+            if not stream.truncated:
+                errors.append(f"{api}: 没有识别出截断 (结束原因 {stream.finish_reason!r})")
+            if not 0 < len(pairs) < len(texts) or pairs != expected[:len(pairs)]:
+                errors.append(f"{api}: 截断响应解析出的不是正确的前缀: {len(pairs)}/{len(texts)} 条")
+
+            # translate_file：写入前缀，其余原文重新排队后译完
+            file = work / f"Truncated_{api}.json"
+            raws = make_table(file, 20, ["zh-CN"])
+            telemetry = Telemetry()
+            server.truncations = 1
+            translate_file(client, file, I18nLanguage.ZH_CN, chunk_size=20, telemetry=telemetry)
+            first = telemetry.events[0] if telemetry.events else {}
+            salvaged = first.get("applied") or 0
+            if not first.get("truncated") or not 0 < salvaged < len(raws) or first.get("missing") != len(raws) - salvaged:
+                errors.append(f"{api}: 截断分块的遥测事件不正确: {first}")
+            requeued = sum(event.get("applied") or 0 for event in telemetry.events[1:])
+            if requeued != len(raws) - salvaged:
+                errors.append(f"{api}: 重新排队后译完 {requeued} 条，应为 {len(raws) - salvaged} 条")
+            wrong = [item.raw for item in load_items(file) if item.get_text("zh-CN") != mock_translation(item.raw)]
+            if wrong:
+                errors.append(f"{api}: {len(wrong)} 条译文缺失或错位，如 {wrong[0]!r}")
+    return errors
+
+
+def check_queue_lease(work: Path) -> List[str]:
+    from src.model.storage import JsonStore
+    from src.translate.workqueue import init_queue, run_queue
+
+    errors = []
+    data_dir = work / "queue-data"
+    data_dir.mkdir()
+    make_table(data_dir / "QueueLease.json", 100, ["zh-CN"])
+
+    # 上报失败一次：该租约重新排队，其余租约照常翻译，最终全部译完
+    with FlakyQueue(work / "flaky.sqlite") as queue:
+        texts, leases = init_queue(queue, JsonStore(data_dir), I18nLanguage.ZH_CN, lease_items=20)
+        queue.failures = 1
+        try:
+            run_queue(StubLLMClient(), queue, "check", chunk_size=10)
+        except Exception as e:
+            errors.append(f"一个租约出错就结束了运行: {type(e).__name__}: {e}")
+        status = queue.status()
+        if status["reported"] != texts or status["leases"]["done"] != leases:
+            errors.append(f"上报失败后没有译完: {status}")
+
+    # 请求一直失败：连续 max_failures 个租约后停止，其余租约保持原样
+    with WorkQueue(work / "failing.sqlite") as queue:
+        texts, leases = init_queue(queue, JsonStore(data_dir), I18nLanguage.ZH_CN, lease_items=20)
+        run_queue(FailingStubClient(failures=10 ** 6), queue, "check", chunk_size=10, max_failures=3)
+        attempts = [row[0] for row in queue.conn.execute("SELECT attempts FROM leases ORDER BY id")]
+        if queue.status()["leases"]["failed"] or sum(attempts) != 3:
+            errors.append(f"请求一直失败时应在 3 个租约后停止，各租约的尝试次数: {attempts}")
+    return errors
+
+
+checks: Dict[str, Callable[[Path], List[str]]] = {
+    "failed-chunk": check_failed_chunk,
+    "truncated": check_truncated,
+    "queue-lease": check_queue_lease,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译流程出错路径的回归检查")
+    parser.add_argument('checks', nargs='*', help=f'要运行的检查: {", ".join(checks)} (默认: 全部)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='显示翻译过程的输出')
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in checks]
+    if unknown:
+        parser.error(f"未知的检查: {', '.join(unknown)}")
+
+    failed = False
+    with tempfile.TemporaryDirectory() as work:
+        for name in args.checks or list(checks):
+            output = StringIO()
+            try:
+                with redirect_stdout(output if not args.verbose else sys.stdout):
+                    errors = checks[name](Path(work))
+            except Exception as e:
+                errors = [f"{type(e).__name__}: {e}"]
+            print(f"{name}: {'通过' if not errors else '失败'}")
+            for error in errors:
+                print(f"  错误: {error}")
+            failed = failed or bool(errors)
+    if not failed:
+        print("通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
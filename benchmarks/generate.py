@@ -0,0 +1,141 @@
+"""
+生成按比例放大的合成数据，供基准测试使用。
+
+以仓库中现有的 `link-like-diff/json` 与 `data` 为模板，每个记录/条目复制 N 份：
+第 k 份 (k >= 1) 的 Id 加上偏移，日文文本末尾追加「その{k}」，对应的译文追加「 ({k})」，
+这样放大后的原文仍然互不相同，且 `data` 与 `json` 中的原文保持一一对应。
+
+输出目录结构 (<out>/<N>x/)：
+    orig/*.yaml     合成的 link-like-diff YAML (convert_yaml_types 的输入)
+    json/*.json     与 linkura_diff_to_json 输出格式一致的 json
+    data/*.json     翻译表
+    translated/*.json  ex_main 导出格式的 {key: 译文}，供 import_main 使用
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from src.model.localization import TranslatedItem, dump_items, load_items  # noqa: E402
+
+# Id 偏移量，保证复制出的记录主键不与原记录冲突
+ID_OFFSET = 100_000_000
+
+try:
+    YamlDumper = yaml.CSafeDumper
+except AttributeError:
+    YamlDumper = yaml.SafeDumper
+
+
+def scale_text(text: str, k: int) -> str:
+    return text if k == 0 else f"{text}その{k}"
+
+
+def scale_translation(text: str, k: int) -> str:
+    return text if k == 0 or not text else f"{text} ({k})"
+
+
+def scale_value(value, k: int, primary: bool):
+    """复制记录中的一个字段值：主键数字加偏移，其它字符串追加后缀"""
+    if k == 0:
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value + k * ID_OFFSET if primary else value
+    if isinstance(value, str):
+        if primary or not value or value.isascii():
+            return f"{value}-{k}" if primary else value
+        return scale_text(value, k)
+    if isinstance(value, list):
+        return [scale_value(v, k, primary) for v in value]
+    if isinstance(value, dict):
+        return {key: scale_value(v, k, primary) for key, v in value.items()}
+    return value
+
+
+def scale_records(records: list, primary_keys: list, scale: int) -> list:
+    top_keys = {key.split(".", 1)[0] for key in primary_keys}
+    result = []
+    for k in range(scale):
+        for record in records:
+            result.append({key: scale_value(v, k, key in top_keys) for key, v in record.items()})
+    return result
+
+
+def scale_items(items: list, scale: int) -> list:
+    result = []
+    for k in range(scale):
+        for item in items:
+            if k and item.raw.isascii():
+                # 与 scale_value 一致，纯 ASCII 文本不复制
+                continue
+            scaled = TranslatedItem(scale_text(item.raw, k), item.locales)
+            for locale, text, author in item.translations():
+                scaled.set_translation(locale, scale_translation(text, k), author)
+            result.append(scaled)
+    result.sort(key=lambda item: item.raw)
+    return result
+
+
+def generate(out_dir: Path, scale: int, json_dir: Path = ROOT / "link-like-diff" / "json", data_dir: Path = ROOT / "data") -> Path:
+    """生成一个比例的数据集，已存在则直接返回"""
+    target = Path(out_dir) / f"{scale}x"
+    marker = target / ".complete"
+    if marker.exists():
+        return target
+
+    from export_db_json import collect_translatable_text
+
+    for sub in ("orig", "json", "data", "translated"):
+        (target / sub).mkdir(parents=True, exist_ok=True)
+
+    for file in sorted(Path(json_dir).glob("*.json")):
+        with open(file, "r", encoding="utf-8") as f:
+            root = json.load(f)
+        primary_keys = root["rules"]["primaryKeys"]
+        records = scale_records(root["data"], primary_keys, scale)
+
+        with open(target / "orig" / f"{file.stem}.yaml", "w", encoding="utf-8") as f:
+            yaml.dump(records, f, Dumper=YamlDumper, allow_unicode=True, sort_keys=False)
+        with open(target / "json" / file.name, "w", encoding="utf-8") as f:
+            json.dump({"rules": root["rules"], "data": records}, f, ensure_ascii=False, indent=4)
+
+        # 模拟预翻译结果：每个待翻译文本都有一条译文
+        translated = {}
+        for record in records:
+            for key, text in collect_translatable_text(record, primary_keys).items():
+                translated[key] = f"译:{text}"
+        with open(target / "translated" / file.name, "w", encoding="utf-8") as f:
+            json.dump(translated, f, ensure_ascii=False, indent=2)
+
+    for file in sorted(Path(data_dir).glob("*.json")):
+        dump_items(scale_items(load_items(file), scale), target / "data" / file.name)
+
+    marker.touch()
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成按比例放大的合成基准数据")
+    parser.add_argument('--out', '-o', default=str(ROOT / "benchmarks" / ".data"), help='输出目录 (默认: benchmarks/.data)')
+    parser.add_argument('--scales', default="1,10,100", help='放大倍数，逗号分隔 (默认: 1,10,100)')
+    args = parser.parse_args()
+
+    for scale in [int(s) for s in args.scales.split(",") if s]:
+        print(f"生成 {scale}x 数据...")
+        target = generate(Path(args.out), scale)
+        size = sum(f.stat().st_size for f in target.rglob("*") if f.is_file())
+        print(f"  {target} ({size / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
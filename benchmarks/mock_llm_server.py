@@ -0,0 +1,494 @@
+"""
+本地 LLM 模拟服务器，用于翻译流程的压力测试，不访问真实 API、不产生费用。
+
+支持三种接口格式，均可流式 (SSE) 或非流式：
+    POST /v1/messages                                  Anthropic Messages
+    POST /chat/completions, /v1/chat/completions       OpenAI chat completions
+    POST /models/<model>:generateContent               Gemini (可带 /v1、/v1beta 前缀)
+    POST /models/<model>:streamGenerateContent?alt=sse
+    GET  /stats                                        请求计数 (json)
+
+回复内容：取出提示词中 `## Original Texts to Translate:` 之后的 json (对象或数组)，
+每条原文的译文为 `mock_translation(原文, 语言)`，即在原文前加上语言标记。译文保留原文中
+的标记，能通过校验；压测结束后可以逐条核对译文是否错位。
+
+延迟：首个字节前的等待服从 `--latency` 指定的分布，之后按 `--token-rate` (token/秒)
+逐段输出。分布写法：
+    fixed:0.2  uniform:0.1,0.5  normal:0.3,0.1  lognormal:0.3,0.6 (中位数, sigma)  exp:0.3 (均值)
+
+故障注入 (每个请求的概率，0~1)：
+    --rate-limit  返回 429 rate_limit_error (带 retry-after)
+    --overloaded  返回 529 overloaded_error
+    --truncate    输出到 60% 处截断，结束原因为 max_tokens / length / MAX_TOKENS
+    --mismatch    少返回一条译文 (数量不一致)
+输出超过请求的 max_tokens 时同样会被截断。
+
+用法：
+    python benchmarks/mock_llm_server.py --port 8787 --latency lognormal:0.5,0.4 --rate-limit 0.05
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.translate.budget import estimate_tokens  # noqa: E402
+
+texts_pattern = re.compile(r"## Original Texts to Translate:\n(.*?)\n\n## Output Format", re.S)
+locales_pattern = re.compile(r"for each of these locales: ([^.]+)\.")
+
+
+def mock_translation(raw: str, locale: Optional[str] = None) -> str:
+    """模拟服务器对一条原文返回的译文"""
+    return f"[{locale or 'mock'}] {raw}"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """解析延迟分布，返回以 random.Random 采样 (秒) 的函数"""
+    name, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",") if value]
+    except ValueError:
+        raise ValueError(f"延迟分布参数错误: {spec}")
+    shapes = {
+        "fixed": (1, lambda rng: values[0]),
+        "uniform": (2, lambda rng: rng.uniform(values[0], values[1])),
+        "normal": (2, lambda rng: rng.gauss(values[0], values[1])),
+        "lognormal": (2, lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) if values[0] > 0 else 0.0),
+        "exp": (1, lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0),
+    }
+    if name not in shapes or len(values) != shapes[name][0]:
+        raise ValueError(f"未知的延迟分布: {spec} (可用: fixed:s, uniform:a,b, normal:mean,sd, lognormal:median,sigma, exp:mean)")
+    sample = shapes[name][1]
+    return lambda rng: max(0.0, sample(rng))
+
+
+@dataclass
+class MockConfig:
+    latency: str = "fixed:0"
+    # 流式输出速度 (token/秒)，0 表示不等待
+    token_rate: float = 0.0
+    # 每个流式片段的字符数
+    delta_chars: int = 16
+    rate_limit: float = 0.0
+    overloaded: float = 0.0
+    truncate: float = 0.0
+    mismatch: float = 0.0
+    # 429/529 响应中的 retry-after (秒)
+    retry_after: float = 0.1
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    by_api: Dict[str, int] = field(default_factory=dict)
+    by_status: Dict[str, int] = field(default_factory=dict)
+    truncated: int = 0
+    mismatched: int = 0
+    items: int = 0
+
+
+class MockLLMServer:
+    """
+    在后台线程中运行的模拟服务器
+
+    Args:
+        config: 延迟与故障配置
+        host: 监听地址 (默认: 127.0.0.1)
+        port: 监听端口，0 表示随机端口 (默认: 0)
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.sample_latency = parse_latency(self.config.latency)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._stats = MockStats()
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(asdict(self._stats)))
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = MockStats()
+
+    def plan(self, api: str) -> Tuple[Optional[int], float, bool, bool]:
+        """为一个请求抽样：(错误状态码或 None, 首字节延迟, 是否截断, 是否少返回一条)"""
+        config = self.config
+        with self._lock:
+            rng = self._rng
+            status = None
+            roll = rng.random()
+            if roll < config.rate_limit:
+                status = 429
+            elif roll < config.rate_limit + config.overloaded:
+                status = 529
+            latency = self.sample_latency(rng)
+            truncate = rng.random() < config.truncate
+            mismatch = rng.random() < config.mismatch
+            self._stats.requests += 1
+            self._stats.by_api[api] = self._stats.by_api.get(api, 0) + 1
+        return status, latency, truncate, mismatch
+
+    def count(self, status: int, truncated: bool = False, mismatched: bool = False, items: int = 0) -> None:
+        with self._lock:
+            key = str(status)
+            self._stats.by_status[key] = self._stats.by_status.get(key, 0) + 1
+            self._stats.truncated += 1 if truncated else 0
+            self._stats.mismatched += 1 if mismatched else 0
+            self._stats.items += items
+
+
+def build_reply(prompt: str, mismatch: bool = False) -> Tuple[str, int]:
+    """根据提示词生成回复文本，返回 (文本, 译文条数)"""
+    match = texts_pattern.search(prompt)
+    if not match:
+        return "This is a mock reply.", 0
+    try:
+        texts = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return "This is a mock reply.", 0
+    locales_match = locales_pattern.search(prompt)
+    locales = [locale.strip() for locale in locales_match.group(1).split(",")] if locales_match else None
+
+    if isinstance(texts, dict):
+        if locales:
+            reply = {text_id: {locale: mock_translation(raw, locale) for locale in locales} for text_id, raw in texts.items()}
+        else:
+            reply = {text_id: mock_translation(raw) for text_id, raw in texts.items()}
+        if mismatch and len(reply) > 1:
+            del reply[list(reply)[len(reply) // 2]]
+    else:
+        reply = [mock_translation(raw) for raw in texts]
+        if mismatch and len(reply) > 1:
+            del reply[len(reply) // 2]
+    return json.dumps(reply, ensure_ascii=False), len(reply)
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self) -> MockLLMServer:
+        return self.server.mock
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/") == "/stats":
+            self._send_json(200, self.mock.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Not found: {self.path}"}})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        if path.endswith("/messages"):
+            api = "anthropic"
+            prompt = "\n".join(_content_text(message.get("content")) for message in body.get("messages", []))
+            stream = bool(body.get("stream"))
+            max_tokens = body.get("max_tokens")
+        elif path.endswith("/chat/completions"):
+            api = "openai"
+            prompt = "\n".join(_content_text(message.get("content")) for message in body.get("messages", []))
+            stream = bool(body.get("stream"))
+            max_tokens = body.get("max_tokens")
+        elif ":generateContent" in path or ":streamGenerateContent" in path:
+            api = "gemini"
+            prompt = "\n".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            stream = ":streamGenerateContent" in path
+            max_tokens = body.get("generationConfig", {}).get("maxOutputTokens")
+        else:
+            self._send_json(404, {"error": {"message": f"Not found: {path}"}})
+            return
+
+        status, latency, truncate, mismatch = self.mock.plan(api)
+        if status is not None:
+            self.mock.count(status)
+            self._send_error(api, status)
+            return
+
+        model = body.get("model") or path.rsplit("/", 1)[-1].split(":", 1)[0]
+        text, items = build_reply(prompt, mismatch)
+        input_tokens = estimate_tokens(prompt)
+        if truncate:
+            text = text[:int(len(text) * 0.6)]
+        if max_tokens and estimate_tokens(text) > max_tokens:
+            truncate = True
+            while text and estimate_tokens(text) > max_tokens:
+                text = text[:int(len(text) * 0.9)]
+        output_tokens = estimate_tokens(text)
+
+        time.sleep(latency)
+        build = {"anthropic": AnthropicFormat, "openai": OpenAIFormat, "gemini": GeminiFormat}[api]
+        if stream:
+            self._send_stream(build.events(model, text, truncate, input_tokens, output_tokens, self.mock.config.delta_chars))
+        else:
+            self._send_json(200, build.response(model, text, truncate, input_tokens, output_tokens))
+        self.mock.count(200, truncate, mismatch, 0 if truncate else items)
+
+    def _send_error(self, api: str, status: int) -> None:
+        retry_after = self.mock.config.retry_after
+        if api == "anthropic":
+            kind = "rate_limit_error" if status == 429 else "overloaded_error"
+            body = {"type": "error", "error": {"type": kind, "message": f"Mock {kind}"}}
+        elif api == "openai":
+            kind = "rate_limit_exceeded" if status == 429 else "server_overloaded"
+            body = {"error": {"message": f"Mock {kind}", "type": kind, "code": kind}}
+        else:
+            kind = "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"
+            body = {"error": {"code": status, "message": f"Mock {kind}", "status": kind}}
+        self._send_json(status, body, {"retry-after": f"{retry_after:g}"})
+
+    def _send_json(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, events: List[Tuple[Optional[str], dict]]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        token_rate = self.mock.config.token_rate
+        try:
+            for event, data in events:
+                # `_tokens` 只用于控制输出速度，不发送给客户端
+                tokens = data.pop("_tokens", 0)
+                chunk = f"event: {event}\n" if event else ""
+                chunk += f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                self.wfile.write(chunk.encode("utf-8"))
+                self.wfile.flush()
+                if token_rate and tokens:
+                    time.sleep(tokens / token_rate)
+            if events and events[-1][0] is None:
+                self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前关闭了流
+            pass
+
+
+def _split(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), max(1, size))]
+
+
+class AnthropicFormat:
+    @staticmethod
+    def response(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int) -> dict:
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "max_tokens" if truncated else "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    @staticmethod
+    def events(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int, delta_chars: int) -> List[Tuple[Optional[str], dict]]:
+        message = AnthropicFormat.response(model, "", False, input_tokens, 0)
+        message["content"] = []
+        message["stop_reason"] = None
+        events = [
+            ("message_start", {"type": "message_start", "message": message}),
+            ("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+        ]
+        for delta in _split(text, delta_chars):
+            events.append(("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": delta},
+                "_tokens": estimate_tokens(delta),
+            }))
+        events.append(("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        events.append(("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "max_tokens" if truncated else "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        }))
+        events.append(("message_stop", {"type": "message_stop"}))
+        return events
+
+
+class OpenAIFormat:
+    @staticmethod
+    def response(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int) -> dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "length" if truncated else "stop",
+            }],
+            "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        }
+
+    @staticmethod
+    def events(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int, delta_chars: int) -> List[Tuple[Optional[str], dict]]:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        def chunk(choices: list, **extra) -> dict:
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+
+        events = [(None, chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))]
+        for delta in _split(text, delta_chars):
+            events.append((None, chunk([{"index": 0, "delta": {"content": delta}, "finish_reason": None}], _tokens=estimate_tokens(delta))))
+        events.append((None, chunk([{"index": 0, "delta": {}, "finish_reason": "length" if truncated else "stop"}])))
+        events.append((None, chunk([], usage={"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens})))
+        return events
+
+
+class GeminiFormat:
+    @staticmethod
+    def response(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int) -> dict:
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "MAX_TOKENS" if truncated else "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens, "totalTokenCount": input_tokens + output_tokens},
+            "modelVersion": model,
+        }
+
+    @staticmethod
+    def events(model: str, text: str, truncated: bool, input_tokens: int, output_tokens: int, delta_chars: int) -> List[Tuple[Optional[str], dict]]:
+        deltas = _split(text, delta_chars) or [""]
+        events = []
+        for i, delta in enumerate(deltas):
+            data = {"candidates": [{"content": {"parts": [{"text": delta}], "role": "model"}, "index": 0}], "_tokens": estimate_tokens(delta)}
+            if i == len(deltas) - 1:
+                data["candidates"][0]["finishReason"] = "MAX_TOKENS" if truncated else "STOP"
+                data["usageMetadata"] = {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens, "totalTokenCount": input_tokens + output_tokens}
+            events.append(("", data))
+        return events
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """延迟与故障参数，bench_translate.py 共用"""
+    parser.add_argument('--latency', default="fixed:0", help='首字节延迟分布 (默认: fixed:0)，如 uniform:0.1,0.5、lognormal:0.3,0.6')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='流式输出速度，token/秒，0 表示不等待 (默认: 0)')
+    parser.add_argument('--delta-chars', type=int, default=16, help='每个流式片段的字符数 (默认: 16)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='返回 429 的概率 (默认: 0)')
+    parser.add_argument('--overloaded', type=float, default=0.0, help='返回 529 的概率 (默认: 0)')
+    parser.add_argument('--truncate', type=float, default=0.0, help='截断输出的概率 (默认: 0)')
+    parser.add_argument('--mismatch', type=float, default=0.0, help='少返回一条译文的概率 (默认: 0)')
+    parser.add_argument('--retry-after', type=float, default=0.1, help='429/529 响应的 retry-after 秒数 (默认: 0.1)')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子')
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        delta_chars=args.delta_chars,
+        rate_limit=args.rate_limit,
+        overloaded=args.overloaded,
+        truncate=args.truncate,
+        mismatch=args.mismatch,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    parse_latency(config.latency)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 LLM 模拟服务器 (Anthropic / OpenAI / Gemini 格式)")
+    parser.add_argument('--host', default="127.0.0.1", help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', '-p', type=int, default=8787, help='监听端口 (默认: 8787)')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    try:
+        config = config_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = MockLLMServer(config, args.host, args.port)
+    print(f"模拟服务器已启动: {server.url}")
+    print(f"  Anthropic: ANTHROPIC_BASE_URL={server.url}")
+    print(f"  OpenAI:    LLM_PROVIDER=openai LLM_BASE_URL={server.url}/v1")
+    print(f"  Gemini:    LLM_PROVIDER=gemini LLM_BASE_URL={server.url}/v1beta")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+"""
+各流水线阶段的基准测试。
+
+每个阶段在独立的子进程中运行：先做不计时的准备工作 (复制数据等)，再计时执行阶段本身，
+记录耗时、吞吐量 (条/秒) 以及峰值内存 (阶段执行期间常驻内存峰值的增量)。
+结果可以保存为基线 (benchmarks/baseline.json)，之后的运行与基线比较，超出
+`--max-regression` 倍时返回非 0。
+
+用法：
+    python benchmarks/run.py                      # 1x, 10x 全部阶段
+    python benchmarks/run.py --scales 1,10,100 --stages basic_gen,translate_file
+    python benchmarks/run.py --save-baseline
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+BASELINE_FILE = ROOT / "benchmarks" / "baseline.json"
+DATA_DIR = ROOT / "benchmarks" / ".data"
+
+# translate_file 阶段使用的表：未翻译条目最多的表
+TRANSLATE_TABLE = "Musics"
+
+
+def count_records(json_dir: Path) -> int:
+    total = 0
+    for file in json_dir.glob("*.json"):
+        with open(file, "r", encoding="utf-8") as f:
+            total += len(json.load(f)["data"])
+    return total
+
+
+def count_items(data_dir: Path) -> int:
+    from src.model.localization import load_items
+    return sum(len(load_items(file)) for file in data_dir.glob("*.json"))
+
+
+# 每个准备函数返回 (计时执行的函数, 处理的条目数)
+
+def setup_convert_yaml_types(dataset: Path, work: Path):
+    from linkura_diff_to_json import convert_yaml_types
+    # save_json 写入相对路径 link-like-diff/json
+    os.chdir(work)
+    return lambda: convert_yaml_types(str(dataset / "orig")), count_records(dataset / "json")
+
+
+def setup_basic_gen(dataset: Path, work: Path):
+    from src.gentodo import basic_gen
+    shutil.copytree(dataset / "data", work / "data")
+    return lambda: basic_gen(dataset / "json", work / "data"), count_records(dataset / "json")
+
+
+def setup_ex_main(dataset: Path, work: Path):
+    from export_db_json import ex_main
+    files = sorted((dataset / "json").glob("*.json"))
+    (work / "exports").mkdir()
+
+    def run():
+        for file in files:
+            ex_main(str(file), str(work / "exports" / file.name))
+    return run, count_records(dataset / "json")
+
+
+def setup_import_main(dataset: Path, work: Path):
+    from import_db_json import import_main
+    files = sorted((dataset / "translated").glob("*.json"))
+    (work / "merged").mkdir()
+
+    def run():
+        for file in files:
+            import_main(str(dataset / "json" / file.name), str(file), str(work / "merged" / file.name))
+    return run, count_records(dataset / "json")
+
+
+def setup_analyze_translation_progress(dataset: Path, work: Path):
+    from src.generate.analyze import analyze_translation_progress
+    return lambda: analyze_translation_progress(dataset / "data"), count_items(dataset / "data")
+
+
+def setup_translate_file(dataset: Path, work: Path):
+    from src.model.localization import I18nLanguage, load_items
+    from src.translate import translate_file
+    from stub_llm import StubLLMClient
+    file = work / f"{TRANSLATE_TABLE}.json"
+    shutil.copy(dataset / "data" / file.name, file)
+    untranslated = sum(1 for item in load_items(file) if not item.has_text(I18nLanguage.ZH_CN.value))
+    return lambda: translate_file(StubLLMClient(), file, I18nLanguage.ZH_CN), untranslated
+
+
+STAGES = {
+    "convert_yaml_types": setup_convert_yaml_types,
+    "basic_gen": setup_basic_gen,
+    "ex_main": setup_ex_main,
+    "import_main": setup_import_main,
+    "analyze_translation_progress": setup_analyze_translation_progress,
+    "translate_file": setup_translate_file,
+}
+
+
+def run_stage(stage: str, dataset: str) -> dict:
+    """在子进程中执行，返回 {seconds, items, peak_mb}"""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{stage}-") as work:
+        func, items = STAGES[stage](Path(dataset), Path(work))
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            started = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.chdir(ROOT)
+    # Linux 上 ru_maxrss 的单位是 KB
+    return {"seconds": seconds, "items": items, "peak_mb": max(0, rss_after - rss_before) / 1024}
+
+
+def measure(stage: str, dataset: Path, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        # 每次使用全新的进程，避免缓存与内存峰值互相影响
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_stage, stage, str(dataset)).result()
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def load_baseline() -> dict:
+    if BASELINE_FILE.exists():
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def main():
+    from generate import generate
+
+    parser = argparse.ArgumentParser(description="流水线各阶段的基准测试")
+    parser.add_argument('--scales', default="1,10", help='数据放大倍数，逗号分隔 (默认: 1,10，可加 100)')
+    parser.add_argument('--stages', default=",".join(STAGES), help='要运行的阶段，逗号分隔 (默认: 全部)')
+    parser.add_argument('--repeat', '-r', type=int, default=1, help='每个阶段运行次数，取最快一次 (默认: 1)')
+    parser.add_argument('--data', default=str(DATA_DIR), help='合成数据目录 (默认: benchmarks/.data)')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果写入 benchmarks/baseline.json')
+    parser.add_argument('--max-regression', type=float, default=1.5, help='耗时超过基线的倍数时失败 (默认: 1.5)')
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(unknown)}")
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+
+    print(f"{'阶段':<30} {'规模':>5} {'条目':>9} {'耗时(s)':>9} {'条/秒':>10} {'峰值(MB)':>9} {'基线比':>7}")
+    for scale in [int(s) for s in args.scales.split(",") if s]:
+        dataset = generate(Path(args.data), scale)
+        for stage in stages:
+            key = f"{stage}@{scale}x"
+            result = measure(stage, dataset, max(1, args.repeat))
+            results[key] = result
+            throughput = result["items"] / result["seconds"] if result["seconds"] else 0
+            ratio = ""
+            if key in baseline and baseline[key]["seconds"]:
+                value = result["seconds"] / baseline[key]["seconds"]
+                ratio = f"{value:.2f}"
+                if value > args.max_regression:
+                    regressions.append(key)
+            print(f"{stage:<30} {scale:>4}x {result['items']:>9} {result['seconds']:>9.3f} {throughput:>10.0f} {result['peak_mb']:>9.1f} {ratio:>7}")
+
+    if args.save_baseline:
+        baseline.update({key: {k: round(v, 4) if isinstance(v, float) else v for k, v in result.items()} for key, result in results.items()})
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {BASELINE_FILE}")
+
+    if regressions:
+        print(f"性能回退 (超过基线 {args.max_regression} 倍): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
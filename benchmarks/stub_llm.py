@@ -0,0 +1,55 @@
+"""
+基准测试用的本地 LLM 桩，不发起网络请求。
+
+实现 `LLMAPIClient.stream_chat_completion` 的接口：从提示词中取出待翻译的
+`{id: 原文}` 对象，按固定大小的片段流式返回 `{id: 译文}`，译文保留原文的标记。
+"""
+
+import json
+from typing import Iterator, List, Optional
+
+from src.translate.budget import estimate_tokens
+
+
+class StubConfig:
+    model = "stub-llm"
+
+
+class StubStream:
+    def __init__(self, text: str, input_tokens: int, delta_size: int):
+        self.text = ""
+        self._response = text
+        self._delta_size = delta_size
+        self.finish_reason: Optional[str] = None
+        self.input_tokens = input_tokens
+        self.output_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+
+    @property
+    def truncated(self) -> bool:
+        return False
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(0, len(self._response), self._delta_size):
+            delta = self._response[i:i + self._delta_size]
+            self.text += delta
+            yield delta
+        self.finish_reason = "stop"
+        self.output_tokens = estimate_tokens(self._response)
+
+    def close(self) -> None:
+        pass
+
+
+class StubLLMClient:
+    def __init__(self, delta_size: int = 32):
+        self.config = StubConfig()
+        self.delta_size = delta_size
+        self.requests = 0
+
+    def stream_chat_completion(self, messages: List[dict], temperature: Optional[float] = None, max_tokens: Optional[int] = None, **kwargs) -> StubStream:
+        self.requests += 1
+        prompt = messages[-1]["content"]
+        texts = prompt.split("## Original Texts to Translate:\n", 1)[1].split("\n\n## Output Format", 1)[0]
+        translated = {text_id: f"译:{raw}" for text_id, raw in json.loads(texts).items()}
+        return StubStream(json.dumps(translated, ensure_ascii=False), estimate_tokens(prompt), self.delta_size)
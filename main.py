@@ -1,16 +1,27 @@
 import argparse
 import sys
 from pathlib import Path
-from src.generate import analyze
 from src.model.localization import I18nLanguage
-from src.translate import translate_file, claude
 import os
 
+# Subcommand modules (and the SDKs they pull in) are imported inside the
+# command functions, so e.g. `gentodo` never loads the translation clients
+
 i18n = [lang.value for lang in I18nLanguage]
 i18n_map = {lang.value: lang for lang in I18nLanguage}
 OUTPUT_DIR = Path("data")
 RAW_DIR = Path("raw")
 README_FILE = Path("README.md")
+TELEMETRY_FILE = "translate-telemetry.jsonl"
+CACHE_DIR = ".cache/llm-responses"
+QUEUE_FILE = "translate-queue.sqlite"
+SUGGESTIONS_FILE = "translate-suggestions.jsonl"
+ARCHIVE_DIR = Path("archive")
+PIPELINE_MANIFEST = ".cache/pipeline.json"
+# Same as src.pipeline.stage_names, listed here to keep the parser import-free
+PIPELINE_STAGES = ["convert", "gentodo", "export", "pretranslate", "import"]
+# Same as src.translate.cache.cache_modes, listed here to keep the parser import-free
+CACHE_MODES = ["off", "read", "write", "readwrite"]
 
 
 def command_gentodo(args):
@@ -23,32 +34,212 @@ def command_gentodo(args):
     print(f"Extracting Japanese content from {input_dir} to {output_dir}")
     
     try:
-        basic_gen(Path(input_dir), Path(output_dir))
+        basic_gen(Path(input_dir), Path(output_dir), args.suggest, args.suggest_file, args.prune, Path(args.archive))
         print("gentodo command completed successfully!")
         return 0
     except Exception as e:
         print(f"Error executing gentodo: {e}")
         return 1
 
+def setup_translate_client(args):
+    """Anthropic SDK client from the environment, or a multi-provider router from --router"""
+    if args.router:
+        from src.translate.router import load_router
+        return load_router(Path(args.router))
+    from src.translate import claude
+    return claude.setup_client(os.environ["ANTHROPIC_API_KEY"], os.environ["ANTHROPIC_BASE_URL"])
+
 def command_translate(args):
     """
     Translation tool, providing basic large model API translation interface
 
     And user also can translated by handmade
     """
-    if args.file:
-        client = claude.setup_client(os.environ["ANTHROPIC_API_KEY"], os.environ["ANTHROPIC_BASE_URL"])
+    if args.file or args.all:
+        from src.model.storage import open_store
+        from src.translate import translate_file, translate_all
+        from src.translate.cache import ResponseCache
+        from src.translate.telemetry import Telemetry
+
+        client = setup_translate_client(args)
         limit = args.limit if hasattr(args, 'limit') and args.limit else None
-        translate_file(client, Path(args.file), i18n_map.get(args.locale, I18nLanguage.ZH_CN), limit=limit)
+        if args.locales:
+            target_language = [i18n_map[locale] for locale in args.locales]
+        else:
+            target_language = i18n_map.get(args.locale, I18nLanguage.ZH_CN)
+        data_dir = OUTPUT_DIR if args.all else Path(args.file).parent
+        store = open_store(data_dir, args.store)
+        telemetry = Telemetry(args.telemetry or None, args.prometheus)
+        cache = None
+        if args.cache_mode != "off":
+            cache = ResponseCache(args.cache_dir, args.cache_mode, args.cache_max_mb * 1024 * 1024, args.cache_ttl_days * 24 * 3600)
+        try:
+            if args.all:
+                translate_all(client, data_dir, target_language, limit=limit, store=store, telemetry=telemetry, cache=cache, fuzzy_threshold=args.fuzzy, archive_dir=ARCHIVE_DIR)
+            else:
+                translate_file(client, Path(args.file), target_language, limit=limit, store=store, telemetry=telemetry, cache=cache, fuzzy_threshold=args.fuzzy, archive_dir=ARCHIVE_DIR)
+        finally:
+            store.close()
+            if cache is not None:
+                print(cache.summary())
+            if hasattr(client, "summary"):
+                print(client.summary())
+    return 0
+
+def command_translate_stats(args):
+    """Summarize translation telemetry by table"""
+    from src.translate.telemetry import format_summary, load_events, summarize
+
+    telemetry_file = Path(args.telemetry)
+    if not telemetry_file.exists():
+        print(f"Telemetry file {telemetry_file} not found")
+        return 1
+    events = load_events(telemetry_file)
+    if args.run:
+        events = [event for event in events if event.get("run") == args.run]
+    elif args.last and events:
+        events = [event for event in events if event.get("run") == events[-1].get("run")]
+    runs = len({event.get("run") for event in events})
+    print(f"{len(events)} chunks from {runs} runs in {telemetry_file}")
+    print(format_summary(summarize(events)))
+    return 0
+
+def command_store(args):
+    """Import data files into the SQLite store, or export them back to JSON"""
+    from src.model.storage import SqliteStore
+
+    data_dir = Path(args.data) if args.data else OUTPUT_DIR
+    with SqliteStore(Path(args.db)) as store:
+        if args.action == 'import':
+            count = store.import_json(data_dir)
+            print(f"Imported {count} tables from {data_dir} into {args.db}")
+        else:
+            count = store.export_json(data_dir, args.table or None)
+            print(f"Exported {count} tables from {args.db} to {data_dir}")
+    return 0
+
+def command_lookup(args):
+    """Look up raw texts in the data tables, optionally fixing their translation in place"""
+    from src.model.storage import open_store
+
+    data_dir = Path(args.data) if args.data else OUTPUT_DIR
+    store = open_store(data_dir, args.store)
+    missing = 0
+    try:
+        tables = store.tables()
+        if args.table:
+            unknown = [table for table in args.table if table not in tables]
+            for table in unknown:
+                print(f"{table!r}: unknown table")
+            if unknown:
+                return 1
+            tables = args.table
+        for raw in args.raw:
+            found = [(table, item) for table in tables for item in [store.get(table, raw)] if item is not None]
+            if not found:
+                print(f"{raw!r} not found")
+                missing += 1
+                continue
+            for table, item in found:
+                if args.set is not None:
+                    store.set_translation(table, raw, args.locale, args.set, args.author)
+                    item = store.get(table, raw)
+                print(f"{table}: {raw}")
+                for locale, text, author in item.translations():
+                    print(f"  {locale}: {text}" + (f" ({author})" if author else ""))
+    finally:
+        store.close()
+    return 1 if missing else 0
+
+def command_queue(args):
+    """Share one translation job between several runners through a queue database"""
+    from src.translate.workqueue import WorkQueue
+
+    data_dir = Path(args.data) if args.data else OUTPUT_DIR
+    with WorkQueue(Path(args.queue)) as queue:
+        if args.action == 'init':
+            from src.model.storage import open_store
+            from src.translate.workqueue import init_queue
+
+            target_language = [i18n_map[locale] for locale in args.locales] if args.locales else i18n_map.get(args.locale, I18nLanguage.ZH_CN)
+            store = open_store(data_dir, args.store)
+            try:
+                texts, leases = init_queue(queue, store, target_language, args.lease_items)
+            finally:
+                store.close()
+            print(f"Queued {texts} unique texts in {leases} leases into {args.queue}")
+        elif args.action == 'run':
+            from src.translate.telemetry import Telemetry
+            from src.translate.workqueue import run_queue
+
+            client = setup_translate_client(args)
+            telemetry = Telemetry(args.telemetry or None)
+            try:
+                run_queue(client, queue, args.runner, lease_seconds=args.lease_seconds, telemetry=telemetry)
+            finally:
+                if hasattr(client, "summary"):
+                    print(client.summary())
+        elif args.action == 'status':
+            status = queue.status()
+            leases = ", ".join(f"{state} {count}" for state, count in status["leases"].items())
+            print(f"Leases: {leases}")
+            print(f"Translations: {status['reported']}/{status['translations']} reported for {status['texts']} texts" + (" (merged)" if status["merged"] else ""))
+            for runner, count in status["runners"].items():
+                print(f"  {runner}: {count}")
+        else:
+            from src.model.storage import open_store
+            from src.translate.workqueue import merge_queue
+
+            store = open_store(data_dir, args.store)
+            try:
+                written, copied = merge_queue(queue, store)
+            finally:
+                store.close()
+            print(f"Merged {written} translations and copied {copied} to duplicated items into {data_dir}")
     return 0
 
+def command_pipeline(args):
+    """Run the update workflow as a memoized graph of per-table stages"""
+    from src.pipeline import Layout, run_pipeline
+
+    layout = Layout(data=Path(args.data), archive=ARCHIVE_DIR)
+    counts = run_pipeline(
+        layout,
+        selected=args.stages,
+        tables=args.table,
+        locale=args.locale,
+        jobs=args.jobs,
+        force=args.force,
+        manifest_file=Path(args.manifest),
+        verbose=args.verbose
+    )
+    return 1 if counts["failed"] or counts["blocked"] else 0
+
 def command_generate(args):
     """Generate translated files and progress reports"""
+    from src.generate import analyze
+
     (total, translated) = analyze.analyze_translation_progress(OUTPUT_DIR, locale=args.locale)
     analyze.write_translation_progress(README_FILE, total, translated, locale=args.locale)
     # print(f"Progress report updated in {README_FILE}")
     return 0
 
+def parse_stages(value):
+    """Parse a comma separated pipeline stage list for argparse"""
+    stages = [stage.strip() for stage in value.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in PIPELINE_STAGES]
+    if not stages or unknown:
+        raise argparse.ArgumentTypeError(f"invalid stages {value!r}, choose from {', '.join(PIPELINE_STAGES)}")
+    return stages
+
+def parse_locales(value):
+    """Parse a comma separated locale list for argparse"""
+    locales = [locale.strip() for locale in value.split(',') if locale.strip()]
+    unknown = [locale for locale in locales if locale not in i18n_map]
+    if not locales or unknown:
+        raise argparse.ArgumentTypeError(f"invalid locales {value!r}, choose from {', '.join(i18n)}")
+    return locales
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(
@@ -62,6 +253,21 @@ def main():
         choices=i18n,
         help='Translation locale'
     )
+    parser.add_argument(
+        '--profile',
+        choices=['cpu', 'mem', 'wall'],
+        help='Profile the command: cpu (cProfile .prof), wall (sampled collapsed stacks), mem (tracemalloc)'
+    )
+    parser.add_argument(
+        '--profile-output',
+        help='Profile output file (default: profile-<command>.<suffix>)'
+    )
+    parser.add_argument(
+        '--profile-top',
+        type=int,
+        default=20,
+        help='Number of entries in the profile summary (default: 20)'
+    )
     
     subparsers = parser.add_subparsers(
         dest='command',
@@ -82,6 +288,28 @@ def main():
         default='data',
         help='Output directory for translation files (default: data)'
     )
+    parser_gentodo.add_argument(
+        '--prune',
+        action='store_true',
+        help='Move items no longer extracted out of the output files: translated ones into --archive, untranslated ones are dropped'
+    )
+    parser_gentodo.add_argument(
+        '--archive',
+        default=str(ARCHIVE_DIR),
+        help=f'Directory of per-table archives of pruned items, restored when extracted again (default: {ARCHIVE_DIR})'
+    )
+    parser_gentodo.add_argument(
+        '--suggest',
+        type=float,
+        metavar='THRESHOLD',
+        help='Match the untranslated items against the existing translations and write the matches '
+             'scoring at least THRESHOLD (0-1, e.g. 0.8) to --suggest-file'
+    )
+    parser_gentodo.add_argument(
+        '--suggest-file',
+        default=SUGGESTIONS_FILE,
+        help=f'JSONL file of translation memory suggestions (default: {SUGGESTIONS_FILE})'
+    )
     parser_gentodo.set_defaults(func=command_gentodo)
     
     # translate
@@ -93,13 +321,261 @@ def main():
         '--file', '-f',
         help='Path to the input file containing text to translate'
     )
+    parser_translate.add_argument(
+        '--all',
+        action='store_true',
+        help='Translate every file in data, sending each unique raw text to the model once'
+    )
     parser_translate.add_argument(
         '--limit',
         type=int,
         help='Maximum number of items to translate (default: translate all untranslated items)'
     )
+    parser_translate.add_argument(
+        '--locales',
+        type=parse_locales,
+        help='Comma separated locales translated together in one request per chunk, e.g. zh-CN,en (overrides --locale)'
+    )
+    parser_translate.add_argument(
+        '--store',
+        help='SQLite store to read and update instead of the JSON file (see the store command)'
+    )
+    parser_translate.add_argument(
+        '--telemetry',
+        default=TELEMETRY_FILE,
+        help=f'JSONL file per-chunk telemetry is appended to, empty to disable (default: {TELEMETRY_FILE})'
+    )
+    parser_translate.add_argument(
+        '--prometheus',
+        help='Prometheus textfile updated with the run totals after every chunk'
+    )
+    parser_translate.add_argument(
+        '--cache-mode',
+        choices=CACHE_MODES,
+        default='off',
+        help='Response cache keyed by model, parameters and prompt: read replays, write records (default: off)'
+    )
+    parser_translate.add_argument(
+        '--cache-dir',
+        default=CACHE_DIR,
+        help=f'Response cache directory (default: {CACHE_DIR})'
+    )
+    parser_translate.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=512,
+        help='Size bound of the response cache, least recently used entries are evicted beyond it (default: 512)'
+    )
+    parser_translate.add_argument(
+        '--cache-ttl-days',
+        type=float,
+        default=30,
+        help='Days a cached response stays valid, 0 to keep forever (default: 30)'
+    )
+    parser_translate.add_argument(
+        '--router',
+        help='JSON file of several providers/models to route requests over by latency and errors, '
+             'with failover and optional hedging (see src/translate/router.py); default: Anthropic SDK from the environment'
+    )
+    parser_translate.add_argument(
+        '--fuzzy',
+        type=float,
+        metavar='THRESHOLD',
+        help=f'Look up untranslated texts in a translation memory of all tables and {ARCHIVE_DIR}/: matches scoring at least '
+             'THRESHOLD (0-1, e.g. 0.8) are prefilled when they differ only in numbers, otherwise sent as edit tasks'
+    )
     parser_translate.set_defaults(func=command_translate)
+
+    # translate-stats
+    parser_translate_stats = subparsers.add_parser(
+        'translate-stats',
+        help='Summarize translation telemetry: p50/p95 latency and tokens per item by table',
+    )
+    parser_translate_stats.add_argument(
+        '--telemetry',
+        default=TELEMETRY_FILE,
+        help=f'Telemetry JSONL file (default: {TELEMETRY_FILE})'
+    )
+    parser_translate_stats.add_argument(
+        '--run',
+        help='Only include the given run id'
+    )
+    parser_translate_stats.add_argument(
+        '--last',
+        action='store_true',
+        help='Only include the last run'
+    )
+    parser_translate_stats.set_defaults(func=command_translate_stats)
     
+    # store
+    parser_store = subparsers.add_parser(
+        'store',
+        help='Import data files into a SQLite store, or export the store back to JSON',
+    )
+    parser_store.add_argument(
+        'action',
+        choices=['import', 'export'],
+        help='import: data JSON -> SQLite, export: SQLite -> data JSON'
+    )
+    parser_store.add_argument(
+        '--db',
+        default='data.sqlite',
+        help='SQLite database file (default: data.sqlite)'
+    )
+    parser_store.add_argument(
+        '--data', '-d',
+        default='data',
+        help='Data directory containing translation JSON files (default: data)'
+    )
+    parser_store.add_argument(
+        '--table', '-t',
+        action='append',
+        help='Only export the given table, can be repeated'
+    )
+    parser_store.set_defaults(func=command_store)
+
+    # lookup
+    parser_lookup = subparsers.add_parser(
+        'lookup',
+        help='Look up raw texts in the data tables through their sidecar index, optionally fixing a translation',
+    )
+    parser_lookup.add_argument(
+        'raw',
+        nargs='+',
+        help='Raw texts to look up'
+    )
+    parser_lookup.add_argument(
+        '--table', '-t',
+        action='append',
+        help='Only look in the given table, can be repeated (default: all tables)'
+    )
+    parser_lookup.add_argument(
+        '--data', '-d',
+        default='data',
+        help='Data directory containing translation JSON files (default: data)'
+    )
+    parser_lookup.add_argument(
+        '--store',
+        help='SQLite store to read and update instead of the JSON files'
+    )
+    parser_lookup.add_argument(
+        '--set',
+        metavar='TEXT',
+        help='Set the --locale translation of every occurrence to TEXT, patching only that item of each file'
+    )
+    parser_lookup.add_argument(
+        '--author',
+        default='',
+        help='Author recorded with --set (default: empty)'
+    )
+    parser_lookup.set_defaults(func=command_lookup)
+
+    # queue
+    parser_queue = subparsers.add_parser(
+        'queue',
+        help='Translate with several runners sharing a queue database, e.g. on an NFS mount',
+    )
+    parser_queue.add_argument(
+        'action',
+        choices=['init', 'run', 'status', 'merge'],
+        help='init: queue the untranslated texts of data, run: claim and translate leases, '
+             'status: show progress, merge: write the results into data once'
+    )
+    parser_queue.add_argument(
+        '--queue', '-q',
+        default=QUEUE_FILE,
+        help=f'Queue database shared by all runners (default: {QUEUE_FILE})'
+    )
+    parser_queue.add_argument(
+        '--data', '-d',
+        default='data',
+        help='Data directory containing translation JSON files (default: data)'
+    )
+    parser_queue.add_argument(
+        '--store',
+        help='SQLite store to read and update instead of the JSON files (init and merge)'
+    )
+    parser_queue.add_argument(
+        '--locales',
+        type=parse_locales,
+        help='Comma separated locales to queue (init, default: --locale)'
+    )
+    parser_queue.add_argument(
+        '--lease-items',
+        type=int,
+        default=48,
+        help='Unique texts per lease (init, default: 48)'
+    )
+    parser_queue.add_argument(
+        '--lease-seconds',
+        type=float,
+        default=600,
+        help='Lease expiry, renewed after every chunk; expired leases are claimed by other runners (run, default: 600)'
+    )
+    parser_queue.add_argument(
+        '--runner',
+        help='Runner name recorded with its results (run, default: <hostname>-<pid>)'
+    )
+    parser_queue.add_argument(
+        '--telemetry',
+        default=TELEMETRY_FILE,
+        help=f'JSONL file per-chunk telemetry is appended to, empty to disable (run, default: {TELEMETRY_FILE})'
+    )
+    parser_queue.add_argument(
+        '--router',
+        help='JSON file of several providers/models to route requests over by latency and errors '
+             '(run, see src/translate/router.py; default: Anthropic SDK from the environment)'
+    )
+    parser_queue.set_defaults(func=command_queue)
+    
+    # pipeline
+    parser_pipeline = subparsers.add_parser(
+        'pipeline',
+        help='Run the update workflow (convert, gentodo, export, pretranslate, import) per table, '
+             'skipping the tables whose inputs did not change',
+    )
+    parser_pipeline.add_argument(
+        'action',
+        choices=['run'],
+        help='run: run every node whose input files changed since its last run'
+    )
+    parser_pipeline.add_argument(
+        '--stages',
+        type=parse_stages,
+        help=f'Comma separated stages to run, the files of the others are used as they are (default: {",".join(PIPELINE_STAGES)})'
+    )
+    parser_pipeline.add_argument(
+        '--table', '-t',
+        action='append',
+        help='Only run the given table, can be repeated (default: all tables)'
+    )
+    parser_pipeline.add_argument(
+        '--data', '-d',
+        default='data',
+        help='Data directory containing translation JSON files (default: data)'
+    )
+    parser_pipeline.add_argument(
+        '--jobs', '-j',
+        type=int,
+        help='Worker processes running independent nodes in parallel, 1 runs them in this process (default: CPU count)'
+    )
+    parser_pipeline.add_argument(
+        '--force',
+        action='store_true',
+        help='Run every node even if its inputs did not change'
+    )
+    parser_pipeline.add_argument(
+        '--manifest',
+        default=PIPELINE_MANIFEST,
+        help=f'Manifest of node input keys and output hashes (default: {PIPELINE_MANIFEST})'
+    )
+    parser_pipeline.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Print the output of every node, not only of the failed ones'
+    )
+    parser_pipeline.set_defaults(func=command_pipeline)
+
     # generate
     parser_generate = subparsers.add_parser(
         'generate',
@@ -118,6 +594,12 @@ def main():
         return 1
     
     try:
+        if args.profile:
+            from src.perf import Profiler
+
+            output = Path(args.profile_output or f"profile-{args.command}")
+            with Profiler(args.profile, output, args.profile_top):
+                return args.func(args)
         return args.func(args)
     except Exception as e:
         print(f"Error occurred while executing command: {e}", file=sys.stderr)
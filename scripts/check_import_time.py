@@ -0,0 +1,105 @@
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+# 启动时不应加载的重量级模块（翻译 SDK 及其依赖）
+DEFAULT_FORBIDDEN = ["anthropic", "httpx", "pydantic", "requests"]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    解析 `python -X importtime` 的输出。
+    返回 [(模块名, 缩进层级, 累计耗时 us), ...]，只包含 import time 行。
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            # 表头行
+            continue
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        # 第一个空格是分隔符，之后每两个空格为一层嵌套
+        level = (len(name) - len(stripped) - 1) // 2
+        records.append((stripped, level, cumulative))
+    return records
+
+
+def run_importtime(args: List[str]) -> List[Tuple[str, int, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure(command: List[str], runs: int) -> Tuple[int, Dict[str, int], Set[str]]:
+    """
+    多次运行取最小值，扣除解释器本身启动 (`python -c pass`) 已加载的模块。
+    返回 (总耗时 us, 各顶层模块耗时, 加载的全部模块)
+    """
+    baseline = set()
+    for _ in range(runs):
+        baseline |= {name for name, _, _ in run_importtime(["-c", "pass"])}
+
+    best_total = None
+    best_modules: Dict[str, int] = {}
+    loaded: Set[str] = set()
+    for _ in range(runs):
+        records = run_importtime(command)
+        loaded |= {name for name, _, _ in records}
+        # 顶层模块的累计耗时已包含其所有子模块
+        modules = {
+            name: cumulative
+            for name, level, cumulative in records
+            if level == 0 and name not in baseline
+        }
+        total = sum(modules.values())
+        if best_total is None or total < best_total:
+            best_total = total
+            best_modules = modules
+    return best_total or 0, best_modules, loaded - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查 main.py 子命令的启动导入耗时")
+    parser.add_argument('--budget-ms', type=float, default=60.0, help='导入耗时预算，单位毫秒 (默认: 60)')
+    parser.add_argument('--runs', '-n', type=int, default=5, help='运行次数，取最小值 (默认: 5)')
+    parser.add_argument('--top', type=int, default=10, help='显示最慢的模块数量 (默认: 10)')
+    parser.add_argument('--forbid', default=",".join(DEFAULT_FORBIDDEN), help='不允许加载的模块，逗号分隔')
+    parser.add_argument('command', nargs='*', help='要检查的命令 (默认: main.py gentodo --help)')
+    args = parser.parse_args()
+
+    command = args.command or ["main.py", "gentodo", "--help"]
+    total, modules, loaded = measure(command, max(1, args.runs))
+
+    print(f"命令: python {' '.join(command)}")
+    print(f"导入耗时: {total / 1000:.1f} ms (预算 {args.budget_ms:.1f} ms, {args.runs} 次取最小值)")
+    for name, cumulative in sorted(modules.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    forbidden = [name for name in args.forbid.split(",") if name]
+    loaded_forbidden = sorted({name for name in loaded if name.split(".")[0] in forbidden})
+    if loaded_forbidden:
+        print(f"错误: 加载了不应在启动时导入的模块: {', '.join(loaded_forbidden[:10])}")
+        failed = True
+    if total > args.budget_ms * 1000:
+        print(f"错误: 导入耗时超出预算 {total / 1000 - args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
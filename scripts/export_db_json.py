@@ -4,6 +4,10 @@ import os
 import re
 import string
 
+# 使脚本直接运行时也能导入 src（性能分析的 span）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.perf import span
+
 def path_normalize_for_pk(path_str: str) -> str:
     """
     将像 'produceDescriptions[0].produceDescriptionType'
@@ -105,8 +109,9 @@ def ex_main(input_json, output_json):
         print(f"找不到输入文件: {input_json}")
         sys.exit(1)
 
-    with open(input_json, "r", encoding="utf-8") as f:
-        root = json.load(f)
+    with span("load"):
+        with open(input_json, "r", encoding="utf-8") as f:
+            root = json.load(f)
 
     if "rules" not in root or "primaryKeys" not in root["rules"]:
         print("缺少 rules.primaryKeys，可能不是预期结构")
@@ -118,12 +123,14 @@ def ex_main(input_json, output_json):
         sys.exit(1)
 
     export_dict = {}
-    for row in root["data"]:
-        row_dict = collect_translatable_text(row, primary_keys)
-        export_dict.update(row_dict)
-
-    with open(output_json, "w", encoding="utf-8") as out:
-        json.dump(export_dict, out, ensure_ascii=False, indent=2)
+    with span("extract"):
+        for row in root["data"]:
+            row_dict = collect_translatable_text(row, primary_keys)
+            export_dict.update(row_dict)
+
+    with span("serialize"):
+        with open(output_json, "w", encoding="utf-8") as out:
+            json.dump(export_dict, out, ensure_ascii=False, indent=2)
 
     print(f"导出完成: {output_json} (共 {len(export_dict)} 条)")
 
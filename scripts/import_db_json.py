@@ -2,6 +2,10 @@ import json
 import sys
 import os
 
+# 使脚本直接运行时也能导入 src（性能分析的 span）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.perf import span
+
 def fill_back_translations(data_obj, primary_keys, trans_map):
     """
     data_obj 是原本地化数据的一条记录；
@@ -67,11 +71,12 @@ def import_main(base_json, translated_json, output_json):
         print(f"找不到翻译文件: {translated_json}")
         sys.exit(1)
 
-    with open(base_json, "r", encoding="utf-8") as f1:
-        root = json.load(f1)
+    with span("load"):
+        with open(base_json, "r", encoding="utf-8") as f1:
+            root = json.load(f1)
 
-    with open(translated_json, "r", encoding="utf-8") as f2:
-        trans_map = json.load(f2)  # {"key": "translated text", ...}
+        with open(translated_json, "r", encoding="utf-8") as f2:
+            trans_map = json.load(f2)  # {"key": "translated text", ...}
 
     if "rules" not in root or "primaryKeys" not in root["rules"]:
         print("缺少 rules.primaryKeys，可能不是预期结构")
@@ -83,12 +88,14 @@ def import_main(base_json, translated_json, output_json):
         sys.exit(1)
 
     # 遍历 data 数组，一条一条地把翻译填回去
-    for row in root["data"]:
-        fill_back_translations(row, primary_keys, trans_map)
+    with span("merge"):
+        for row in root["data"]:
+            fill_back_translations(row, primary_keys, trans_map)
 
     # 写出新的 json
-    with open(output_json, "w", encoding="utf-8") as out:
-        json.dump(root, out, ensure_ascii=False, indent=2)
+    with span("serialize"):
+        with open(output_json, "w", encoding="utf-8") as out:
+            json.dump(root, out, ensure_ascii=False, indent=2)
 
     print(f"合并完成: {output_json}")
 
@@ -1,9 +1,17 @@
+import argparse
+import hashlib
 import os
+import pickle
+import sys
 import yaml
 import json
-from typing import List
+from typing import List, Optional
 from yaml.reader import Reader
 
+# 使脚本直接运行时也能导入 src（性能分析的 span）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.perf import span
+
 
 primary_key_rules = {
     "AdvDatas": [["Id"], ["Name"]],
@@ -228,6 +236,12 @@ primary_key_rules = {
 
 TestMode = False
 
+# 解析结果缓存：键为 YAML 文件内容哈希 + 加载器版本 + 该表的 primary_key_rules 规则
+# 修改 CustomLoader 或 convert_yaml_types 中的预处理时需要增加 LOADER_VERSION
+LOADER_VERSION = 1
+CACHE_DIR = ".cache/yaml-tables"
+CACHE_MAX_MB = 256
+
 class CustomLoader(yaml.SafeLoader):
     def __init__(self, stream):
         # 重写初始化以支持特定的控制字符
@@ -252,6 +266,15 @@ def save_json(data: list, name: str):
       2. 仅保留这些字段（拆分 '.' 处理嵌套/数组）。
       3. 如果 TestMode = True，则对「非主键列表」中的字符串或字符串数组，追加 "TEST"。
     """
+    processed_data = filter_records(data, name)
+    if processed_data is None:
+        return
+    return write_json(processed_data, name)
+
+def filter_records(data: list, name: str) -> Optional[list]:
+    """
+    save_json 的 1~3 步：返回过滤并排序后的记录，没有数据或没有规则时返回 None
+    """
     if not data:
         return
 
@@ -267,37 +290,55 @@ def save_json(data: list, name: str):
     all_keys = primary_keys + other_keys
 
     processed_data = []
-    for record in data:
-        # 为当前 record 构造一个新对象，只包含需要的字段
-        filtered_record = filter_record_fields(
-            record,
-            all_keys,
-            primary_keys,
-            other_keys
-        )
-        processed_data.append(filtered_record)
+    with span("extract"):
+        for record in data:
+            # 为当前 record 构造一个新对象，只包含需要的字段
+            filtered_record = filter_record_fields(
+                record,
+                all_keys,
+                primary_keys,
+                other_keys
+            )
+            processed_data.append(filtered_record)
 
     # Make first data has all key
     # This can be removed when app can parse all key(also key type) properly.
     # Currently there is a bug on finding type and find local key from data
     # We must make first data has all key
-    if not sort_records_fields(processed_data, all_keys):
-        print(f"Failed to find super key object from {name}")
+    with span("sort"):
+        if not sort_records_fields(processed_data, all_keys):
+            print(f"Failed to find super key object from {name}")
+    return processed_data
 
+def write_json(processed_data: list, name: str) -> str:
+    """
+    把过滤后的记录写入 link-like-diff/json/{name}.json
+    """
     # 生成最终的 JSON 结构
     result = {
         "rules": {
-            "primaryKeys": primary_keys
+            "primaryKeys": primary_key_rules[name][0]
         },
         "data": processed_data
     }
 
     # 写入 JSON 文件
     os.makedirs('./link-like-diff/json', exist_ok=True)
-    with open(f'link-like-diff/json/{name}.json', 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=4)
+    with span("serialize"):
+        with open(json_file(name), 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=4)
+    return json_file(name)
+
+def json_file(name: str) -> str:
     return f'link-like-diff/json/{name}.json'
 
+def _file_stat(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
 def sort_records_fields(records: List[dict], field_paths: list):
     def hasPaths(record:dict, path:list):
         if not path:
@@ -446,13 +487,119 @@ def transform_value_for_test_mode(value):
     return value
 
 
+class TableCache:
+    """
+    解析结果缓存，每个 YAML 文件一个条目 `{表名}.{键}.pickle`。
+
+    条目内依次存放两个 pickle 对象：写出的 json 文件的 (大小, mtime_ns)，以及过滤后的记录。
+    命中且 json 文件没有变化时只读取第一个对象，跳过解析和 save_json；json 文件不存在或
+    被改动过时直接用缓存的记录重新写出。总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(content: bytes, name: str) -> str:
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps([LOADER_VERSION, yaml.__version__, TestMode, primary_key_rules.get(name)]).encode())
+        return digest.hexdigest()
+
+    def _path(self, name: str, key: str) -> str:
+        return os.path.join(self.directory, f"{name}.{key}.pickle")
+
+    def restore(self, name: str, key: str) -> bool:
+        """命中时保证 json 文件是最新的并返回 True，未命中返回 False"""
+        path = self._path(name, key)
+        try:
+            with open(path, 'rb') as f:
+                output = pickle.load(f)
+                if output is not None and _file_stat(json_file(name)) != output:
+                    records = pickle.load(f)
+                    write_json(records, name)
+                    self.store(name, key, records)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        except Exception as e:
+            # 条目损坏，当作未命中
+            print(f"缓存条目 {path} 无法读取，已删除: {e}")
+            os.remove(path)
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, name: str, key: str, records: Optional[list]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name, key)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(_file_stat(json_file(name)) if records is not None else None, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(records, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def evict(self) -> None:
+        """删除最久未使用的条目，直到总大小不超过 max_bytes"""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+
+
+def convert_yaml_file(file_path: str, name: str, cache: Optional[TableCache] = None) -> Optional[str]:
+    """
+    把一个 YAML 文件转换为 link-like-diff/json/{name}.json，返回 json 文件，没有数据或规则时返回 None
+    """
+    with span("load"):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    # 内容和规则都没有变化时直接使用缓存
+    key = None
+    if cache is not None:
+        key = cache.key(content.encode('utf-8'), name)
+        if cache.restore(name, key):
+            return json_file(name) if os.path.exists(json_file(name)) else None
+    # 预处理文件：替换制表符为 4 个空格
+    with span("load"):
+        # content = content.replace('\t', '    ')  # 替换制表符
+        content = content.replace(": \t", ": \"\t\"")  # 替换制表符
+        content = content.replace("|\n", "|+\n") # Fix literal strings newline chomping
+
+        # 解析 YAML 内容
+        # data = yaml.safe_load(content)
+        data = yaml.load(content, CustomLoader)
+    records = filter_records(data, name)
+    output = write_json(records, name) if records is not None else None
+    if cache is not None:
+        cache.store(name, key, records)
+    return output
+
+
 # process_list = ["ProduceStepLesson", "SupportCardFlavor"]
 process_list = None
 
-def convert_yaml_types(folder_path="./link-like-diff/orig"):
+def convert_yaml_types(folder_path="./link-like-diff/orig", cache: Optional[TableCache] = None):
     """
     遍历指定文件夹中的所有 YAML 文件，加载它们的内容，并打印每个文件的类型。
     自动替换 YAML 文件中的制表符为空格。
+    没有 primary_key_rules 规则的表不会生成 json，直接跳过不解析。
+    传入 cache 时内容和规则都没有变化的表跳过解析和写入。
     """
     if not os.path.isdir(folder_path):
         print(f"路径 '{folder_path}' 不是一个有效的文件夹。")
@@ -465,6 +612,9 @@ def convert_yaml_types(folder_path="./link-like-diff/orig"):
                 if process_list:
                     if file[:-5] not in process_list:
                         continue
+                name = file[:-5]
+                if name not in primary_key_rules:
+                    continue
 
                 file_path = os.path.join(root, file)
                 # print(f"\"{file[:-5]}\": [[], []],")
@@ -472,23 +622,19 @@ def convert_yaml_types(folder_path="./link-like-diff/orig"):
 
                 print("Generating", file_path, f"to json. ({n}/{total})")
                 try:
-                    # 预处理文件：替换制表符为 4 个空格
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    # content = content.replace('\t', '    ')  # 替换制表符
-                    content = content.replace(": \t", ": \"\t\"")  # 替换制表符
-                    content = content.replace("|\n", "|+\n") # Fix literal strings newline chomping
-
-                    # 解析 YAML 内容
-                    # data = yaml.safe_load(content)
-                    data = yaml.load(content, CustomLoader)
-                    save_json(data, file[:-5])
-
-                    # print(f"文件: {file_path}")
-                    # print(f"类型: {type(data)}\n")
+                    convert_yaml_file(file_path, name, cache)
                 except Exception as e:
                     print(f"加载文件 {file_path} 时出错: {e}")
 
+    if cache is not None:
+        cache.evict()
+        print(f"解析缓存: 命中 {cache.hits}，未命中 {cache.misses}，淘汰 {cache.evictions}")
+
 
 if __name__ == '__main__':
-    convert_yaml_types()
+    parser = argparse.ArgumentParser(description="把 link-like-diff/orig 中的 YAML 转换为 link-like-diff/json")
+    parser.add_argument('--no-cache', action='store_true', help='不使用解析缓存，重新解析全部 YAML')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f'解析缓存目录 (默认: {CACHE_DIR})')
+    parser.add_argument('--cache-max-mb', type=float, default=CACHE_MAX_MB, help=f'解析缓存大小上限 MB，超过时淘汰最久未使用的条目 (默认: {CACHE_MAX_MB})')
+    args = parser.parse_args()
+    convert_yaml_types(cache=None if args.no_cache else TableCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024)))
@@ -51,19 +51,26 @@ def pretranslated_to_kv_files(
             with open(translated_file, 'r', encoding='utf-8') as f:
                 translated_data = json.load(f)  # 日文: 原文
 
-            with open(orig_file, 'r', encoding='utf-8') as f:
-                orig_data = json.load(f)  # key: 日文
-
-            for k, orig_jp in orig_data.items():
-                orig_data[k] = translated_data.get(orig_jp, orig_jp)
-
-            with open(save_file, 'w', encoding='utf-8') as f:
-                json.dump(orig_data, f, ensure_ascii=False, indent=4)
+            pretranslated_to_kv_file(orig_file, translated_data, save_file)
 
             print("合并文件", name)
     print("合并完成，接下来请执行 import_db_json 将翻译文件导回")
 
 
+def pretranslated_to_kv_file(orig_file: str, translated_data: dict, save_file: str):
+    """
+    key: 日文 文件按 日文: 译文 转为 key: 译文，没有译文的保留日文
+    """
+    with open(orig_file, 'r', encoding='utf-8') as f:
+        orig_data = json.load(f)  # key: 日文
+
+    for k, orig_jp in orig_data.items():
+        orig_data[k] = translated_data.get(orig_jp, orig_jp)
+
+    with open(save_file, 'w', encoding='utf-8') as f:
+        json.dump(orig_data, f, ensure_ascii=False, indent=4)
+
+
 def gen_todo(new_files_dir: str):
     """
     生成未翻译过的 jp: "" 文件
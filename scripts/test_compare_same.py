@@ -1,14 +1,129 @@
+import argparse
+import hashlib
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 
-def compare_json_folders(folder1, folder2):
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_REPORTED_KEYS = 20
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    流式计算文件的 sha256，计算前对字节做规范化：
+    去掉 UTF-8 BOM，并将 CRLF 统一为 LF，避免仅因换行风格不同而判定为不一致。
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        head = f.read(3)
+        if head != b'\xef\xbb\xbf':
+            f.seek(0)
+        pending_cr = False
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if pending_cr:
+                chunk = b'\r' + chunk
+            # 末尾的 \r 可能与下一块开头的 \n 组成 CRLF，留到下一块处理
+            pending_cr = chunk.endswith(b'\r')
+            if pending_cr:
+                chunk = chunk[:-1]
+            digest.update(chunk.replace(b'\r\n', b'\n'))
+        if pending_cr:
+            digest.update(b'\r')
+    return digest.hexdigest()
+
+
+def index_records(data):
+    """
+    将 JSON 内容转换为 { 记录键: 记录 } 的字典，用于定位具体哪些记录不同。
+    - data/ 翻译文件: [{"raw": ..., "translation": ...}]，以 raw 为键
+    - link-like-diff/json 文件: {"rules": {"primaryKeys": [...]}, "data": [...]}，以主键拼接为键
+    - export 导出文件: {key: value}，直接使用 key
+    """
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        primary_keys = data.get("rules", {}).get("primaryKeys", [])
+        records = {}
+        for idx, row in enumerate(data["data"]):
+            if primary_keys and isinstance(row, dict):
+                key = "|".join(str(row.get(pk, "")) for pk in primary_keys)
+            else:
+                key = f"[{idx}]"
+            records[key] = row
+        return records
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, list):
+        records = {}
+        for idx, item in enumerate(data):
+            if isinstance(item, dict) and "raw" in item:
+                records[item["raw"]] = item
+            else:
+                records[f"[{idx}]"] = item
+        return records
+    return {"": data}
+
+
+def diff_record_keys(json1, json2):
+    """
+    结构化比较两个 JSON 内容，返回 (仅在1中的键, 仅在2中的键, 内容不同的键)
+    """
+    records1 = index_records(json1)
+    records2 = index_records(json2)
+    only_in_1 = sorted(k for k in records1 if k not in records2)
+    only_in_2 = sorted(k for k in records2 if k not in records1)
+    changed = sorted(k for k in records1 if k in records2 and records1[k] != records2[k])
+    return only_in_1, only_in_2, changed
+
+
+def compare_file(path1, path2, fast=True):
+    """
+    比较单个文件。fast 模式下先比较规范化字节的哈希，只有不一致时才解析 JSON 做结构化比较。
+    不先比较文件大小：BOM 或 CRLF 不同的文件大小一定不同，但规范化后的哈希可以一致。
+
+    Returns:
+        tuple: (是否一致, 差异详情或 None)
+    """
+    if fast and hash_file(path1) == hash_file(path2):
+        return True, None
+
+    with open(path1, 'r', encoding='utf-8-sig') as f1, open(path2, 'r', encoding='utf-8-sig') as f2:
+        json1 = json.load(f1)
+        json2 = json.load(f2)
+
+    if json1 == json2:
+        return True, None
+
+    only_in_1, only_in_2, changed = diff_record_keys(json1, json2)
+    if not (only_in_1 or only_in_2 or changed):
+        # 记录内容一致但顺序不同
+        changed = ["<order>"]
+    return False, {
+        "only_in_folder1": only_in_1,
+        "only_in_folder2": only_in_2,
+        "changed": changed,
+    }
+
+
+def _compare_task(args):
+    file_name, path1, path2, fast = args
+    try:
+        return file_name, compare_file(path1, path2, fast), None
+    except Exception as e:
+        return file_name, None, e
+
+
+def compare_json_folders(folder1, folder2, fast=True, workers=None):
     """
     比较两个文件夹中的 JSON 文件内容是否一致。
 
     Args:
         folder1 (str): 第一个文件夹路径。
         folder2 (str): 第二个文件夹路径。
+        fast (bool): 是否先用规范化字节的哈希快速判断，只对不一致的文件做结构化比较。
+        workers (int): 并行比较的进程数，None 为 CPU 核数，1 为串行。
 
     Returns:
         dict: 返回一个字典，包含比较结果：
@@ -16,12 +131,14 @@ def compare_json_folders(folder1, folder2):
             - "mismatched": 内容不同的文件列表。
             - "missing_in_folder2": 在 folder1 中存在但在 folder2 中不存在的文件列表。
             - "missing_in_folder1": 在 folder2 中存在但在 folder1 中不存在的文件列表。
+            - "details": { 文件名: {"only_in_folder1", "only_in_folder2", "changed"} }，不同的记录键。
     """
     result = {
         "matched": [],
         "mismatched": [],
         "missing_in_folder2": [],
-        "missing_in_folder1": []
+        "missing_in_folder1": [],
+        "details": {}
     }
 
     # 获取两个文件夹中的 JSON 文件名
@@ -29,37 +146,80 @@ def compare_json_folders(folder1, folder2):
     files2 = {f for f in os.listdir(folder2) if f.endswith('.json')}
 
     # 找出仅存在于一个文件夹中的文件
-    result["missing_in_folder2"] = list(files1 - files2)
-    result["missing_in_folder1"] = list(files2 - files1)
+    result["missing_in_folder2"] = sorted(files1 - files2)
+    result["missing_in_folder1"] = sorted(files2 - files1)
 
-    # 比较两个文件夹中共有文件的内容
-    common_files = files1 & files2
+    # 比较两个文件夹中共有文件的内容，大文件优先提交以均衡各进程负载
+    common_files = sorted(
+        files1 & files2,
+        key=lambda name: os.path.getsize(os.path.join(folder1, name)),
+        reverse=True
+    )
+    tasks = [
+        (file_name, os.path.join(folder1, file_name), os.path.join(folder2, file_name), fast)
+        for file_name in common_files
+    ]
 
-    for file_name in common_files:
-        path1 = os.path.join(folder1, file_name)
-        path2 = os.path.join(folder2, file_name)
+    if workers == 1 or len(tasks) <= 1:
+        outcomes = map(_compare_task, tasks)
+        for file_name, outcome, error in outcomes:
+            _collect_outcome(result, file_name, outcome, error)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_name, outcome, error in executor.map(_compare_task, tasks):
+                _collect_outcome(result, file_name, outcome, error)
 
-        try:
-            with open(path1, 'r', encoding='utf-8') as f1, open(path2, 'r', encoding='utf-8') as f2:
-                json1 = json.load(f1)
-                json2 = json.load(f2)
+    result["matched"].sort()
+    result["mismatched"].sort()
+    return result
 
-            if json1 == json2:
-                result["matched"].append(file_name)
-            else:
-                result["mismatched"].append(file_name)
-        except Exception as e:
-            print(f"Error comparing {file_name}: {e}")
 
-    return result
+def _collect_outcome(result, file_name, outcome, error):
+    if error is not None:
+        print(f"Error comparing {file_name}: {error}")
+        return
+    same, detail = outcome
+    if same:
+        result["matched"].append(file_name)
+    else:
+        result["mismatched"].append(file_name)
+        result["details"][file_name] = detail
+
+
+def print_comparison(comparison_result, max_keys=MAX_REPORTED_KEYS):
+    print("Matched files:", comparison_result["matched"])
+    print("Mismatched files:", comparison_result["mismatched"])
+    print("Missing in folder2:", comparison_result["missing_in_folder2"])
+    print("Missing in folder1:", comparison_result["missing_in_folder1"])
+
+    for file_name, detail in comparison_result["details"].items():
+        print(f"\n{file_name}:")
+        for label in ("only_in_folder1", "only_in_folder2", "changed"):
+            keys = detail[label]
+            if not keys:
+                continue
+            print(f"  {label} ({len(keys)}):")
+            for key in keys[:max_keys]:
+                print(f"    - {key!r}")
+            if len(keys) > max_keys:
+                print(f"    ... {len(keys) - max_keys} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较两个文件夹中的 JSON 文件")
+    parser.add_argument('folder1', nargs='?', help='文件夹1')
+    parser.add_argument('folder2', nargs='?', help='文件夹2')
+    parser.add_argument('--full', action='store_true', help='跳过哈希快速比较，总是解析 JSON')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='并行进程数 (默认: CPU 核数)')
+    args = parser.parse_args()
 
+    folder1 = args.folder1 or input("文件夹1: ")
+    folder2 = args.folder2 or input("文件夹2: ")
+    comparison_result = compare_json_folders(folder1, folder2, fast=not args.full, workers=args.workers)
+    print_comparison(comparison_result)
+    return 1 if comparison_result["mismatched"] else 0
 
-folder1 = input("文件夹1: ")
-folder2 = input("文件夹2: ")
-comparison_result = compare_json_folders(folder1, folder2)
 
-print("Matched files:", comparison_result["matched"])
-print("Mismatched files:", comparison_result["mismatched"])
-print("Missing in folder2:", comparison_result["missing_in_folder2"])
-print("Missing in folder1:", comparison_result["missing_in_folder1"])
+if __name__ == "__main__":
+    raise SystemExit(main())
 # Mismatched files: ['ProduceChallengeSlot.json', 'ProduceNavigation.json', 'ProduceCardCustomize.json']
@@ -2,9 +2,17 @@ from typing import Set, Tuple
 from pathlib import Path
 import os
 import json
+from src.model.localization import iter_translations
+from src.perf import span
 
 
 def load_json_as_sets(file_path: Path, key = "raw") -> Set[str]:
+    if key == "raw":
+        try:
+            return {raw for raw, *_ in iter_translations(file_path)}
+        except ValueError:
+            # Not a translation table, e.g. a plain list of raw strings
+            pass
     with open(file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
         if not isinstance(data, list):
@@ -18,17 +26,7 @@ def load_json_as_sets(file_path: Path, key = "raw") -> Set[str]:
         return res
 
 def load_locale_count(file_path: Path, locale = "zh-CN") -> int:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        if not isinstance(data, list):
-            raise ValueError("Invalid locale json format")
-        count = 0
-        for item in data:
-            if not isinstance(item, dict):
-                continue
-            if locale in item["translation"] and item["translation"][locale]["text"]:
-                count += 1
-        return count
+    return sum(1 for _, item_locale, text, _ in iter_translations(file_path) if item_locale == locale and text)
 
 def analyze_translation_progress(data_dir: Path, locale: str = "zh-CN")-> Tuple[int, int]: 
     """
@@ -53,8 +51,11 @@ def analyze_translation_progress(data_dir: Path, locale: str = "zh-CN")-> Tuple[
     
     for json_file in json_files:
         try:
-            raw_strings.update(load_json_as_sets(json_file, "raw"))
-            translated_strings += load_locale_count(json_file, locale)
+            with span("load"):
+                for raw, item_locale, text, _ in iter_translations(json_file):
+                    raw_strings.add(raw)
+                    if item_locale == locale and text:
+                        translated_strings += 1
         except Exception as e:
             print(f"Error processing file {json_file}: {e}")
             continue
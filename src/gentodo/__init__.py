@@ -1,6 +1,7 @@
 import json
 import re
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 def extract_japanese_texts(data):
     """
@@ -77,124 +78,268 @@ def is_japanese_text(text):
                 return True
     return False
 
-def basic_gen_file(input_file: Path, output_file: Path):
+class _UnsortedError(Exception):
+    pass
+
+
+def _sorted_items(file: Path) -> Iterator["TranslatedItem"]:
+    """Stream the items of a table, raising `_UnsortedError` unless they are strictly sorted by raw text"""
+    from ..model.localization import iter_items
+
+    previous = None
+    for item in iter_items(file):
+        if previous is not None and item.raw <= previous:
+            raise _UnsortedError(item.raw)
+        previous = item.raw
+        yield item
+
+
+def _translated_variants(items: Iterable["TranslatedItem"], keys: set) -> Dict[str, "TranslatedItem"]:
+    """First translated item of every canonical key in `keys`"""
+    from ..model.canonical import canonical_key
+
+    variants = {}
+    for item in items:
+        if any(item.has_text(locale) for locale in item.locales):
+            key = canonical_key(item.raw)
+            if key in keys:
+                variants.setdefault(key, item)
+    return variants
+
+
+def _merge_items(
+    texts: List[str],
+    existing_items: Iterable["TranslatedItem"],
+    archived_items: dict,
+    prune: bool,
+    locales: Tuple[str, ...],
+    counts: Dict[str, int],
+    variants: Dict[str, "TranslatedItem"] = None
+) -> Iterator["TranslatedItem"]:
+    """
+    Two-way merge of the sorted existing items and the sorted new texts
+
+    Existing items that weren't in the new extraction preserve their translations, or are moved
+    to `archived_items` when pruning. Archived texts extracted again are restored from it. New
+    texts whose canonical key is in `variants` copy the translations of that item, as `variant_author`.
+    """
+    from ..model.canonical import canonical_key, variant_author
+    from ..model.localization import TranslatedItem
+
+    def keep_orphan(item: TranslatedItem) -> bool:
+        if prune:
+            # Untranslated orphans carry nothing worth keeping
+            counts["pruned"] += 1
+            if any(item.has_text(locale) for locale in item.locales):
+                archived_items[item.raw] = item
+                counts["archived"] += 1
+            return False
+        # Still need to check for missing language keys in preserved items
+        if item.ensure_locales(locales):
+            counts["updated"] += 1
+        return True
+
+    existing = iter(existing_items)
+    item = next(existing, None)
+    for text in texts:
+        while item is not None and item.raw < text:
+            if keep_orphan(item):
+                yield item
+            item = next(existing, None)
+        if item is not None and item.raw == text:
+            # Update existing item with any missing language keys
+            if item.ensure_locales(locales):
+                counts["updated"] += 1
+            yield item
+            item = next(existing, None)
+        elif text in archived_items:
+            # Extracted again, restore the archived translations
+            counts["restored"] += 1
+            restored_item = archived_items.pop(text)
+            restored_item.ensure_locales(locales)
+            yield restored_item
+        else:
+            # Create new item
+            counts["new"] += 1
+            source = variants.get(canonical_key(text)) if variants else None
+            if source is None:
+                yield TranslatedItem.empty(text, locales)
+                continue
+            # Width or spacing variant of a translated text
+            counts["variants"] += 1
+            new_item = TranslatedItem.empty(text, source.locales)
+            for locale, translated, _ in source.translations():
+                if source.has_text(locale):
+                    new_item.set_translation(locale, translated, variant_author)
+            new_item.ensure_locales(locales)
+            yield new_item
+    while item is not None:
+        if keep_orphan(item):
+            yield item
+        item = next(existing, None)
+
+
+def basic_gen_file(input_file: Path, output_file: Path, prune: bool = False, archive_file: Path = None, stats: dict = None, raise_errors: bool = False):
     """
     Process a single JSON file, extract Japanese text and generate TranslatedItem list with incremental updates
+
+    Existing items no longer extracted are kept, unless `prune` is set: then translated ones are moved
+    to `archive_file` and untranslated ones dropped. Archived items extracted again are restored with
+    their translations. New texts that are width or spacing variants of a translated item of the table
+    or the archive (same `canonical_key`) get its translations. Counts and file sizes are added to
+    `stats` when given. Errors are printed and 0 returned, unless `raise_errors` is set.
     """
-    from ..model.localization import TranslatedItem, I18nLanguage
+    from ..model.canonical import canonical_key
+    from ..model.localization import TranslatedItem, default_locales, iter_items, load_items, dump_items, load_archive, dump_archive
+    from ..perf import span
     
     try:
         # Read JSON file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with span("load"):
+            with open(input_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         
         # Extract Japanese text
-        japanese_texts = extract_japanese_texts(data)
+        with span("extract"):
+            japanese_texts = extract_japanese_texts(data)
         
         # Remove duplicates and sort Japanese texts
-        unique_texts = sorted(list(set(japanese_texts)))
-        
-        # Load existing output file if it exists
-        existing_items = {}
-        existing_raw_set = set()
+        with span("sort"):
+            unique_texts = sorted(list(set(japanese_texts)))
         
-        if output_file.exists():
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-                    for item_data in existing_data:
-                        raw_text = item_data.get("raw", "")
-                        existing_raw_set.add(raw_text)
-                        existing_items[raw_text] = item_data
-            except Exception as e:
-                print(f"Warning: Could not read existing output file {output_file}: {e}")
+        size_before = output_file.stat().st_size if output_file.exists() else 0
         
         # Get all available I18nLanguage values for consistency
-        all_languages = set(I18nLanguage)
-        
-        # Create or update TranslatedItems
-        updated_items = {}
-        new_items_count = 0
-        updated_items_count = 0
-        
-        # Process new Japanese texts
-        for text in unique_texts:
-            if text in existing_items:
-                # Update existing item with any missing language keys
-                existing_item = existing_items[text]
-                translation = existing_item.get("translation", {})
-                
-                # Check if we need to add missing language keys
-                needs_update = False
-                for lang in all_languages:
-                    lang_key = lang.value
-                    if lang_key not in translation:
-                        translation[lang_key] = {"text": "", "author": ""}
-                        needs_update = True
-                
-                if needs_update:
-                    updated_items_count += 1
-                    existing_item["translation"] = translation
-                
-                updated_items[text] = existing_item
-            else:
-                # Create new item
-                new_items_count += 1
-                new_item = {
-                    "raw": text,
-                    "translation": {
-                        lang.value: {"text": "", "author": ""}
-                        for lang in all_languages
-                    }
-                }
-                updated_items[text] = new_item
-        
-        # Add existing items that weren't in the new extraction (preserve existing translations)
-        for raw_text, item_data in existing_items.items():
-            if raw_text not in updated_items:
-                # Still need to check for missing language keys in preserved items
-                translation = item_data.get("translation", {})
-                needs_update = False
-                
-                for lang in all_languages:
-                    lang_key = lang.value
-                    if lang_key not in translation:
-                        translation[lang_key] = {"text": "", "author": ""}
-                        needs_update = True
-                
-                if needs_update:
-                    updated_items_count += 1
-                    item_data["translation"] = translation
-                
-                updated_items[raw_text] = item_data
-        
-        # Sort all items by raw text for consistent output
-        sorted_items = [updated_items[key] for key in sorted(updated_items.keys())]
-        
-        # Ensure output directory exists
-        output_file.parent.mkdir(parents=True, exist_ok=True)
+        all_languages = default_locales()
+
+        # Translated items whose canonical key matches an extracted text, to fill new variants
+        with span("canonical"):
+            text_keys = {canonical_key(text) for text in unique_texts}
+            table_variants = {}
+            if output_file.exists():
+                try:
+                    table_variants = _translated_variants(iter_items(output_file), text_keys)
+                except ValueError:
+                    pass
+
+        def write(existing_items: Iterable[TranslatedItem]) -> Tuple[int, Dict[str, int], dict]:
+            """Merge the existing items with the new texts and write results to JSON file item by item"""
+            archived_items = {}
+            if archive_file is not None:
+                with span("load"):
+                    archived_items = {item.raw: item for item in load_archive(archive_file)}
+            variants = {**_translated_variants(archived_items.values(), text_keys), **table_variants}
+            counts = dict.fromkeys(("new", "updated", "restored", "variants", "pruned", "archived"), 0)
+            with span("merge"):
+                total = dump_items(_merge_items(unique_texts, existing_items, archived_items, prune, all_languages, counts, variants), output_file)
+            return total, counts, archived_items
+
+        # The existing output file is streamed while it is rewritten, it is already sorted by raw text
+        try:
+            total_items, counts, archived_items = write(_sorted_items(output_file) if output_file.exists() else [])
+        except _UnsortedError:
+            # Edited by hand: deduplicate (last one wins) and sort before merging
+            with span("sort"):
+                deduplicated = {item.raw: item for item in load_items(output_file)}
+                existing_items = [deduplicated[raw] for raw in sorted(deduplicated)]
+            total_items, counts, archived_items = write(existing_items)
+        except ValueError as e:
+            print(f"Warning: Could not read existing output file {output_file}: {e}")
+            total_items, counts, archived_items = write([])
         
-        # Write results to JSON file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(sorted_items, f, ensure_ascii=False, indent=2)
+        with span("serialize"):
+            if archive_file is not None and (counts["pruned"] or counts["restored"]):
+                if archived_items:
+                    dump_archive(archived_items.values(), archive_file)
+                elif archive_file.exists():
+                    archive_file.unlink()
+        size_after = output_file.stat().st_size
         
         # Log incremental update statistics
-        total_items = len(sorted_items)
         print(f"  Incremental update stats:")
-        print(f"    - New items added: {new_items_count}")
-        print(f"    - Existing items updated: {updated_items_count}")
+        print(f"    - New items added: {counts['new']}")
+        print(f"    - Existing items updated: {counts['updated']}")
+        if counts["restored"]:
+            print(f"    - Items restored from archive: {counts['restored']}")
+        if counts["variants"]:
+            print(f"    - New items translated as variants of existing ones: {counts['variants']}")
+        if prune:
+            print(f"    - Orphaned items pruned: {counts['pruned']} ({counts['archived']} archived), "
+                  f"{size_before} -> {size_after} bytes")
         print(f"    - Total items in file: {total_items}")
+
+        if stats is not None:
+            for key, value in (("pruned", counts["pruned"]), ("restored", counts["restored"]), ("variants", counts["variants"]), ("bytes_before", size_before), ("bytes_after", size_after)):
+                stats[key] = stats.get(key, 0) + value
         
-        return new_items_count
+        return counts["new"]
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing file {input_file}: {e}")
         return 0
 
 
-def basic_gen(input_dir: Path, output_dir: Path):
+def gen_suggestions(data_dir: Path, output_file: Path, threshold: float, archive_dir: Path = None):
+    """
+    Attach the best translation memory match to every untranslated item of the data directory
+
+    Writes one JSON line per untranslated (table, raw, locale) with a match scoring at least
+    `threshold`: the similar translated raw text, its translation and the similarity score.
+    The pruned items of `archive_dir` are searched as well.
+    Returns the number of suggestions written.
+    """
+    import time
+    from ..model.localization import default_locales, load_items
+    from ..translate.memory import TranslationMemory, archived_items
+
+    started = time.perf_counter()
+    locales = default_locales()
+    tables = {file.stem: load_items(file) for file in sorted(Path(data_dir).glob("*.json"))}
+    memory = TranslationMemory.from_items((item for items in tables.values() for item in items), locales)
+    if archive_dir is not None:
+        for item in archived_items(archive_dir):
+            memory.add(item)
+    built = time.perf_counter()
+
+    count = 0
+    queried = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for table, items in tables.items():
+            for item in items:
+                for locale in locales:
+                    if item.has_text(locale):
+                        continue
+                    queried += 1
+                    match = memory.match(item.raw, locale, threshold)
+                    if match is None:
+                        continue
+                    f.write(json.dumps({
+                        "table": table,
+                        "raw": item.raw,
+                        "locale": locale,
+                        "match": match.raw,
+                        "text": match.text,
+                        "author": match.author,
+                        "score": round(match.score, 4),
+                    }, ensure_ascii=False) + "\n")
+                    count += 1
+
+    print(f"Translation memory: indexed {len(memory)} translations in {built - started:.2f}s, "
+          f"{count}/{queried} untranslated items matched (score >= {threshold}) in {time.perf_counter() - built:.2f}s")
+    print(f"- Suggestions written to: {output_file}")
+    return count
+
+
+def basic_gen(input_dir: Path, output_dir: Path, suggest_threshold: float = None, suggest_file: Path = None, prune: bool = False, archive_dir: Path = None):
     """
     Recursively process all JSON files in input directory, maintaining file structure
+
+    With `prune`, items no longer extracted are moved to a per-table archive in `archive_dir`
+    (`<Table>.jsonl`), archived items extracted again are restored from it.
+    With `suggest_threshold`, the untranslated items are then matched against a translation
+    memory of the output directory and archive, and the suggestions written to `suggest_file`
     """
     input_dir = Path(input_dir)
     output_dir = Path(output_dir)
@@ -210,6 +355,7 @@ def basic_gen(input_dir: Path, output_dir: Path):
     # Statistics for processed files and extracted Japanese items
     processed_files = 0
     total_japanese_items = 0
+    stats = {}
     
     # Recursively find all JSON files
     json_files = list(input_dir.rglob("*.json"))
@@ -231,7 +377,8 @@ def basic_gen(input_dir: Path, output_dir: Path):
             print(f"Processing file: {json_file} -> {output_file}")
             
             # Process single file
-            item_count = basic_gen_file(json_file, output_file)
+            archive_file = Path(archive_dir) / relative_path.with_suffix(".jsonl") if archive_dir is not None else None
+            item_count = basic_gen_file(json_file, output_file, prune, archive_file, stats)
             
             if item_count > 0:
                 processed_files += 1
@@ -248,3 +395,16 @@ def basic_gen(input_dir: Path, output_dir: Path):
     print(f"- Successfully processed files: {processed_files}")
     print(f"- Total Japanese items extracted: {total_japanese_items}")
     print(f"- Output directory: {output_dir}")
+    if stats.get("restored"):
+        print(f"- Items restored from archive: {stats['restored']}")
+    if stats.get("variants"):
+        print(f"- New items translated as variants of existing ones: {stats['variants']}")
+    if prune:
+        before = stats.get("bytes_before", 0)
+        after = stats.get("bytes_after", 0)
+        reduction = (1 - after / before) * 100 if before else 0.0
+        print(f"- Orphaned items pruned: {stats.get('pruned', 0)}, archived to {archive_dir}")
+        print(f"- Data size: {before} -> {after} bytes ({reduction:.1f}% smaller)")
+
+    if suggest_threshold is not None:
+        gen_suggestions(output_dir, Path(suggest_file), suggest_threshold, archive_dir)
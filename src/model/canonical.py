@@ -0,0 +1,63 @@
+"""
+Canonical form of raw texts, used as a grouping key
+
+Master data spells the same text in several ways: full-width and half-width
+letters, digits and punctuation (`！`/`!`, `？`/`?`, `１`/`1`), no-break or
+ideographic spaces and doubled or trailing spaces. `canonical_key` maps these
+variants to one key so they are extracted, looked up and translated once; the
+original raw texts are kept as they are for writing back.
+
+The key is NFKC plus the project rules below. `$…$` markup (skill values such
+as `$32.4%$`) is kept verbatim.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+# Author of translations copied from a width or spacing variant, counted as machine
+# translations so a reviewed text does not vouch for its variants
+variant_author = "canonical-variant"
+
+_markup_pattern = re.compile(r"\$[^$\n]*\$")
+# Runs of spaces, line breaks are kept since translations follow them
+_space_pattern = re.compile(r"[^\S\n]+")
+
+# Characters NFKC keeps apart but the master data uses interchangeably
+_project_rules = str.maketrans({
+    "〜": "~",  # 〜 wave dash, NFKC already maps ～ to ~
+    "−": "-",  # − minus sign
+})
+
+
+def _canonical_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).translate(_project_rules)
+    return _space_pattern.sub(" ", text)
+
+
+def canonical_key(raw: str) -> str:
+    """
+    Grouping key of a raw text
+
+    Args:
+        raw: Raw text
+
+    Returns:
+        The canonical form, equal for texts that only differ in character width or spacing
+    """
+    parts = []
+    position = 0
+    for match in _markup_pattern.finditer(raw):
+        parts.append(_canonical_text(raw[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_canonical_text(raw[position:]))
+    return "".join(parts).strip(" ")
+
+
+def group_raws(raws: Iterable[str]) -> Dict[str, List[str]]:
+    """Raw texts grouped by canonical key, both in first-seen order"""
+    groups: Dict[str, List[str]] = {}
+    for raw in raws:
+        groups.setdefault(canonical_key(raw), []).append(raw)
+    return groups
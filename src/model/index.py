@@ -0,0 +1,279 @@
+"""
+Byte-offset sidecar index of translation tables
+
+`<Table>.json.idx` next to every table maps the hash of each raw text to the
+byte range of its item in the pretty-printed JSON, so a single item can be read
+without parsing the whole file. `dump_items` writes the index along with the
+table; an index whose recorded size or modification time no longer matches the
+table (e.g. after a git checkout) is rebuilt by scanning the file.
+
+Layout: a header `magic, table size, table mtime_ns, count` followed by
+`count` entries `(hash, offset, length)` sorted by hash, all little-endian.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .localization import TranslatedItem, format_item, items_from_json
+
+index_suffix = ".idx"
+
+_magic = b"LKIDX001"
+_header = struct.Struct("<8sQQI")
+_entry = struct.Struct("<QQI")
+
+Entry = Tuple[int, int, int]
+
+
+def index_file(file: Path) -> Path:
+    """Sidecar index path of a table file"""
+    return file.with_name(file.name + index_suffix)
+
+
+def raw_hash(raw: str) -> int:
+    """64-bit hash of a raw text"""
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_index(file: Path, entries: Iterable[Entry]) -> None:
+    """Write the sidecar index of a table that was just written"""
+    entries = sorted(entries)
+    stat = file.stat()
+    path = index_file(file)
+    temp_file = path.with_name(f".{path.name}.tmp")
+    with open(temp_file, "wb") as f:
+        f.write(_header.pack(_magic, stat.st_size, stat.st_mtime_ns, len(entries)))
+        for entry in entries:
+            f.write(_entry.pack(*entry))
+    os.replace(temp_file, path)
+
+
+def scan_entries(data: bytes) -> List[Entry]:
+    """
+    Entries of a table in the `dump_items` layout, found without parsing the items
+
+    JSON strings cannot contain a raw newline, so every item starts at a `  {`
+    line and ends at the next `  }` line.
+
+    Raises:
+        ValueError: The file is not in the `dump_items` layout
+    """
+    # `data` may be an mmap, which only supports slicing and find
+    if data[:2] == b"[]" and len(data) == 2:
+        return []
+    if data[:6] != b"[\n  {\n":
+        raise ValueError("not in the data/ table layout")
+    entries = []
+    start = 2
+    while True:
+        end = data.find(b"\n  }", start)
+        if end < 0:
+            raise ValueError(f"unterminated item at byte {start}")
+        end += 4
+        prefix = b'  {\n    "raw": '
+        if data[start:start + len(prefix)] != prefix:
+            raise ValueError(f"item without leading raw at byte {start}")
+        raw_start = start + len(prefix)
+        raw_end = data.find(b"\n", raw_start)
+        token = data[raw_start:raw_end].rstrip(b",")
+        entries.append((raw_hash(json.loads(token)), start, end - start))
+        separator = data[end:end + 2]
+        if separator == b",\n":
+            start = end + 2
+        elif separator == b"\n]":
+            return entries
+        else:
+            raise ValueError(f"unexpected bytes after item at byte {end}")
+
+
+class TableIndex:
+    """
+    Random access reader of one table through its sidecar index
+
+    The table is memory-mapped and only the requested items are decoded. Tables
+    not in the `dump_items` layout are loaded in full instead.
+
+    Args:
+        file: Table file
+        rebuild: Rewrite a missing or stale sidecar index after scanning the table
+    """
+
+    def __init__(self, file: Path, rebuild: bool = True):
+        self.file = Path(file)
+        self._f = open(self.file, "rb")
+        stat = os.fstat(self._f.fileno())
+        self._data = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        self._items: Optional[Dict[str, TranslatedItem]] = None
+        self._entries = self._read_index(stat)
+        if self._entries is None:
+            try:
+                entries = scan_entries(self._data)
+            except ValueError:
+                # Not written by dump_items, fall back to a full parse
+                self._items = {item.raw: item for item in items_from_json(bytes(self._data).decode("utf-8"))}
+                self._entries = b""
+            else:
+                entries.sort()
+                self._entries = b"".join(_entry.pack(*entry) for entry in entries)
+                if rebuild:
+                    try:
+                        write_index(self.file, entries)
+                    except OSError:
+                        pass
+        self.count = len(self._items) if self._items is not None else len(self._entries) // _entry.size
+
+    @property
+    def indexed(self) -> bool:
+        """Whether the table is in the `dump_items` layout and read through the index"""
+        return self._items is None
+
+    def _read_index(self, stat: os.stat_result) -> Optional[bytes]:
+        try:
+            with open(index_file(self.file), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _header.size:
+            return None
+        magic, size, mtime_ns, count = _header.unpack_from(data)
+        if magic != _magic or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        if len(data) != _header.size + count * _entry.size:
+            return None
+        return data[_header.size:]
+
+    def _entry_at(self, position: int) -> Entry:
+        return _entry.unpack_from(self._entries, position * _entry.size)
+
+    def _ranges(self, raw: str) -> List[Tuple[int, int]]:
+        """Byte ranges of the items whose raw text hash matches"""
+        target = raw_hash(raw)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry_at(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        ranges = []
+        while lo < self.count:
+            value, offset, length = self._entry_at(lo)
+            if value != target:
+                break
+            ranges.append((offset, length))
+            lo += 1
+        return ranges
+
+    def locate(self, raw: str) -> Optional[Tuple[int, int]]:
+        """`(offset, length)` of the item of a raw text, None when absent or not indexed"""
+        for offset, length in self._ranges(raw):
+            if self._decode(offset, length).raw == raw:
+                return offset, length
+        return None
+
+    def _decode(self, offset: int, length: int) -> TranslatedItem:
+        return items_from_json("[" + self._data[offset:offset + length].decode("utf-8") + "]")[0]
+
+    def get(self, raw: str) -> Optional[TranslatedItem]:
+        """Item of a raw text, or None"""
+        if self._items is not None:
+            return self._items.get(raw)
+        for offset, length in self._ranges(raw):
+            item = self._decode(offset, length)
+            # Different raw texts may share a hash
+            if item.raw == raw:
+                return item
+        return None
+
+    def __contains__(self, raw: str) -> bool:
+        return self.get(raw) is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def patch_items(file: Path, items: Iterable[TranslatedItem]) -> int:
+    """
+    Replace existing items of a table in place, re-encoding only those items
+
+    The bytes between the patched items are copied unchanged and the index
+    offsets shifted, so the result equals `dump_items` of the updated table.
+
+    Returns:
+        Number of patched items
+
+    Raises:
+        KeyError: An item's raw text is not in the table
+    """
+    from .localization import dump_items, load_items
+
+    items = list(items)
+    with TableIndex(file, rebuild=False) as index:
+        if index.indexed:
+            temp_file, entries = _splice(file, index, items)
+    if not index.indexed:
+        # Not in the dump_items layout, rewrite the whole table
+        patched = {item.raw: item for item in items}
+        table = load_items(file)
+        for position, item in enumerate(table):
+            if item.raw in patched:
+                table[position] = patched.pop(item.raw)
+        if patched:
+            raise KeyError(f"{next(iter(patched))!r} not found in {file}")
+        dump_items(table, file)
+        return len(items)
+    os.replace(temp_file, file)
+    write_index(file, entries)
+    return len(items)
+
+
+def _splice(file: Path, index: TableIndex, items: List[TranslatedItem]) -> Tuple[Path, List[Entry]]:
+    """Write the patched table to a temporary file, returns it with the shifted index entries"""
+    patches = []
+    for item in items:
+        location = index.locate(item.raw)
+        if location is None:
+            raise KeyError(f"{item.raw!r} not found in {file}")
+        patches.append((location[0], location[1], format_item(item).encode("utf-8")))
+    patches.sort()
+
+    temp_file = file.with_name(f".{file.name}.tmp")
+    with open(temp_file, "wb") as f:
+        position = 0
+        for offset, length, encoded in patches:
+            f.write(index._data[position:offset])
+            f.write(encoded)
+            position = offset + length
+        f.write(index._data[position:])
+
+    # shifts[i]: size change of all patches before the i-th
+    starts = [offset for offset, _, _ in patches]
+    shifts = [0]
+    for _, length, encoded in patches:
+        shifts.append(shifts[-1] + len(encoded) - length)
+    entries = []
+    for position in range(index.count):
+        value, offset, length = index._entry_at(position)
+        patch = bisect_right(starts, offset) - 1
+        if patch >= 0 and starts[patch] == offset:
+            entries.append((value, offset + shifts[patch], len(patches[patch][2])))
+        else:
+            entries.append((value, offset + shifts[patch + 1], length))
+    return temp_file, entries
@@ -1,11 +1,35 @@
-from typing import Dict, List, Literal, TypedDict
-from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple, TypedDict
 from enum import Enum
+from json.encoder import encode_basestring
+from pathlib import Path
+import json
+import os
+import sys
 
 class I18nLanguage(Enum):
     ZH_CN = "zh-CN"
     EN = "en"
-    
+
+
+# Authors whose name contains one of these keywords are machine translations
+machine_author_keywords = ["ai", "claude", "llm", "translation-memory", "canonical-variant"]
+
+
+class AuthorClass(Enum):
+    EMPTY = "empty"
+    HUMAN = "human"
+    MACHINE = "machine"
+
+
+def classify_author(author: str) -> AuthorClass:
+    """Classify a translation author as empty, human or machine"""
+    if not author:
+        return AuthorClass.EMPTY
+    lowered = author.lower()
+    if any(keyword in lowered for keyword in machine_author_keywords):
+        return AuthorClass.MACHINE
+    return AuthorClass.HUMAN
+
 
 class I18nContent(TypedDict):
     text: str
@@ -13,9 +37,310 @@ class I18nContent(TypedDict):
 
 I18n = Dict[I18nLanguage, I18nContent]
 
-@dataclass
+
+# Every distinct locale key order is stored once and shared by all items using it,
+# along with the position of each locale's text in `TranslatedItem.values`
+_locale_orders: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_locale_slots: Dict[int, Dict[str, int]] = {}
+
+
+def intern_locales(locales: Iterable[str]) -> Tuple[str, ...]:
+    """Return the shared tuple for a locale key order"""
+    key = tuple(locales)
+    shared = _locale_orders.get(key)
+    if shared is None:
+        shared = tuple(sys.intern(locale) for locale in key)
+        _locale_orders[shared] = shared
+        _locale_slots[id(shared)] = {locale: 2 * i for i, locale in enumerate(shared)}
+    return shared
+
+
+def default_locales() -> Tuple[str, ...]:
+    """Locale key order used for newly created items"""
+    return intern_locales(lang.value for lang in I18nLanguage)
+
+
 class TranslatedItem:
-    raw: str
-    translation: I18n
+    """
+    One entry of a translation table
+
+    Stored without per-locale dicts: `locales` is a shared tuple of locale keys
+    in file order and `values` a flat `[text, author, text, author, ...]` list
+    aligned with it. Author strings are interned.
+    """
+    __slots__ = ("raw", "locales", "values")
+
+    def __init__(self, raw: str, locales: Tuple[str, ...] = (), values: Optional[List[str]] = None):
+        self.raw = raw
+        self.locales = intern_locales(locales)
+        self.values = values if values is not None else [""] * (2 * len(self.locales))
+
+    @classmethod
+    def empty(cls, raw: str, locales: Optional[Iterable[str]] = None) -> "TranslatedItem":
+        """Create an item with empty text and author for every locale"""
+        return cls(raw, default_locales() if locales is None else tuple(locales))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TranslatedItem":
+        locales = []
+        values = []
+        for locale, content in data.get("translation", {}).items():
+            locales.append(locale)
+            values.append(content.get("text", ""))
+            values.append(sys.intern(content.get("author", "")))
+        return cls(data["raw"], tuple(locales), values)
+
+    def to_dict(self) -> dict:
+        values = self.values
+        return {
+            "raw": self.raw,
+            "translation": {
+                locale: {"text": values[2 * i], "author": values[2 * i + 1]}
+                for i, locale in enumerate(self.locales)
+            }
+        }
+
+    def _slot(self, locale: str) -> int:
+        return _locale_slots[id(self.locales)].get(locale, -1)
+
+    def has_locale(self, locale: str) -> bool:
+        return locale in self.locales
+
+    def get_text(self, locale: str) -> str:
+        slot = _locale_slots[id(self.locales)].get(locale, -1)
+        return self.values[slot] if slot >= 0 else ""
+
+    def get_author(self, locale: str) -> str:
+        slot = _locale_slots[id(self.locales)].get(locale, -1)
+        return self.values[slot + 1] if slot >= 0 else ""
+
+    def has_text(self, locale: str) -> bool:
+        """Whether the locale has a non-blank translation"""
+        slot = _locale_slots[id(self.locales)].get(locale, -1)
+        if slot < 0:
+            return False
+        text = self.values[slot]
+        return text != "" and not text.isspace()
+
+    def translations(self) -> Iterable[Tuple[str, str, str]]:
+        """Yield `(locale, text, author)` in file order"""
+        values = self.values
+        for i, locale in enumerate(self.locales):
+            yield locale, values[2 * i], values[2 * i + 1]
+
+    def set_translation(self, locale: str, text: str, author: str) -> None:
+        slot = self._slot(locale)
+        if slot < 0:
+            self.locales = intern_locales(self.locales + (locale,))
+            self.values.extend((text, sys.intern(author)))
+        else:
+            self.values[slot] = text
+            self.values[slot + 1] = sys.intern(author)
+
+    def ensure_locales(self, locales: Iterable[str]) -> bool:
+        """Add empty entries for missing locales, returns whether anything was added"""
+        missing = [locale for locale in locales if locale not in self.locales]
+        if not missing:
+            return False
+        self.locales = intern_locales(self.locales + tuple(missing))
+        self.values.extend([""] * (2 * len(missing)))
+        return True
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TranslatedItem):
+            return NotImplemented
+        return self.raw == other.raw and self.locales == other.locales and self.values == other.values
+
+    def __repr__(self) -> str:
+        return f"TranslatedItem(raw={self.raw!r}, translation={self.to_dict()['translation']!r})"
+
+Data = List[TranslatedItem]
+
+
+def _pairs_hook(pairs: List[tuple]):
+    """
+    `object_pairs_hook` for translation tables, converts objects bottom-up so no
+    intermediate dict is built: `{text, author}` -> tuple, locale map -> pair list,
+    item -> TranslatedItem
+    """
+    if not pairs:
+        return pairs
+    first_key = pairs[0][0]
+    if first_key == "raw" or (len(pairs) == 2 and pairs[1][0] == "raw"):
+        fields = dict(pairs)
+        locales = []
+        values = []
+        for locale, content in fields.get("translation", ()):
+            locales.append(locale)
+            values.append(content[0])
+            values.append(content[1])
+        return TranslatedItem(fields["raw"], tuple(locales), values)
+    if first_key in ("text", "author"):
+        fields = dict(pairs)
+        return (fields.get("text", ""), sys.intern(fields.get("author", "")))
+    return pairs
+
+
+def items_from_json(text: str) -> Data:
+    items = json.loads(text, object_pairs_hook=_pairs_hook)
+    if not isinstance(items, list) or not all(isinstance(item, TranslatedItem) for item in items):
+        raise ValueError("Invalid `data` json format")
+    return items
+
+
+def load_items(file: Path) -> Data:
+    """Load a translation table into TranslatedItem objects"""
+    with open(file, 'r', encoding='utf-8') as f:
+        return items_from_json(f.read())
+
+
+class _LayoutError(ValueError):
+    pass
+
+
+_item_decoder = json.JSONDecoder(object_pairs_hook=_pairs_hook)
+
+
+def _scan_items(file: Path) -> Iterator[TranslatedItem]:
+    """
+    Scanner for tables in the `dump_items` layout: JSON strings cannot contain a raw
+    newline, so every item ends at a `  },` / `  }` line. Only one item's lines are
+    held at a time, each item is decoded on its own.
+
+    Raises:
+        _LayoutError: The file does not fit the layout
+    """
+    with open(file, 'r', encoding='utf-8') as f:
+        first = f.readline()
+        if first.rstrip("\n") == "[]":
+            return
+        if first != "[\n":
+            raise _LayoutError("not in the data/ table layout")
+        lines: List[str] = []
+        for line in f:
+            if line == "  },\n" or line == "  }\n":
+                lines.append("  }")
+                try:
+                    item = _item_decoder.decode("".join(lines))
+                except ValueError as e:
+                    raise _LayoutError(str(e))
+                if not isinstance(item, TranslatedItem):
+                    raise _LayoutError("item without raw text")
+                yield item
+                lines = []
+            elif line != "]":
+                lines.append(line)
+        if lines:
+            raise _LayoutError("unterminated item")
+
+
+def iter_items(file: Path) -> Iterator[TranslatedItem]:
+    """
+    Stream the items of a translation table one by one
+
+    Tables in the `dump_items` layout are read item by item, so memory is bounded by
+    the largest item; other files are parsed in full, skipping the items already yielded.
+    """
+    count = 0
+    try:
+        for item in _scan_items(file):
+            yield item
+            count += 1
+        return
+    except _LayoutError:
+        pass
+    yield from load_items(file)[count:]
+
+
+def iter_translations(file: Path) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Stream `(raw, locale, text, author)` of every translation of a table in file order,
+    an item without any locale yields `(raw, "", "", "")`. See `iter_items`.
+    """
+    for item in iter_items(file):
+        if not item.locales:
+            yield item.raw, "", "", ""
+        values = item.values
+        for i, locale in enumerate(item.locales):
+            yield item.raw, locale, values[2 * i], values[2 * i + 1]
+
+
+def format_item(item: TranslatedItem) -> str:
+    """
+    Serialize one item exactly like `json.dump(items, indent=2, ensure_ascii=False)`
+    does for an element of the top-level list
+    """
+    if not item.locales:
+        return f'  {{\n    "raw": {encode_basestring(item.raw)},\n    "translation": {{}}\n  }}'
+    values = item.values
+    entries = [
+        f'      {encode_basestring(locale)}: {{\n'
+        f'        "text": {encode_basestring(values[2 * i])},\n'
+        f'        "author": {encode_basestring(values[2 * i + 1])}\n'
+        f'      }}'
+        for i, locale in enumerate(item.locales)
+    ]
+    return (
+        f'  {{\n    "raw": {encode_basestring(item.raw)},\n    "translation": {{\n'
+        + ",\n".join(entries)
+        + '\n    }\n  }'
+    )
+
+
+def dump_items(items: Iterable[TranslatedItem], file: Path) -> int:
+    """
+    Write a translation table item by item, byte-identical to the `json.dump`
+    output used for `data/`. Returns the number of items written.
+
+    The items are written to a temporary file renamed over `file` at the end,
+    so `items` may still be reading the old file and readers never see a partial table.
+    The byte range of every item is recorded in the sidecar index (see `src.model.index`).
+    """
+    from .index import raw_hash, write_index
+
+    count = 0
+    entries = []
+    offset = 2
+    file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = file.with_name(f".{file.name}.tmp")
+    try:
+        with open(temp_file, 'wb') as f:
+            for item in items:
+                encoded = format_item(item).encode("utf-8")
+                f.write(b"[\n" if count == 0 else b",\n")
+                f.write(encoded)
+                entries.append((raw_hash(item.raw), offset, len(encoded)))
+                offset += len(encoded) + 2
+                count += 1
+            f.write(b"\n]" if count else b"[]")
+        os.replace(temp_file, file)
+    except BaseException:
+        try:
+            os.unlink(temp_file)
+        except OSError:
+            pass
+        raise
+    write_index(file, entries)
+    return count
+
+
+def load_archive(file: Path) -> Data:
+    """Load an archive of pruned items, an empty list when it does not exist"""
+    if not file.exists():
+        return []
+    with open(file, 'r', encoding='utf-8') as f:
+        return [items_from_json(f"[{line}]")[0] for line in f if line.strip()]
+
 
-Data = List[TranslatedItem]
\ No newline at end of file
+def dump_archive(items: Iterable[TranslatedItem], file: Path) -> int:
+    """
+    Write an archive of pruned items: one compact JSON object per line, sorted by raw text.
+    Returns the number of items written.
+    """
+    count = 0
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with open(file, 'w', encoding='utf-8') as f:
+        for item in sorted(items, key=lambda item: item.raw):
+            f.write(json.dumps(item.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,316 @@
+"""
+Storage backends for translation tables
+
+A table is one `data/<Table>.json` file: a list of `{"raw", "translation"}` items
+sorted by raw text. `JsonStore` works directly on those files, `SqliteStore`
+keeps every table in one indexed SQLite database so single translations can be
+updated in place, and exports back to the git-tracked JSON byte-for-byte.
+"""
+
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .index import TableIndex, patch_items
+from .localization import TranslatedItem, classify_author, dump_items, load_items
+from ..perf import span
+
+
+class TranslationStore(ABC):
+    """Common interface of translation table backends"""
+
+    @abstractmethod
+    def tables(self) -> List[str]:
+        """List table names"""
+
+    @abstractmethod
+    def load(self, table: str) -> List[TranslatedItem]:
+        """Load all items of a table in file order"""
+
+    def get(self, table: str, raw: str) -> Optional[TranslatedItem]:
+        """Item of one raw text, or None"""
+        return next((item for item in self.load(table) if item.raw == raw), None)
+
+    def find(self, raw: str) -> Iterator[Tuple[str, str, str, str]]:
+        """Yield `(table, locale, text, author)` for every occurrence of a raw text"""
+        for table in self.tables():
+            item = self.get(table, raw)
+            if item is not None:
+                for locale, text, author in item.translations():
+                    yield table, locale, text, author
+
+    @abstractmethod
+    def set_translation(self, table: str, raw: str, locale: str, text: str, author: str) -> None:
+        """Set the translation of one raw text for one locale"""
+
+    def flush(self) -> None:
+        """Persist pending updates"""
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonStore(TranslationStore):
+    """
+    Store backed by the `data/*.json` files, every flush rewrites the whole table file
+
+    Tables that were not loaded are read and updated item by item through their
+    sidecar index (see `src.model.index`): `get` decodes only the requested item and
+    translations set on them are patched into the file in place on flush.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self._loaded: Dict[str, List[TranslatedItem]] = {}
+        self._index: Dict[str, Dict[str, TranslatedItem]] = {}
+        self._dirty = set()
+        # Items of tables that were not loaded, patched in place on flush
+        self._patched: Dict[str, Dict[str, TranslatedItem]] = {}
+
+    def _file(self, table: str) -> Path:
+        return self.data_dir / f"{table}.json"
+
+    def tables(self) -> List[str]:
+        return sorted(p.stem for p in self.data_dir.glob("*.json"))
+
+    def load(self, table: str) -> List[TranslatedItem]:
+        if table not in self._loaded:
+            with span("load"):
+                self._loaded[table] = load_items(self._file(table))
+            self._index[table] = {item.raw: item for item in self._loaded[table]}
+            patched = self._patched.pop(table, None)
+            if patched:
+                # Pending point updates now go through the loaded table
+                for raw, item in patched.items():
+                    loaded = self._index[table][raw]
+                    loaded.locales, loaded.values = item.locales, item.values
+                self._dirty.add(table)
+        return self._loaded[table]
+
+    def get(self, table: str, raw: str) -> Optional[TranslatedItem]:
+        if table in self._index:
+            return self._index[table].get(raw)
+        if raw in self._patched.get(table, {}):
+            return self._patched[table][raw]
+        with span("load"), TableIndex(self._file(table)) as index:
+            return index.get(raw)
+
+    def set_translation(self, table: str, raw: str, locale: str, text: str, author: str) -> None:
+        if table in self._loaded:
+            item = self._index[table].get(raw)
+        else:
+            item = self.get(table, raw)
+            if item is not None:
+                self._patched.setdefault(table, {})[raw] = item
+        if item is None:
+            raise KeyError(f"{raw!r} not found in table {table}")
+        item.set_translation(locale, text, author)
+        if table in self._loaded:
+            self._dirty.add(table)
+
+    def flush(self) -> None:
+        for table in sorted(self._dirty):
+            with span("serialize"):
+                dump_items(self._loaded[table], self._file(table))
+        self._dirty.clear()
+        for table in sorted(self._patched):
+            with span("serialize"):
+                patch_items(self._file(table), self._patched[table].values())
+        self._patched.clear()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    tbl TEXT NOT NULL REFERENCES tables(name),
+    position INTEGER NOT NULL,
+    raw TEXT NOT NULL,
+    UNIQUE (tbl, raw)
+);
+CREATE INDEX IF NOT EXISTS idx_items_raw ON items(raw);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_items_position ON items(tbl, position);
+CREATE TABLE IF NOT EXISTS translations (
+    item_id INTEGER NOT NULL REFERENCES items(id) ON DELETE CASCADE,
+    locale TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    author TEXT NOT NULL DEFAULT '',
+    author_class TEXT NOT NULL,
+    PRIMARY KEY (item_id, locale)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_translations_locale ON translations(locale, author_class);
+CREATE INDEX IF NOT EXISTS idx_translations_author_class ON translations(author_class);
+"""
+
+
+class SqliteStore(TranslationStore):
+    """
+    Store backed by a single SQLite database
+
+    Item order and the key order of every `translation` object are kept, so
+    `export_json` reproduces the imported files exactly.
+    """
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.conn = sqlite3.connect(str(self.db_file))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def flush(self) -> None:
+        self.conn.commit()
+
+    def tables(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT name FROM tables ORDER BY name")]
+
+    def import_table(self, table: str, items: List[TranslatedItem]) -> None:
+        """Replace a table with the given items"""
+        with self.conn:
+            self.conn.execute("DELETE FROM items WHERE tbl = ?", (table,))
+            self.conn.execute("INSERT OR IGNORE INTO tables(name) VALUES (?)", (table,))
+            for position, item in enumerate(items):
+                cursor = self.conn.execute(
+                    "INSERT INTO items(tbl, position, raw) VALUES (?, ?, ?)",
+                    (table, position, item.raw)
+                )
+                item_id = cursor.lastrowid
+                rows = [
+                    (item_id, locale, locale_position, text, author, classify_author(author).value)
+                    for locale_position, (locale, text, author) in enumerate(item.translations())
+                ]
+                self.conn.executemany(
+                    "INSERT INTO translations(item_id, locale, position, text, author, author_class) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def import_json(self, data_dir: Path) -> int:
+        """Import every `*.json` table of a data directory, returns the number of tables"""
+        files = sorted(Path(data_dir).glob("*.json"))
+        for file in files:
+            self.import_table(file.stem, load_items(file))
+        return len(files)
+
+    def load(self, table: str) -> List[TranslatedItem]:
+        items: List[TranslatedItem] = []
+        current_id = None
+        for item_id, raw, locale, text, author in self.conn.execute(
+            """
+            SELECT i.id, i.raw, t.locale, t.text, t.author
+            FROM items i LEFT JOIN translations t ON t.item_id = i.id
+            WHERE i.tbl = ?
+            ORDER BY i.position, t.position
+            """,
+            (table,)
+        ):
+            if item_id != current_id:
+                items.append(TranslatedItem(raw))
+                current_id = item_id
+            if locale is not None:
+                items[-1].set_translation(locale, text, author)
+        return items
+
+    def set_translation(self, table: str, raw: str, locale: str, text: str, author: str) -> None:
+        row = self.conn.execute(
+            "SELECT id FROM items WHERE tbl = ? AND raw = ?", (table, raw)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{raw!r} not found in table {table}")
+        item_id = row[0]
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE translations SET text = ?, author = ?, author_class = ? "
+                "WHERE item_id = ? AND locale = ?",
+                (text, author, classify_author(author).value, item_id, locale)
+            )
+            if cursor.rowcount == 0:
+                self.conn.execute(
+                    "INSERT INTO translations(item_id, locale, position, text, author, author_class) "
+                    "SELECT ?, ?, COALESCE(MAX(position) + 1, 0), ?, ?, ? FROM translations WHERE item_id = ?",
+                    (item_id, locale, text, author, classify_author(author).value, item_id)
+                )
+
+    def get(self, table: str, raw: str) -> Optional[TranslatedItem]:
+        item = None
+        for item_raw, locale, text, author in self.conn.execute(
+            """
+            SELECT i.raw, t.locale, t.text, t.author
+            FROM items i LEFT JOIN translations t ON t.item_id = i.id
+            WHERE i.tbl = ? AND i.raw = ?
+            ORDER BY t.position
+            """,
+            (table, raw)
+        ):
+            if item is None:
+                item = TranslatedItem(item_raw)
+            if locale is not None:
+                item.set_translation(locale, text, author)
+        return item
+
+    def find(self, raw: str) -> Iterator[Tuple[str, str, str, str]]:
+        """Yield `(table, locale, text, author)` for every occurrence of a raw text"""
+        yield from self.conn.execute(
+            """
+            SELECT i.tbl, t.locale, t.text, t.author
+            FROM items i JOIN translations t ON t.item_id = i.id
+            WHERE i.raw = ?
+            ORDER BY i.tbl, t.position
+            """,
+            (raw,)
+        )
+
+    def untranslated(self, table: str, locale: str) -> List[str]:
+        """Raw texts of a table without a translation for the locale"""
+        return [row[0] for row in self.conn.execute(
+            """
+            SELECT i.raw FROM items i
+            LEFT JOIN translations t ON t.item_id = i.id AND t.locale = ?
+            WHERE i.tbl = ? AND (t.text IS NULL OR trim(t.text) = '')
+            ORDER BY i.position
+            """,
+            (locale, table)
+        )]
+
+    def count_by_author_class(self, locale: str, table: Optional[str] = None) -> Dict[str, int]:
+        """Count translations of a locale per author class"""
+        query = (
+            "SELECT t.author_class, COUNT(*) FROM translations t JOIN items i ON i.id = t.item_id "
+            "WHERE t.locale = ?"
+        )
+        params: Tuple = (locale,)
+        if table is not None:
+            query += " AND i.tbl = ?"
+            params += (table,)
+        query += " GROUP BY t.author_class"
+        return {author_class: count for author_class, count in self.conn.execute(query, params)}
+
+    def export_table(self, table: str, file: Path) -> None:
+        dump_items(self.load(table), file)
+
+    def export_json(self, data_dir: Path, tables: Optional[List[str]] = None) -> int:
+        """Regenerate `*.json` tables into a data directory, returns the number of tables"""
+        tables = tables or self.tables()
+        for table in tables:
+            self.export_table(table, Path(data_dir) / f"{table}.json")
+        return len(tables)
+
+
+def open_store(data_dir: Path, db_file: Optional[Path] = None) -> TranslationStore:
+    """Open the SQLite store if a database file is given, otherwise the JSON files"""
+    if db_file:
+        return SqliteStore(db_file)
+    return JsonStore(data_dir)
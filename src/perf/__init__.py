@@ -0,0 +1,211 @@
+"""
+Profiling hooks for main.py subcommands and the scripts
+
+`span(name)` marks a hot phase (load, extract, merge, sort, serialize, LLM wait)
+and accumulates its wall time; it is cheap enough to stay in the code.
+`Profiler` wraps a whole run in one of three modes:
+
+- cpu: cProfile, written as a `.prof` file (snakeviz, `python -m pstats`)
+- wall: sampling profiler over the main thread, including time spent waiting,
+  written as flamegraph-ready collapsed stacks (`.collapsed`)
+- mem: tracemalloc, written as a snapshot dump (`.tracemalloc`)
+
+Each mode prints a top-N summary and the span totals when it stops.
+Scripts can be profiled with `python -m src.perf --profile cpu scripts/x.py`.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+profile_modes = ["cpu", "mem", "wall"]
+
+profile_suffixes = {
+    "cpu": ".prof",
+    "wall": ".collapsed",
+    "mem": ".tracemalloc",
+}
+
+# Span name -> [count, total seconds]
+_spans: Dict[str, List[float]] = {}
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Accumulate the wall time of a named phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def record_span(name: str, elapsed: float) -> None:
+    """Add one occurrence of a phase measured by the caller"""
+    entry = _spans.get(name)
+    if entry is None:
+        _spans[name] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def span_totals() -> Dict[str, List[float]]:
+    """`{name: [count, total seconds]}` of every span recorded so far"""
+    return {name: list(entry) for name, entry in _spans.items()}
+
+
+def reset_spans() -> None:
+    _spans.clear()
+
+
+def format_spans(totals: Optional[Dict[str, List[float]]] = None) -> str:
+    totals = span_totals() if totals is None else totals
+    if not totals:
+        return "No spans recorded"
+    lines = [f"{'span':<20} {'count':>7} {'total (s)':>10} {'mean (ms)':>10}"]
+    for name, (count, total) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<20} {int(count):>7} {total:>10.3f} {total / count * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread
+
+    Samples are counted per collapsed stack (`outer;...;inner`), the format read
+    by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write_collapsed(self, file: Path) -> None:
+        with open(file, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top: int = 20) -> str:
+        total = sum(self.stacks.values())
+        if not total:
+            return "No samples collected"
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        lines = [f"{total} samples, {self.interval * 1000:.0f} ms interval", f"{'self %':>7} {'total %':>8}  function"]
+        for name, count in own.most_common(top):
+            lines.append(f"{count / total * 100:>7.1f} {inclusive[name] / total * 100:>8.1f}  {name}")
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    Profile everything between `start()` and `stop()`, or use as a context manager
+
+    Args:
+        mode: One of `profile_modes`
+        output: Output file, the mode's suffix is added when missing
+        top: Number of entries in the printed summary
+        stream: Where the summary is printed (default: stderr)
+    """
+
+    def __init__(self, mode: str, output: Path, top: int = 20, stream: Optional[TextIO] = None):
+        if mode not in profile_modes:
+            raise ValueError(f"Unknown profile mode {mode!r}, choose from {', '.join(profile_modes)}")
+        self.mode = mode
+        output = Path(output)
+        if output.suffix != profile_suffixes[mode]:
+            output = output.with_name(output.name + profile_suffixes[mode])
+        self.output = output
+        self.top = top
+        self.stream = stream
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        reset_spans()
+        self._started = time.perf_counter()
+        if self.mode == "cpu":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "wall":
+            self._sampler = SamplingProfiler()
+            self._sampler.start()
+        else:
+            tracemalloc.start(25)
+
+    def stop(self) -> None:
+        elapsed = time.perf_counter() - self._started
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cpu":
+            self._profile.disable()
+            self._profile.dump_stats(str(self.output))
+            buffer = io.StringIO()
+            pstats.Stats(self._profile, stream=buffer).sort_stats("cumulative").print_stats(self.top)
+            summary = buffer.getvalue().strip()
+        elif self.mode == "wall":
+            self._sampler.stop()
+            self._sampler.write_collapsed(self.output)
+            summary = self._sampler.summary(self.top)
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(str(self.output))
+            lines = [f"current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB"]
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                lines.append(str(stat))
+            summary = "\n".join(lines)
+
+        stream = self.stream or sys.stderr
+        print(f"=== {self.mode} profile: {elapsed:.3f}s, written to {self.output} ===", file=stream)
+        print(summary, file=stream)
+        print("=== spans ===", file=stream)
+        print(format_spans(), file=stream)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,41 @@
+"""
+Profile a script with the same hooks as `main.py --profile`
+
+    python -m src.perf --profile cpu scripts/linkura_diff_to_json.py
+    python -m src.perf --profile wall -o profile/export scripts/export_db_json.py
+"""
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+from src.perf import Profiler, profile_modes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Python script under a profiler")
+    parser.add_argument('--profile', '-p', choices=profile_modes, default='cpu', help='Profiler to use (default: cpu)')
+    parser.add_argument('--output', '-o', help='Output file (default: profile-<script name>.<suffix>)')
+    parser.add_argument('--top', type=int, default=20, help='Number of entries in the summary (default: 20)')
+    parser.add_argument('script', help='Script to run')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Arguments passed to the script')
+    args = parser.parse_args()
+
+    script = Path(args.script)
+    output = Path(args.output) if args.output else Path(f"profile-{script.stem}")
+
+    # Run the script as if it was started directly
+    sys.argv = [str(script)] + args.args
+    sys.path.insert(0, str(script.resolve().parent))
+    exit_code = 0
+    with Profiler(args.profile, output, args.top):
+        try:
+            runpy.run_path(str(script), run_name="__main__")
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Memoized dependency graph of the update workflow
+
+Every step of the update workflow (Makefile, scripts/) processes one table at a
+time, so the pipeline is a graph of `(stage, table)` nodes reading and writing
+whole files:
+
+- convert: `link-like-diff/orig/<T>.yaml` -> `link-like-diff/json/<T>.json` (scripts/linkura_diff_to_json.py)
+- gentodo: `link-like-diff/json/<T>.json` -> `data/<T>.json` (`src.gentodo.basic_gen_file`)
+- export: `link-like-diff/json/<T>.json` -> `exports/<T>.json`, `key: raw` (scripts/export_db_json.py)
+- pretranslate: `exports/<T>.json` + `data/<T>.json` -> `pretranslate_todo/translated_out/<T>.json`,
+  `key: translation` (scripts/pretranslate_process.py)
+- import: `link-like-diff/json/<T>.json` + the pretranslated file -> `merged/<T>.json`,
+  the translated plugin json (scripts/import_db_json.py)
+
+A node's key hashes its stage version, parameters and the content of its input
+files. The key and the content hashes of the outputs are recorded in a manifest;
+a node whose key is unchanged and whose outputs still have the recorded content
+is skipped. Keys cover content, not timestamps, so an input rewritten with the
+same bytes skips its consumers too, and a small upstream change only flows
+through the tables it touched. Nodes whose dependencies are done run in parallel
+worker processes.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+default_manifest = Path(".cache") / "pipeline.json"
+
+_scripts_dir = Path(__file__).resolve().parents[2] / "scripts"
+
+
+class Stage(NamedTuple):
+    name: str
+    # Bumped when the stage's output changes for the same inputs
+    version: int
+    # Stages of the same table this one consumes
+    deps: Tuple[str, ...]
+
+
+stages = [
+    Stage("convert", 1, ()),
+    Stage("gentodo", 1, ("convert",)),
+    Stage("export", 1, ("convert",)),
+    Stage("pretranslate", 1, ("export", "gentodo")),
+    Stage("import", 1, ("convert", "pretranslate")),
+]
+stage_names = [stage.name for stage in stages]
+
+
+class Layout(NamedTuple):
+    """Directories of the workflow, `orig` and `json` are fixed by scripts/linkura_diff_to_json.py"""
+    orig: Path = Path("link-like-diff/orig")
+    json: Path = Path("link-like-diff/json")
+    data: Path = Path("data")
+    archive: Path = Path("archive")
+    exports: Path = Path("exports")
+    pretranslated: Path = Path("pretranslate_todo/translated_out")
+    merged: Path = Path("merged")
+
+
+class Node(NamedTuple):
+    stage: str
+    table: str
+    # Every input is hashed into the key, a missing required input skips the node
+    inputs: Tuple[Path, ...]
+    required: Tuple[Path, ...]
+    outputs: Tuple[Path, ...]
+    deps: Tuple[str, ...]
+    params: tuple
+
+    @property
+    def id(self) -> str:
+        return f"{self.stage}:{self.table}"
+
+
+class NodeError(Exception):
+    """A node raised or exited, along with what it printed before"""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message, output)
+        self.message = message
+        self.output = output
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def _import_script(name: str):
+    """Import a module of scripts/, which import each other by their bare names"""
+    import importlib
+
+    if str(_scripts_dir) not in sys.path:
+        sys.path.insert(0, str(_scripts_dir))
+    return importlib.import_module(name)
+
+
+def find_tables(layout: Layout) -> List[str]:
+    """Tables with a conversion rule in the YAML directory, and the tables already converted"""
+    rules = _import_script("linkura_diff_to_json").primary_key_rules
+    tables = {file.stem for file in Path(layout.orig).glob("*.yaml") if file.stem in rules}
+    tables.update(file.stem for file in Path(layout.json).glob("*.json"))
+    return sorted(tables)
+
+
+def build_graph(layout: Layout, tables: Sequence[str], selected: Optional[Sequence[str]] = None, locale: str = "zh-CN") -> Dict[str, Node]:
+    """
+    Nodes of the selected stages for every table, in topological order
+
+    Dependencies on stages that are not selected are dropped, their files are used as they are.
+    """
+    selected = set(selected or stage_names)
+    script = _import_script("linkura_diff_to_json")
+    nodes: Dict[str, Node] = {}
+    for table in tables:
+        yaml_file = Path(layout.orig) / f"{table}.yaml"
+        json_file = Path(layout.json) / f"{table}.json"
+        data_file = Path(layout.data) / f"{table}.json"
+        archive_file = Path(layout.archive) / f"{table}.jsonl"
+        export_file = Path(layout.exports) / f"{table}.json"
+        pretranslated_file = Path(layout.pretranslated) / f"{table}.json"
+        merged_file = Path(layout.merged) / f"{table}.json"
+        specs = {
+            "convert": ((yaml_file,), (yaml_file,), (json_file,),
+                        (script.LOADER_VERSION, script.TestMode, script.primary_key_rules.get(table))),
+            # The data table and the archive are merged into, so they are inputs as well
+            "gentodo": ((json_file, data_file, archive_file), (json_file,), (data_file, archive_file), ()),
+            "export": ((json_file,), (json_file,), (export_file,), ()),
+            "pretranslate": ((export_file, data_file), (export_file,), (pretranslated_file,), (locale,)),
+            "import": ((json_file, pretranslated_file), (json_file, pretranslated_file), (merged_file,), ()),
+        }
+        for stage in stages:
+            if stage.name not in selected or (stage.name == "convert" and not yaml_file.exists()):
+                continue
+            inputs, required, outputs, params = specs[stage.name]
+            deps = tuple(f"{dep}:{table}" for dep in stage.deps if f"{dep}:{table}" in nodes)
+            node = Node(stage.name, table, inputs, required, outputs, deps, params)
+            nodes[node.id] = node
+    return nodes
+
+
+class FileHashes:
+    """
+    SHA-256 of file contents, remembered by (size, mtime_ns) across runs like git's index
+
+    Args:
+        known: `{path: [size, mtime_ns, hash]}` of a previous run, updated in place
+    """
+
+    def __init__(self, known: Dict[str, list]):
+        self.known = known
+
+    def __call__(self, path: Path) -> Optional[str]:
+        """Content hash, None for a missing file"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.known.pop(str(path), None)
+            return None
+        entry = self.known.get(str(path))
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        value = digest.hexdigest()
+        self.known[str(path)] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+
+def node_key(node: Node, hashes: FileHashes) -> str:
+    """Hash of the stage version, parameters and input contents of a node"""
+    version = next(stage.version for stage in stages if stage.name == node.stage)
+    digest = hashlib.sha256(json.dumps([node.stage, version, node.table, list(node.params)]).encode("utf-8"))
+    for path in node.inputs:
+        digest.update(f"\0{path}\0{hashes(path) or '-'}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def run_node(stage: str, table: str, layout: Layout, params: tuple) -> str:
+    """
+    Run one node, in a worker process; returns what it printed
+
+    Raises:
+        NodeError: The node raised, or a script called `sys.exit`
+    """
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            _run_stage(stage, table, layout, params)
+    except (Exception, SystemExit) as e:
+        raise NodeError(repr(e), output.getvalue()) from None
+    return output.getvalue()
+
+
+def _run_stage(stage: str, table: str, layout: Layout, params: tuple) -> None:
+    if stage == "convert":
+        _import_script("linkura_diff_to_json").convert_yaml_file(str(Path(layout.orig) / f"{table}.yaml"), table)
+    elif stage == "gentodo":
+        from ..gentodo import basic_gen_file
+
+        basic_gen_file(Path(layout.json) / f"{table}.json", Path(layout.data) / f"{table}.json",
+                       archive_file=Path(layout.archive) / f"{table}.jsonl", raise_errors=True)
+    elif stage == "export":
+        Path(layout.exports).mkdir(parents=True, exist_ok=True)
+        _import_script("export_db_json").ex_main(str(Path(layout.json) / f"{table}.json"), str(Path(layout.exports) / f"{table}.json"))
+    elif stage == "pretranslate":
+        from ..model.localization import iter_items
+
+        (locale,) = params
+        data_file = Path(layout.data) / f"{table}.json"
+        translations = {}
+        if data_file.exists():
+            translations = {item.raw: item.get_text(locale) for item in iter_items(data_file) if item.has_text(locale)}
+        Path(layout.pretranslated).mkdir(parents=True, exist_ok=True)
+        _import_script("pretranslate_process").pretranslated_to_kv_file(
+            str(Path(layout.exports) / f"{table}.json"), translations, str(Path(layout.pretranslated) / f"{table}.json"))
+    elif stage == "import":
+        Path(layout.merged).mkdir(parents=True, exist_ok=True)
+        _import_script("import_db_json").import_main(
+            str(Path(layout.json) / f"{table}.json"), str(Path(layout.pretranslated) / f"{table}.json"), str(Path(layout.merged) / f"{table}.json"))
+    else:
+        raise ValueError(f"Unknown stage {stage!r}")
+
+
+def _load_manifest(file: Path) -> dict:
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"nodes": {}, "files": {}}
+    manifest.setdefault("nodes", {})
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def _save_manifest(manifest: dict, file: Path) -> None:
+    file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = file.with_name(f".{file.name}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_file, file)
+
+
+def run_pipeline(
+    layout: Layout = Layout(),
+    selected: Optional[Sequence[str]] = None,
+    tables: Optional[Sequence[str]] = None,
+    locale: str = "zh-CN",
+    jobs: Optional[int] = None,
+    force: bool = False,
+    manifest_file: Path = default_manifest,
+    verbose: bool = False
+) -> Dict[str, int]:
+    """
+    Run the nodes whose inputs changed since their last run, in dependency order
+
+    Args:
+        layout: Directories of the workflow
+        selected: Stages to run (default: all), the others' files are used as they are
+        tables: Tables to run (default: every table of the YAML and json directories)
+        locale: Locale written by the pretranslate stage
+        jobs: Worker processes (default: CPU count), 1 runs the nodes in this process
+        force: Run every node regardless of the manifest
+        manifest_file: Manifest of node keys, output hashes and file hashes
+        verbose: Print the output of every node, not only of the failed ones
+
+    Returns:
+        Number of nodes by outcome: ran, cached, skipped (required input missing),
+        failed, blocked (a dependency failed)
+    """
+    started = time.perf_counter()
+    nodes = build_graph(layout, tables if tables is not None else find_tables(layout), selected, locale)
+    manifest = _load_manifest(manifest_file)
+    hashes = FileHashes(manifest["files"])
+    jobs = jobs or os.cpu_count() or 1
+
+    counts = dict.fromkeys(("ran", "cached", "skipped", "failed", "blocked"), 0)
+    outcomes: Dict[str, str] = {}
+    waiting = {node_id: set(node.deps) for node_id, node in nodes.items()}
+    dependents: Dict[str, List[str]] = {node_id: [] for node_id in nodes}
+    for node_id, node in nodes.items():
+        for dep in node.deps:
+            dependents[dep].append(node_id)
+    ready = deque(node_id for node_id, deps in waiting.items() if not deps)
+    running: Dict[Future, Tuple[str, float]] = {}
+
+    def finish(node_id: str, outcome: str) -> None:
+        outcomes[node_id] = outcome
+        counts[outcome] += 1
+        for dependent in dependents[node_id]:
+            waiting[dependent].discard(node_id)
+            if not waiting[dependent]:
+                ready.append(dependent)
+
+    def record(node: Node, output: str, node_started: float) -> None:
+        # Keyed by the inputs after the run, so nodes updating their own input stay cached
+        manifest["nodes"][node.id] = {
+            "key": node_key(node, hashes),
+            "outputs": {str(path): hashes(path) for path in node.outputs},
+        }
+        print(f"[{node.stage}] {node.table}: ran in {time.perf_counter() - node_started:.2f}s")
+        if verbose and output:
+            print(output, end="")
+        finish(node.id, "ran")
+
+    def fail(node: Node, error: Exception) -> None:
+        manifest["nodes"].pop(node.id, None)
+        print(f"[{node.stage}] {node.table}: failed: {error}")
+        if isinstance(error, NodeError) and error.output:
+            print(error.output, end="")
+        finish(node.id, "failed")
+
+    executor = ProcessPoolExecutor(jobs) if jobs > 1 else None
+    try:
+        while ready or running:
+            while ready:
+                node = nodes[ready.popleft()]
+                if any(outcomes[dep] in ("failed", "blocked") for dep in node.deps):
+                    finish(node.id, "blocked")
+                    continue
+                if not all(path.exists() for path in node.required):
+                    manifest["nodes"].pop(node.id, None)
+                    finish(node.id, "skipped")
+                    continue
+                entry = manifest["nodes"].get(node.id)
+                if (not force and entry is not None and entry["key"] == node_key(node, hashes)
+                        and all(hashes(Path(path)) == value for path, value in entry["outputs"].items())):
+                    finish(node.id, "cached")
+                    continue
+                node_started = time.perf_counter()
+                if executor is None:
+                    try:
+                        output = run_node(node.stage, node.table, layout, node.params)
+                    except NodeError as e:
+                        fail(node, e)
+                    else:
+                        record(node, output, node_started)
+                else:
+                    running[executor.submit(run_node, node.stage, node.table, layout, node.params)] = (node.id, node_started)
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id, node_started = running.pop(future)
+                    try:
+                        output = future.result()
+                    except Exception as e:
+                        # NodeError, or the worker process died
+                        fail(nodes[node_id], e)
+                    else:
+                        record(nodes[node_id], output, node_started)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        _save_manifest(manifest, manifest_file)
+
+    print(f"Pipeline: {len(nodes)} nodes in {time.perf_counter() - started:.2f}s, "
+          + ", ".join(f"{outcome} {count}" for outcome, count in counts.items()))
+    return counts
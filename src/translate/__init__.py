@@ -1,163 +1,682 @@
 from pathlib import Path
-from ..model.localization import I18nLanguage
-import src.translate.prompt.zh_cn as zh_cn
-import src.translate.prompt.en as en
-from src.translate.prompt import get_reference_prompt
+from ..model.canonical import group_raws, variant_author
+from ..model.localization import I18nLanguage, TranslatedItem
+from src.translate.prompt import TranslationPrompt, build_reference_prompt
+from ..model.storage import TranslationStore, JsonStore
+from .budget import AdaptiveChunker, estimate_tokens
+from .cache import ResponseCache
+from .memory import FuzzyMatch, TranslationMemory, archived_items, memory_author, substitute_numbers
+from .stream import JsonObjectStreamParser, open_stream, stream_model_name
+from .validate import validate_translation
+from .telemetry import Telemetry, all_tables
+from ..perf import record_span
+from collections import deque
+import importlib
 import json
-from typing import List, Iterator
-import anthropic
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
+if TYPE_CHECKING:
+    import anthropic
 
+
+# Prompt modules are imported on first use, only the requested languages are loaded
 prompt_module_map = {
-    I18nLanguage.ZH_CN: zh_cn,
-    I18nLanguage.EN: en
+    I18nLanguage.ZH_CN: "src.translate.prompt.zh_cn",
+    I18nLanguage.EN: "src.translate.prompt.en"
 }
 
-def translate_file(api_client: anthropic.Anthropic, file: Path, target_language: I18nLanguage, chunk_size: int = 24, limit: int = None) -> None:
+model_id = "claude-sonnet-4-20250514"
+max_output_tokens = 4000
+
+def translate_file(api_client: "anthropic.Anthropic", file: Path, target_language: Union[I18nLanguage, Sequence[I18nLanguage]], chunk_size: int = 24, limit: int = None, store: Optional[TranslationStore] = None, telemetry: Optional[Telemetry] = None, cache: Optional[ResponseCache] = None, fuzzy_threshold: Optional[float] = None, archive_dir: Optional[Path] = None) -> None:
     """
     Translate a file containing text entries to the specified language with chunked processing.
-    
+
     Args:
-        api_client: Anthropic API client
+        api_client: Anthropic API client or LLMAPIClient
         file: Path to the input file containing text entries
-        target_language: Target language for translation
-        chunk_size: Number of texts to process in each chunk (default: 24)
+        target_language: Target language, or several languages requested together in each chunk
+        chunk_size: Initial number of texts per chunk, adapted to the token budget afterwards (default: 24)
         limit: Maximum number of items to translate (default: None, translate all)
+        store: Storage backend holding the table named after the file (default: the JSON file itself)
+        telemetry: Recorder of per-chunk events (default: None)
+        cache: Response cache replaying identical requests (default: None)
+        fuzzy_threshold: Look up untranslated texts in a translation memory of every table; matches
+            scoring at least this are prefilled when they differ only in numbers, and sent as
+            edit tasks otherwise (default: None, disabled)
+        archive_dir: Directory of pruned item archives searched by the translation memory as well (default: None)
+    """
+    languages = as_languages(target_language)
+    prompt = get_prompt(languages)
+    locale_keys = [language.value for language in languages]
+    locale_names = ", ".join(locale_keys)
+
+    if store is None:
+        store = JsonStore(file.parent)
+    table = file.stem
+
+    # Read the input table
+    data = store.load(table)
+
+    # Filter out texts that are already translated for every target locale. Width and
+    # spacing variants (see `src.model.canonical`) are grouped under their first raw text
+    # and translated once
+    items = {item.raw: item for item in data}
+    variants = {raws[0]: raws for raws in group_raws(items).values()}
+    needs: Dict[str, List[str]] = {}
+    copied_count = 0
+
+    for raw, raws in variants.items():
+        for locale_key in locale_keys:
+            # Check if translation exists and is not empty
+            missing = [variant for variant in raws if not items[variant].has_text(locale_key)]
+            if not missing:
+                continue
+            if len(missing) < len(raws):
+                # Reuse the translation of a variant
+                source = next(items[variant] for variant in raws if items[variant].has_text(locale_key))
+                for variant in missing:
+                    store.set_translation(table, variant, locale_key, source.get_text(locale_key), variant_author)
+                copied_count += len(missing)
+            else:
+                needs.setdefault(raw, []).append(locale_key)
+
+    if copied_count:
+        store.flush()
+        print(f"Copied existing translations to {copied_count} variant items")
+
+    if not needs:
+        print(f"All texts are already translated for {locale_names}")
+        return
+
+    print(f"Found {len(needs)} untranslated items for {locale_names}")
+
+    needs = dict(_apply_limit(list(needs.items()), limit))
+
+    suggestions = {}
+    if fuzzy_threshold is not None:
+        memory = _build_memory((item for name in store.tables() for item in store.load(name)), locale_keys, archive_dir)
+
+        def prefill_item(raw: str, locale_key: str, text: str, text_author: str) -> None:
+            for variant in variants[raw]:
+                store.set_translation(table, variant, locale_key, text, text_author if variant == raw else variant_author)
+
+        suggestions = _match_memory(memory, needs, fuzzy_threshold, prefill_item)
+        store.flush()
+        if not needs:
+            return
+
+    # Get base prompt and reference examples
+    translate_reference = get_reference(data, languages, cache=cache)
+
+    def apply_item(raw: str, locale_key: str, translated: str, author: str) -> None:
+        # Update the untranslated item and its variants with the translation
+        for variant in variants[raw]:
+            store.set_translation(table, variant, locale_key, translated, author)
+
+    def finish_chunk(chunk_idx: int, applied_count: int) -> None:
+        # Persist updated data after each chunk, all locales in one write
+        try:
+            store.flush()
+            print(f"Successfully translated and saved {applied_count} items in chunk {chunk_idx + 1}")
+        except Exception as e:
+            print(f"Error writing file after chunk {chunk_idx + 1}: {e}")
+
+    chunk_count = translate_texts(
+        api_client,
+        needs,
+        prompt,
+        translate_reference,
+        chunk_size,
+        apply_item,
+        finish_chunk,
+        locale_keys,
+        telemetry=telemetry,
+        table=table,
+        cache=cache,
+        suggestions=suggestions
+    )
+
+    print(f"Translation process completed for file: {file}")
+    print(f"Total chunks processed: {chunk_count}")
+
+
+def translate_all(api_client: "anthropic.Anthropic", data_dir: Path, target_language: Union[I18nLanguage, Sequence[I18nLanguage]], chunk_size: int = 24, limit: int = None, store: Optional[TranslationStore] = None, telemetry: Optional[Telemetry] = None, cache: Optional[ResponseCache] = None, fuzzy_threshold: Optional[float] = None, archive_dir: Optional[Path] = None) -> None:
     """
+    Translate every table of a data directory, sending each unique raw text to the model once.
+
+    A global index maps each raw text to all the (table, position) pairs it appears at,
+    and raw texts are grouped by canonical key (width and spacing variants, see
+    `src.model.canonical`). Groups already translated somewhere are copied to their
+    untranslated occurrences, as `variant_author` when the translation is of another
+    variant, one raw text of every remaining group is translated and
+    written back to every occurrence of the group. Each table is written once at the end.
+
+    Args:
+        api_client: Anthropic API client or LLMAPIClient
+        data_dir: Directory containing the translation JSON files
+        target_language: Target language, or several languages requested together in each chunk
+        chunk_size: Initial number of texts per chunk, adapted to the token budget afterwards (default: 24)
+        limit: Maximum number of unique texts to translate (default: None, translate all)
+        store: Storage backend holding the tables (default: the JSON files in data_dir)
+        telemetry: Recorder of per-chunk events, recorded under the table name "(all)" with the tables
+            each chunk's texts come from (default: None)
+        cache: Response cache replaying identical requests (default: None)
+        fuzzy_threshold: Look up untranslated texts in a translation memory of all tables; matches
+            scoring at least this are prefilled when they differ only in numbers, and sent as
+            edit tasks otherwise (default: None, disabled)
+        archive_dir: Directory of pruned item archives searched by the translation memory as well (default: None)
+    """
+    languages = as_languages(target_language)
+    prompt = get_prompt(languages)
+    locale_keys = [language.value for language in languages]
+    locale_names = ", ".join(locale_keys)
+
+    if store is None:
+        store = JsonStore(data_dir)
+
+    # Build the global raw text index
+    tables: Dict[str, List[TranslatedItem]] = {}
+    index: Dict[str, List[Tuple[str, int]]] = {}
+    occurrences = 0
+    for table in store.tables():
+        items = store.load(table)
+        tables[table] = items
+        for position, item in enumerate(items):
+            index.setdefault(item.raw, []).append((table, position))
+        occurrences += len(items)
+
+    # Raw texts sharing a canonical key, keyed by the first one, which is sent for translation
+    variants = {raws[0]: raws for raws in group_raws(index).values()}
+    print(f"Indexed {occurrences} items in {len(tables)} tables, {len(index)} unique raw texts, "
+          f"{len(variants)} canonical texts")
+
+    needs: Dict[str, List[str]] = {}
+    copied_count = 0
+    try:
+        for raw, raws in variants.items():
+            locations = [(variant, table, position) for variant in raws for table, position in index[variant]]
+            for locale_key in locale_keys:
+                missing = [(variant, table) for variant, table, position in locations if not tables[table][position].has_text(locale_key)]
+                if not missing:
+                    continue
+                if len(missing) < len(locations):
+                    # Reuse a translation of the same raw text from another table with its author,
+                    # or of a variant as `variant_author`
+                    sources = [(variant, tables[table][position]) for variant, table, position in locations if tables[table][position].has_text(locale_key)]
+                    for variant, table in missing:
+                        source = next((item for source_raw, item in sources if source_raw == variant), None)
+                        if source is not None:
+                            store.set_translation(table, variant, locale_key, source.get_text(locale_key), source.get_author(locale_key))
+                        else:
+                            store.set_translation(table, variant, locale_key, sources[0][1].get_text(locale_key), variant_author)
+                    copied_count += len(missing)
+                else:
+                    needs.setdefault(raw, []).append(locale_key)
+
+        if copied_count:
+            print(f"Copied existing translations to {copied_count} duplicated or variant items")
+
+        if not needs:
+            print(f"All texts are already translated for {locale_names}")
+            return
+
+        print(f"Found {len(needs)} unique untranslated texts for {locale_names}")
+
+        needs = dict(_apply_limit(list(needs.items()), limit))
+
+        written_count = 0
+
+        def write_item(raw: str, locale_key: str, translated: str, text_author: str) -> None:
+            nonlocal written_count
+            for variant in variants[raw]:
+                for table, _ in index[variant]:
+                    store.set_translation(table, variant, locale_key, translated, text_author)
+                    written_count += 1
+
+        def prefill_item(raw: str, locale_key: str, text: str, text_author: str) -> None:
+            nonlocal written_count
+            for variant in variants[raw]:
+                for table, _ in index[variant]:
+                    store.set_translation(table, variant, locale_key, text, text_author if variant == raw else variant_author)
+                    written_count += 1
+
+        all_items = [item for items in tables.values() for item in items]
+        suggestions = {}
+        if fuzzy_threshold is not None:
+            memory = _build_memory(all_items, locale_keys, archive_dir)
+            suggestions = _match_memory(memory, needs, fuzzy_threshold, prefill_item)
+            del memory
+            if not needs:
+                del all_items
+                return
+        translate_reference = get_reference(all_items, languages, cache=cache)
+        del all_items
+
+        def finish_chunk(chunk_idx: int, applied_count: int) -> None:
+            print(f"Successfully translated {applied_count} unique texts in chunk {chunk_idx + 1}")
+
+        # Tables every text is written to, so telemetry can be summarized per table
+        raw_tables = {
+            raw: list(dict.fromkeys(table for variant in variants[raw] for table, _ in index[variant]))
+            for raw in needs
+        }
+
+        chunk_count = translate_texts(
+            api_client,
+            needs,
+            prompt,
+            translate_reference,
+            chunk_size,
+            write_item,
+            finish_chunk,
+            locale_keys,
+            telemetry=telemetry,
+            raw_tables=raw_tables,
+            cache=cache,
+            suggestions=suggestions
+        )
+
+        print(f"Translation process completed for directory: {data_dir}")
+        print(f"Total chunks processed: {chunk_count}, items updated: {written_count}")
+    finally:
+        # Write every modified table once
+        store.flush()
+
+
+def as_languages(target_language: Union[I18nLanguage, Sequence[I18nLanguage]]) -> List[I18nLanguage]:
+    """Target languages as a list without duplicates, a single language becomes a list of one"""
+    if isinstance(target_language, I18nLanguage):
+        return [target_language]
+    languages = list(dict.fromkeys(target_language))
+    if not languages:
+        raise ValueError("No target language given")
+    return languages
+
+
+def _get_prompt_module(target_language: I18nLanguage):
     prompt_module = prompt_module_map.get(target_language)
     if not prompt_module:
         raise ValueError(f"No translation prompt module found for {target_language.value}")
-    
-    # Read the input file
-    with open(file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Filter out texts that are already translated for the target locale
-    locale_key = target_language.value
-    untranslated_items = []
-    
-    for item in data:
-        if (isinstance(item, dict) and 
-            "raw" in item and 
-            "translation" in item):
-            
-            # Check if translation exists and is not empty
-            if (locale_key not in item["translation"] or 
-                not item["translation"][locale_key].get("text", "").strip()):
-                untranslated_items.append(item)
-    
-    if not untranslated_items:
-        print(f"All texts are already translated for {target_language.value}")
-        return
-    
-    print(f"Found {len(untranslated_items)} untranslated items for {target_language.value}")
-    
+    return importlib.import_module(prompt_module)
+
+
+def get_prompt(languages: List[I18nLanguage]) -> TranslationPrompt:
+    """Prompt builder of a single target language, or the combined prompt of several"""
+    return TranslationPrompt({language.value: _get_prompt_module(language) for language in languages})
+
+
+def get_reference(data: List[TranslatedItem], languages: List[I18nLanguage], limit: int = 40, cache: Optional[ResponseCache] = None) -> str:
+    """
+    Reference examples of every target language, the example budget is shared between languages
+
+    With a response cache the examples are picked with a fixed seed, so the same
+    data gives the same prompts and their responses replay; otherwise every run
+    samples new examples.
+    """
+    seed = 0 if cache is not None else None
+    if len(languages) == 1:
+        return build_reference_prompt(data, languages[0], limit, seed)
+    per_language = max(1, limit // len(languages))
+    return '\n\n'.join(
+        f"### {language.value}\n{build_reference_prompt(data, language, per_language, seed)}"
+        for language in languages
+    )
+
+
+def _build_memory(items: Iterable[TranslatedItem], locale_keys: List[str], archive_dir: Optional[Path]) -> TranslationMemory:
+    """Translation memory of the loaded items, followed by the archived ones"""
+    memory = TranslationMemory.from_items(items, locale_keys)
+    if archive_dir is not None and Path(archive_dir).exists():
+        for item in archived_items(archive_dir):
+            memory.add(item)
+    return memory
+
+
+def _match_memory(
+    memory: TranslationMemory,
+    needs: Dict[str, List[str]],
+    threshold: float,
+    prefill: Callable[[str, str, str, str], None]
+) -> Dict[str, Dict[str, FuzzyMatch]]:
+    """
+    Look up the untranslated texts in a translation memory.
+
+    Matches differing only in numbers are passed to `prefill(raw, locale, text, author)`
+    and removed from `needs`, the other matches scoring at least `threshold` are returned
+    as `{raw: {locale: match}}` to be sent as edit tasks.
+    """
+    started = time.perf_counter()
+    suggestions: Dict[str, Dict[str, FuzzyMatch]] = {}
+    prefilled_count = 0
+    for raw in list(needs):
+        for locale_key in list(needs[raw]):
+            match = memory.match(raw, locale_key, threshold)
+            if match is None:
+                continue
+            text = substitute_numbers(raw, match)
+            if text is None:
+                suggestions.setdefault(raw, {})[locale_key] = match
+                continue
+            prefill(raw, locale_key, text, match.author if match.raw == raw else memory_author)
+            needs[raw].remove(locale_key)
+            prefilled_count += 1
+        if not needs[raw]:
+            del needs[raw]
+    print(f"Translation memory of {len(memory)} translations: prefilled {prefilled_count}, "
+          f"{len(suggestions)} texts sent as edit tasks ({time.perf_counter() - started:.2f}s)")
+    return suggestions
+
+
+def _apply_limit(items: list, limit: Optional[int]) -> list:
     # Apply limit if specified
     if limit is not None and limit > 0:
-        original_count = len(untranslated_items)
-        untranslated_items = untranslated_items[:limit]
-        print(f"Limited to {len(untranslated_items)} items (original: {original_count})")
-    
-    # Get base prompt and reference examples
-    base_prompt = prompt_module.prompt
-    translate_reference = get_reference_prompt(file, target_language, 40)
+        original_count = len(items)
+        items = items[:limit]
+        print(f"Limited to {len(items)} items (original: {original_count})")
+    return items
+
+
+def translate_texts(
+    api_client: "anthropic.Anthropic",
+    needs: Dict[str, List[str]],
+    prompt: TranslationPrompt,
+    translate_reference: str,
+    chunk_size: int,
+    apply_item: Callable[[str, str, str, str], None],
+    finish_chunk: Callable[[int, int], None],
+    locales: List[str],
+    max_attempts: int = 3,
+    telemetry: Optional[Telemetry] = None,
+    table: str = all_tables,
+    raw_tables: Optional[Dict[str, List[str]]] = None,
+    cache: Optional[ResponseCache] = None,
+    suggestions: Optional[Dict[str, Dict[str, FuzzyMatch]]] = None
+) -> int:
+    """
+    Translate unique raw texts chunk by chunk.
+
+    `needs` maps every raw text to the locales it is missing. Every text gets a short
+    stable ID and the model answers with an `{id: translation}` object, or with
+    `{id: {locale: translation}}` when several locales are requested at once. Members
+    are parsed while the response streams in, validated and passed to
+    `apply_item(raw, locale, translated, author)` right away, `author` being the model
+    that answered (the winning route of an `LLMRouter`); `finish_chunk(chunk_idx, applied_count)`
+    runs after each chunk. Texts with missing (dropped, merged, truncated) or invalid
+    translations, and the texts of a request failing before any translation, are
+    re-queued until they failed `max_attempts` times.
+
+    Each chunk's prompt only lists the glossary entries its texts contain, and
+    translations missing the target term of such an entry are reported.
+
+    Chunks are packed by an AdaptiveChunker against the token budget, starting at
+    `chunk_size` items. With `telemetry`, one event per chunk is recorded under `table`;
+    with `raw_tables` (`{raw: [table, ...]}`) the event also counts the chunk's texts
+    and applied texts per table they come from.
+    With `cache`, responses to identical prompts are replayed instead of requested;
+    chunk sizing uses the recorded latency so a replay sends the same chunks again.
+    Texts with `suggestions` (`{raw: {locale: match}}` from a translation memory) list
+    the similar translated text in the prompt, to be edited instead of translated anew.
+
+    Returns:
+        Number of processed chunks
+    """
+    multi_locale = len(locales) > 1
+    chunker = AdaptiveChunker(
+        ",".join(locales),
+        fixed_input_tokens=estimate_tokens(prompt.build([])) + estimate_tokens(translate_reference),
+        max_output_tokens=max_output_tokens,
+        initial_items=chunk_size
+    )
+    text_ids = {raw: _short_id(i) for i, raw in enumerate(needs)}
+    remaining = {raw: set(raw_locales) for raw, raw_locales in needs.items()}
+    attempts: Dict[str, int] = {}
+    queue = deque(needs)
+    # When each text entered the queue, and which texts were already requested once
+    run_started = time.monotonic()
+    enqueued = dict.fromkeys(needs, run_started)
+    requested = set()
+    chunk_idx = -1
+
+    if multi_locale:
+        output_format = (
+            "Return ONLY a JSON object that maps every id of the original object to an object with the translation "
+            f"for each of these locales: {', '.join(locales)}. Keep the ids unchanged, do not merge or split entries."
+        )
+        example = ", ".join(f'"{locale}": "translated text {i + 1}"' for i, locale in enumerate(locales))
+        example_format = f'{{"a": {{{example}}}, "b": {{...}}, ...}}'
+    else:
+        output_format = (
+            "Return ONLY a JSON object that maps every id of the original object to its translated text. "
+            "Keep the ids unchanged, do not merge or split entries."
+        )
+        example_format = '{"a": "translated text 1", "b": "translated text 2", ...}'
+
+    def record_chunk(error: Optional[str]) -> None:
+        # Telemetry event of the current chunk
+        tables = None
+        if raw_tables is not None:
+            tables = {}
+            for raw in chunk:
+                for name in raw_tables[raw]:
+                    counts = tables.setdefault(name, {"items": 0, "applied": 0})
+                    counts["items"] += 1
+                    counts["applied"] += raw in applied_raws
+        telemetry.record(
+            table,
+            chunk=chunk_idx + 1,
+            locales=locales,
+            items=len(chunk),
+            queue_wait=round(queue_wait, 3),
+            latency=round(time.monotonic() - started, 3),
+            first_token=round(first_token, 3) if first_token is not None else None,
+            input_tokens=getattr(stream, "input_tokens", None),
+            output_tokens=getattr(stream, "output_tokens", None),
+            cached_tokens=getattr(stream, "cached_tokens", None),
+            retries=retries,
+            validation_failures=rejected_count,
+            glossary_violations=glossary_violations,
+            applied=applied_count,
+            missing=len(pending),
+            truncated=getattr(stream, "truncated", False),
+            error=error,
+            tables=tables,
+        )
+
+    def requeue(reason: str, charge: bool) -> None:
+        # Re-queue the pending texts of the current chunk that have attempts left,
+        # `charge` uses up one attempt of each
+        if charge:
+            for raw in pending.values():
+                attempts[raw] = attempts.get(raw, 0) + 1
+        retry = {raw for raw in pending.values() if attempts.get(raw, 0) < max_attempts}
+        dropped = len(pending) - len(retry)
+        print(f"Warning: {len(pending)} items {reason} in chunk {chunk_idx + 1}, re-queueing {len(retry)}, giving up on {dropped}")
+        # Keep the original order of the remaining texts
+        queue.extendleft(reversed([raw for raw in chunk if raw in retry]))
+        requeued = time.monotonic()
+        for raw in retry:
+            enqueued[raw] = requeued
 
-    
     # Process texts in chunks
-    for chunk_idx, chunk in enumerate(_chunk_items(untranslated_items, chunk_size)):
+    while queue:
+        chunk = chunker.take(queue)
+        chunk_idx += 1
         print(f"Processing chunk {chunk_idx + 1} with {len(chunk)} items...")
-        
-        # Extract raw texts for this chunk
-        raw_texts = [item["raw"] for item in chunk]
-        
+
+        pending = {text_ids[raw]: raw for raw in chunk}
+
         # Create prompt for this chunk
-        texts_array_str = json.dumps(raw_texts, ensure_ascii=False, indent=2)
-        
-        full_prompt = f"""{base_prompt}
+        texts_object_str = json.dumps(pending, ensure_ascii=False, indent=2)
+        similar_texts = _similar_texts(chunk, text_ids, suggestions, remaining, multi_locale)
+
+        full_prompt = f"""{prompt.build(chunk)}
 
 ## Translation Reference Examples:
 {translate_reference}
-
+{similar_texts}
 ## Original Texts to Translate:
-{texts_array_str}
+{texts_object_str}
 
 ## Output Format:
-Return ONLY a JSON array of translated texts in the same order as the original array. Do not include any explanatory text. Do not return markdown code format, just json string
-Example format: ["translated text 1", "translated text 2", ...]
+{output_format} Do not include any explanatory text. Do not return markdown code format, just json string
+Example format: {example_format}
 """
-        
+
         # print(f"Prompt for chunk {chunk_idx + 1}:")
         # print("=" * 50)
         # print(full_prompt)
         # print("=" * 50)
-        
-        # Call translation API
-        model_id = "claude-sonnet-4-20250514"
-        message = api_client.messages.create(
-            model=model_id,
-            max_tokens=4000,
-            messages=[
-                {"role": "user", "content": full_prompt}
-            ]
-        )
-        response = message.content[0].text
-        
+
+        # Call translation API, applying members as they stream in
+        started = time.monotonic()
+        queue_wait = sum(started - enqueued[raw] for raw in chunk) / len(chunk)
+        retries = sum(1 for raw in chunk if raw in requested)
+        requested.update(chunk)
+        stream = None
+        parser = JsonObjectStreamParser()
+        applied_count = 0
+        applied_raws = set()
+        rejected_count = 0
+        glossary_violations = 0
+        first_token = None
+        author = None
+        error = None
         try:
-            # Parse JSON response to get translated texts array
-            translated_texts = json.loads(response.strip())
-            
-            if not isinstance(translated_texts, list):
-                print(f"Warning: API response is not a list for chunk {chunk_idx + 1}")
-                continue
-                
-            if len(translated_texts) != len(raw_texts):
-                print(f"Warning: Translation count mismatch for chunk {chunk_idx + 1}. Expected {len(raw_texts)}, got {len(translated_texts)}")
-                continue
-            
-            # Update the untranslated items with translations
-            for i, item in enumerate(chunk):
-                if i < len(translated_texts):
-                    # Ensure translation structure exists
-                    if locale_key not in item["translation"]:
-                        item["translation"][locale_key] = {}
-                    
-                    # Fill in the translation
-                    item["translation"][locale_key]["text"] = translated_texts[i]
-                    item["translation"][locale_key]["author"] = model_id
-            
-            # Write updated data back to file after each chunk
-            try:
-                with open(file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                print(f"Successfully translated and saved {len(translated_texts)} items in chunk {chunk_idx + 1}")
-            except Exception as e:
-                print(f"Error writing file after chunk {chunk_idx + 1}: {e}")
-                # Continue processing other chunks even if one write fails
+            stream = open_stream(api_client, model_id, full_prompt, chunker.max_output_tokens, cache)
+            for delta in _timed_deltas(stream):
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                    # A routed stream knows its route once text arrives
+                    author = stream_model_name(api_client, stream, model_id)
+                for text_id, value in parser.feed(delta):
+                    raw = pending.get(text_id)
+                    if raw is None:
+                        print(f"Warning: Unknown or duplicated id {text_id!r} in chunk {chunk_idx + 1}")
+                        continue
+                    if multi_locale:
+                        if not isinstance(value, dict):
+                            rejected_count += 1
+                            print(f"Warning: Rejected translation of {raw!r}: expected an object of locales")
+                            continue
+                        translations = value
+                    else:
+                        translations = {locales[0]: value}
+                    applied = False
+                    for locale in sorted(remaining[raw], key=locales.index):
+                        if locale not in translations:
+                            continue
+                        reason = validate_translation(raw, translations[locale])
+                        if reason:
+                            rejected_count += 1
+                            print(f"Warning: Rejected {locale} translation of {raw!r}: {reason}")
+                            continue
+                        violations = prompt.glossary_violations(raw, locale, translations[locale])
+                        if violations:
+                            glossary_violations += len(violations)
+                            terms = ", ".join(f"{source} -> {target}" for source, target in violations)
+                            print(f"Warning: {locale} translation of {raw!r} does not follow glossary: {terms}")
+                        apply_item(raw, locale, translations[locale], author)
+                        remaining[raw].discard(locale)
+                        applied = True
+                    if applied:
+                        applied_count += 1
+                        applied_raws.add(raw)
+                    if not remaining[raw]:
+                        del pending[text_id]
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Error streaming response for chunk {chunk_idx + 1}: {e}")
+            # Without any applied translation there is nothing to salvage, try the texts again later
+            if not applied_count:
+                if telemetry:
+                    record_chunk(error)
+                requeue("failed", charge=True)
                 continue
-            
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response for chunk {chunk_idx + 1}: {e}")
+        latency = time.monotonic() - started
+        response = stream.text
+        if telemetry:
+            record_chunk(error)
+        # A replayed response reports the latency of the original request
+        recorded_latency = getattr(stream, "latency", None)
+        stats = chunker.record(
+            chunk,
+            stream.input_tokens,
+            stream.output_tokens,
+            latency if recorded_latency is None else recorded_latency,
+            stream.truncated,
+            response
+        )
+        print(f"  Chunk {chunk_idx + 1} stats: {stats} glossary_violations={glossary_violations}")
+
+        if not parser.started:
+            print(f"Error parsing JSON response for chunk {chunk_idx + 1}: no JSON object found")
             print(f"Response content: {response}")
-            continue
-        except Exception as e:
-            print(f"Error processing chunk {chunk_idx + 1}: {e}")
-            continue
-    
-    print(f"Translation process completed for file: {file}")
-    print(f"Total chunks processed: {chunk_idx + 1}")
 
+        if pending:
+            # Texts cut off by a truncated multi-item response did not use up an attempt,
+            # the chunker shrinks the next chunks instead
+            reason = "truncated" if stream.truncated else f"missing ({rejected_count} rejected)"
+            requeue(reason, charge=not stream.truncated or len(chunk) == 1)
 
+        if applied_count:
+            finish_chunk(chunk_idx, applied_count)
 
-def _chunk_items(items: List[dict], chunk_size: int) -> Iterator[List[dict]]:
-    """
-    Split items into chunks of specified size.
-    
-    Args:
-        items: List of items to chunk
-        chunk_size: Size of each chunk
-        
-    Yields:
-        List of items for each chunk
-    """
-    for i in range(0, len(items), chunk_size):
-        yield items[i:i + chunk_size]
+    return chunk_idx + 1
+
+
+def _similar_texts(
+    chunk: List[str],
+    text_ids: Dict[str, str],
+    suggestions: Optional[Dict[str, Dict[str, FuzzyMatch]]],
+    remaining: Dict[str, set],
+    multi_locale: bool
+) -> str:
+    """Prompt section listing the translated near-duplicates of the chunk's texts, empty without any"""
+    similar = {}
+    for raw in chunk:
+        matches = {
+            locale: {"similar": match.raw, "translation": match.text}
+            for locale, match in (suggestions or {}).get(raw, {}).items()
+            if locale in remaining[raw]
+        }
+        if matches:
+            similar[text_ids[raw]] = matches if multi_locale else next(iter(matches.values()))
+    if not similar:
+        return ""
+    return (
+        "\n## Similar Translated Texts:\n"
+        "These ids closely resemble texts that are already translated. Start from the given translation "
+        "and only change what differs between the two original texts:\n"
+        f"{json.dumps(similar, ensure_ascii=False, indent=2)}\n"
+    )
+
+
+def _timed_deltas(stream):
+    """Iterate a response stream, recording the time spent waiting for it as the `llm_wait` span"""
+    waited = 0.0
+    iterator = iter(stream)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                delta = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - started
+            yield delta
+    finally:
+        record_span("llm_wait", waited)
+
+
+def _short_id(index: int) -> str:
+    """Base-36 id for the index-th text of a run"""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        index, remainder = divmod(index, 36)
+        result = digits[remainder] + result
+        if index == 0:
+            return result
@@ -5,11 +5,15 @@ Supports OpenAPI format compatible and Gemini format LLM interface calls
 
 import os
 import json
+import random
+import time
 import requests
-from typing import Optional, Dict, List, Any, Union
+from typing import Optional, Dict, List, Any, Union, Iterator, Callable
 from dataclasses import dataclass
 from enum import Enum
 
+from .cache import ResponseCache, cache_key, default_cache_dir
+
 
 class APIProvider(Enum):
     """API provider enumeration"""
@@ -29,21 +33,94 @@ class APIConfig:
     temperature: float = 0.7
     max_tokens: int = 2048
     timeout: int = 30
+    max_retries: int = 2
+
+
+# Status codes worth retrying: timeouts, rate limits, server errors and Anthropic's 529 overloaded
+retryable_status_codes = (408, 429, 500, 502, 503, 504, 529)
+
+
+class ChatStream:
+    """
+    Streaming chat completion response
+
+    Iterating yields text deltas parsed from the server-sent events. The full
+    text, finish reason and token usage are filled in as events arrive.
+    """
+
+    def __init__(self, response: requests.Response, parse_event: Callable[["ChatStream", Dict[str, Any]], Iterator[str]], truncation_reasons: tuple):
+        self.response = response
+        self._parse_event = parse_event
+        self._truncation_reasons = truncation_reasons
+        self.text = ""
+        self.finish_reason: Optional[str] = None
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.finish_reason in self._truncation_reasons
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for event in iter_sse_events(self.response):
+                for delta in self._parse_event(self, event):
+                    self.text += delta
+                    yield delta
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.response.close()
+
+
+def iter_sse_events(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Yield the JSON payload of every `data:` event of a server-sent events response"""
+    # Server-sent events are always UTF-8, requests would fall back to ISO-8859-1
+    # for a `text/event-stream` response without charset
+    response.encoding = "utf-8"
+    data_lines: List[str] = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data.strip() == "[DONE]":
+                    return
+                yield json.loads(data)
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data.strip() != "[DONE]":
+            yield json.loads(data)
 
 
 class LLMAPIClient:
     """LLM API client, supports multiple API formats"""
     
-    def __init__(self, config: Optional[APIConfig] = None):
+    def __init__(self, config: Optional[APIConfig] = None, cache: Optional[ResponseCache] = None):
         """
         Initialize API client
         
         Args:
             config: API configuration, if None load from environment variables
+            cache: Response cache for chat_completion, if None use LLM_CACHE_MODE / LLM_CACHE_DIR when set
         """
         if config is None:
             config = self._load_config_from_env()
         self.config = config
+        if cache is None and os.getenv('LLM_CACHE_MODE', 'off') != 'off':
+            cache = ResponseCache(os.getenv('LLM_CACHE_DIR', str(default_cache_dir)), os.getenv('LLM_CACHE_MODE'))
+        self.cache = cache
+        # Number of requests retried after a retryable status, for load tests
+        self.retries = 0
         
     def _load_config_from_env(self) -> APIConfig:
         """Load configuration from environment variables"""
@@ -59,6 +136,7 @@ class LLMAPIClient:
         temperature = float(os.getenv('LLM_TEMPERATURE', '0.7'))
         max_tokens = int(os.getenv('LLM_MAX_TOKENS', '2048'))
         timeout = int(os.getenv('LLM_TIMEOUT', '30'))
+        max_retries = int(os.getenv('LLM_MAX_RETRIES', '2'))
         
         return APIConfig(
             provider=provider,
@@ -67,7 +145,8 @@ class LLMAPIClient:
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
-            timeout=timeout
+            timeout=timeout,
+            max_retries=max_retries
         )
     
     def _get_default_base_url(self, provider: APIProvider) -> str:
@@ -90,6 +169,40 @@ class LLMAPIClient:
         }
         return defaults.get(provider, "gpt-3.5-turbo")
     
+    def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """
+        POST a request, retrying retryable status codes with exponential backoff
+
+        A `Retry-After` header from the server takes precedence over the backoff.
+        The response of the last attempt is checked with `raise_for_status`.
+        """
+        attempt = 0
+        while True:
+            response = requests.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=self.config.timeout,
+                stream=stream
+            )
+            if response.status_code not in retryable_status_codes or attempt >= self.config.max_retries:
+                break
+            delay = min(0.5 * 2 ** attempt, 8.0) * random.uniform(0.75, 1.0)
+            try:
+                delay = float(response.headers.get("retry-after", delay))
+            except ValueError:
+                pass
+            response.close()
+            attempt += 1
+            self.retries += 1
+            time.sleep(min(delay, 60.0))
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+    
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -109,14 +222,31 @@ class LLMAPIClient:
         Returns:
             API response result
         """
+        key = None
+        if self.cache is not None and self.cache.mode != "off":
+            params = {
+                "provider": self.config.provider.value,
+                "temperature": temperature or self.config.temperature,
+                "max_tokens": max_tokens or self.config.max_tokens,
+                **kwargs
+            }
+            key = cache_key(self.config.model, params, messages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
         if self.config.provider == APIProvider.OPENAI:
-            return self._openai_chat_completion(messages, temperature, max_tokens, **kwargs)
+            response = self._openai_chat_completion(messages, temperature, max_tokens, **kwargs)
         elif self.config.provider == APIProvider.GEMINI:
-            return self._gemini_chat_completion(messages, temperature, max_tokens, **kwargs)
+            response = self._gemini_chat_completion(messages, temperature, max_tokens, **kwargs)
         elif self.config.provider == APIProvider.CLAUDE:
-            return self._claude_chat_completion(messages, temperature, max_tokens, **kwargs)
+            response = self._claude_chat_completion(messages, temperature, max_tokens, **kwargs)
         else:
-            return self._custom_chat_completion(messages, temperature, max_tokens, **kwargs)
+            response = self._custom_chat_completion(messages, temperature, max_tokens, **kwargs)
+
+        if key is not None:
+            self.cache.put(key, response, self.config.model)
+        return response
     
     def _openai_chat_completion(
         self,
@@ -141,13 +271,7 @@ class LLMAPIClient:
             **kwargs
         }
         
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=self.config.timeout
-        )
-        response.raise_for_status()
+        response = self._post(url, headers, payload)
         return response.json()
     
     def _gemini_chat_completion(
@@ -177,13 +301,7 @@ class LLMAPIClient:
             }
         }
         
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=self.config.timeout
-        )
-        response.raise_for_status()
+        response = self._post(url, headers, payload)
         return response.json()
     
     def _claude_chat_completion(
@@ -223,15 +341,88 @@ class LLMAPIClient:
         if system_message:
             payload["system"] = system_message
         
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=self.config.timeout
-        )
-        response.raise_for_status()
+        response = self._post(url, headers, payload)
         return response.json()
     
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> ChatStream:
+        """
+        Send a streaming chat completion request
+        
+        Args:
+            messages: Message list, format: [{"role": "user", "content": "..."}]
+            temperature: Temperature parameter
+            max_tokens: Maximum token count
+            **kwargs: Other parameters
+            
+        Returns:
+            ChatStream yielding text deltas
+        """
+        if self.config.provider == APIProvider.GEMINI:
+            url = f"{self.config.base_url}/models/{self.config.model}:streamGenerateContent?alt=sse"
+            headers = {
+                "Content-Type": "application/json",
+                "x-goog-api-key": self.config.api_key
+            }
+            payload = {
+                "contents": self._convert_to_gemini_format(messages),
+                "generationConfig": {
+                    "temperature": temperature or self.config.temperature,
+                    "maxOutputTokens": max_tokens or self.config.max_tokens,
+                    **kwargs
+                }
+            }
+            parse_event, truncation_reasons = _parse_gemini_event, ("MAX_TOKENS",)
+        elif self.config.provider == APIProvider.CLAUDE:
+            url = f"{self.config.base_url}/v1/messages"
+            headers = {
+                "Authorization": f"Bearer {self.config.api_key}",
+                "Content-Type": "application/json",
+                "anthropic-version": "2023-06-01"
+            }
+            system_message = None
+            user_messages = []
+            for msg in messages:
+                if msg["role"] == "system":
+                    system_message = msg["content"]
+                else:
+                    user_messages.append(msg)
+            payload = {
+                "model": self.config.model,
+                "messages": user_messages,
+                "temperature": temperature or self.config.temperature,
+                "max_tokens": max_tokens or self.config.max_tokens,
+                "stream": True,
+                **kwargs
+            }
+            if system_message:
+                payload["system"] = system_message
+            parse_event, truncation_reasons = _parse_claude_event, ("max_tokens",)
+        else:
+            url = f"{self.config.base_url}/chat/completions"
+            headers = {
+                "Authorization": f"Bearer {self.config.api_key}",
+                "Content-Type": "application/json"
+            }
+            payload = {
+                "model": self.config.model,
+                "messages": messages,
+                "temperature": temperature or self.config.temperature,
+                "max_tokens": max_tokens or self.config.max_tokens,
+                "stream": True,
+                "stream_options": {"include_usage": True},
+                **kwargs
+            }
+            parse_event, truncation_reasons = _parse_openai_event, ("length",)
+        
+        response = self._post(url, headers, payload, stream=True)
+        return ChatStream(response, parse_event, truncation_reasons)
+    
     def _custom_chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -281,6 +472,58 @@ class LLMAPIClient:
             raise ValueError(f"Unsupported provider: {self.config.provider}")
 
 
+def _parse_openai_event(stream: ChatStream, event: Dict[str, Any]) -> Iterator[str]:
+    """OpenAI format stream chunk: choices[].delta.content, usage in the final chunk"""
+    for choice in event.get("choices") or []:
+        content = (choice.get("delta") or {}).get("content")
+        if content:
+            yield content
+        if choice.get("finish_reason"):
+            stream.finish_reason = choice["finish_reason"]
+    usage = event.get("usage")
+    if usage:
+        stream.input_tokens = usage.get("prompt_tokens")
+        stream.output_tokens = usage.get("completion_tokens")
+        stream.cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+
+
+def _parse_gemini_event(stream: ChatStream, event: Dict[str, Any]) -> Iterator[str]:
+    """Gemini format stream chunk: candidates[].content.parts[].text, usageMetadata"""
+    for candidate in event.get("candidates") or []:
+        for part in (candidate.get("content") or {}).get("parts") or []:
+            if part.get("text"):
+                yield part["text"]
+        if candidate.get("finishReason"):
+            stream.finish_reason = candidate["finishReason"]
+    usage = event.get("usageMetadata")
+    if usage:
+        stream.input_tokens = usage.get("promptTokenCount")
+        stream.output_tokens = usage.get("candidatesTokenCount")
+        stream.cached_tokens = usage.get("cachedContentTokenCount")
+
+
+def _parse_claude_event(stream: ChatStream, event: Dict[str, Any]) -> Iterator[str]:
+    """Claude format stream event: message_start, content_block_delta, message_delta"""
+    event_type = event.get("type")
+    if event_type == "message_start":
+        usage = (event.get("message") or {}).get("usage") or {}
+        stream.input_tokens = usage.get("input_tokens")
+        stream.cached_tokens = usage.get("cache_read_input_tokens")
+    elif event_type == "content_block_delta":
+        delta = event.get("delta") or {}
+        if delta.get("type") == "text_delta" and delta.get("text"):
+            yield delta["text"]
+    elif event_type == "message_delta":
+        stop_reason = (event.get("delta") or {}).get("stop_reason")
+        if stop_reason:
+            stream.finish_reason = stop_reason
+        usage = event.get("usage") or {}
+        if "output_tokens" in usage:
+            stream.output_tokens = usage["output_tokens"]
+    elif event_type == "error":
+        raise RuntimeError(f"Stream error: {event.get('error')}")
+
+
 def translate_text(
     text: str,
     target_language: str = "zh-CN",
@@ -394,6 +637,9 @@ def batch_translate(
 # export LLM_TEMPERATURE=0.7
 # export LLM_MAX_TOKENS=2048
 # export LLM_TIMEOUT=30
+# export LLM_MAX_RETRIES=2
+# export LLM_CACHE_MODE=readwrite     # or off, read, write
+# export LLM_CACHE_DIR=.cache/llm-responses
 
 
 if __name__ == "__main__":
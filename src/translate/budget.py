@@ -0,0 +1,132 @@
+"""
+Token budget estimation and adaptive chunking for translation requests
+"""
+
+from typing import Deque, Dict, List, Optional
+
+# Output tokens per input token of raw Japanese text, refined from observed usage
+default_output_ratios: Dict[str, float] = {
+    "zh-CN": 1.1,
+    "en": 1.5,
+}
+
+# Tokens spent on JSON quoting, separators and indentation for every item
+item_overhead_tokens = 4
+
+
+def is_wide_char(char: str) -> bool:
+    """CJK, kana and full-width characters, which tokenize to roughly one token each"""
+    code = ord(char)
+    return (
+        0x3000 <= code <= 0x30FF or  # CJK symbols, Hiragana, Katakana
+        0x3400 <= code <= 0x9FFF or  # CJK Unified Ideographs
+        0xF900 <= code <= 0xFAFF or  # CJK Compatibility Ideographs
+        0xFF00 <= code <= 0xFFEF     # Full-width forms
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the token count of a text without a tokenizer:
+    one token per wide character, one per four other characters
+    """
+    wide = sum(1 for char in text if is_wide_char(char))
+    narrow = len(text) - wide
+    return wide + (narrow + 3) // 4
+
+
+class AdaptiveChunker:
+    """
+    Packs texts into chunks that fit an estimated input and output token budget
+
+    The item cap grows while chunks complete quickly, halves after a truncated
+    response and shrinks when a request is slower than `target_latency`. The
+    output/input ratio for the locale is an exponential moving average of the
+    observed usage.
+    """
+
+    def __init__(
+        self,
+        locale: str,
+        fixed_input_tokens: int = 0,
+        max_input_tokens: int = 16000,
+        max_output_tokens: int = 4000,
+        initial_items: int = 24,
+        max_items: int = 96,
+        target_latency: float = 90.0,
+        output_margin: float = 0.8,
+    ):
+        self.locale = locale
+        self.fixed_input_tokens = fixed_input_tokens
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.item_cap = max(1, min(initial_items, max_items))
+        self.max_items = max_items
+        self.target_latency = target_latency
+        self.output_margin = output_margin
+        # Several comma separated locales are answered in one response, their outputs add up
+        self.output_ratio = sum(default_output_ratios.get(key, 1.5) for key in locale.split(","))
+        self.truncations = 0
+        # Smallest chunk size that was truncated, the cap does not grow back past it
+        self.truncated_size = max_items + 1
+
+    def estimate_output(self, input_tokens: int) -> int:
+        return int(input_tokens * self.output_ratio)
+
+    def take(self, queue: Deque[str]) -> List[str]:
+        """Pop the next chunk from the front of the queue"""
+        chunk: List[str] = []
+        input_tokens = self.fixed_input_tokens
+        text_tokens = 0
+        output_budget = self.max_output_tokens * self.output_margin
+        while queue and len(chunk) < self.item_cap:
+            tokens = estimate_tokens(queue[0]) + item_overhead_tokens
+            fits = (
+                input_tokens + tokens <= self.max_input_tokens and
+                self.estimate_output(text_tokens + tokens) <= output_budget
+            )
+            # Always send at least one item, even if it exceeds the budget on its own
+            if chunk and not fits:
+                break
+            chunk.append(queue.popleft())
+            input_tokens += tokens
+            text_tokens += tokens
+        return chunk
+
+    def record(
+        self,
+        chunk: List[str],
+        input_tokens: Optional[int],
+        output_tokens: Optional[int],
+        latency: float,
+        truncated: bool,
+        output_text: str = "",
+    ) -> str:
+        """
+        Update the ratio and item cap from one finished request
+
+        Returns:
+            One-line stats summary for logging
+        """
+        text_tokens = sum(estimate_tokens(text) + item_overhead_tokens for text in chunk)
+        observed_output = output_tokens if output_tokens is not None else estimate_tokens(output_text)
+        if not truncated and text_tokens and observed_output:
+            ratio = observed_output / text_tokens
+            self.output_ratio = 0.7 * self.output_ratio + 0.3 * ratio
+
+        if truncated:
+            self.truncations += 1
+            self.truncated_size = min(self.truncated_size, len(chunk))
+            self.item_cap = max(1, len(chunk) // 2)
+        elif latency > self.target_latency:
+            self.item_cap = max(1, int(len(chunk) * 0.75))
+        elif len(chunk) >= self.item_cap:
+            grown = self.item_cap + max(1, self.item_cap // 4)
+            self.item_cap = max(1, min(self.max_items, self.truncated_size - 1, grown))
+
+        return (
+            f"items={len(chunk)} est_text_tokens={text_tokens} "
+            f"input_tokens={input_tokens if input_tokens is not None else '?'} "
+            f"output_tokens={observed_output} ratio={self.output_ratio:.2f} "
+            f"latency={latency:.1f}s truncated={truncated} next_cap={self.item_cap}"
+        )
@@ -0,0 +1,211 @@
+"""
+On-disk cache of LLM responses keyed by a hash of the request
+
+Every entry is one JSON file named after the SHA-256 of model, parameters and
+messages, so replaying a run over the same `data/` snapshot answers identical
+requests without calling the API. Entries expire after a TTL and the least
+recently used ones are evicted once the cache grows past its size bound.
+"""
+
+import json
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+cache_modes = ["off", "read", "write", "readwrite"]
+
+default_cache_dir = Path(".cache") / "llm-responses"
+default_max_bytes = 512 * 1024 * 1024
+default_ttl = 30 * 24 * 3600
+
+
+def cache_key(model: str, params: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+    """SHA-256 of the canonical JSON of a request"""
+    payload = json.dumps(
+        {"model": model, "params": params, "messages": messages},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of responses with a TTL
+
+    Args:
+        directory: Cache directory, entries are sharded by the first two hex digits of the key
+        mode: One of `cache_modes`, "read" only replays and "write" only records
+        max_bytes: Size bound of all entries, least recently used entries are evicted beyond it
+        ttl: Seconds an entry stays valid, 0 keeps entries forever
+    """
+
+    def __init__(self, directory: Path = default_cache_dir, mode: str = "readwrite", max_bytes: int = default_max_bytes, ttl: float = default_ttl):
+        if mode not in cache_modes:
+            raise ValueError(f"Unknown cache mode {mode!r}, choose from {', '.join(cache_modes)}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Key -> [last access time, size], scanned from disk on first use
+        self._index: Optional[Dict[str, List[float]]] = None
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ("read", "readwrite")
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ("write", "readwrite")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self) -> Dict[str, List[float]]:
+        if self._index is None:
+            self._index = {}
+            if self.directory.exists():
+                for file in self.directory.glob("*/*.json"):
+                    stat = file.stat()
+                    self._index[file.stem] = [stat.st_mtime, stat.st_size]
+        return self._index
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response of a request, or None on a miss or in write-only mode"""
+        if not self.readable:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        now = time.time()
+        if self.ttl and now - entry.get("created", 0) > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+        # The modification time doubles as the last access time for LRU eviction
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index[key][0] = now
+        self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response: Dict[str, Any], model: str = "") -> None:
+        """Store a response and evict old entries beyond the size bound"""
+        if not self.writable:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"created": time.time(), "model": model, "response": response}, ensure_ascii=False)
+        temp_file = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_file, path)
+        self.writes += 1
+        with self._lock:
+            index = self._load_index()
+            index[key] = [time.time(), path.stat().st_size]
+            self._evict(index)
+
+    def _remove(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+        with self._lock:
+            self._load_index().pop(key, None)
+
+    def _evict(self, index: Dict[str, List[float]]) -> None:
+        total = sum(size for _, size in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(index.items(), key=lambda kv: kv[1][0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            del index[key]
+            total -= size
+            self.evictions += 1
+
+    def summary(self) -> str:
+        return f"Response cache ({self.mode}): {self.hits} hits, {self.misses} misses, {self.writes} writes, {self.evictions} evictions"
+
+
+class CachedStream:
+    """Replays a cached streaming response through the `ChatStream` interface"""
+
+    def __init__(self, response: Dict[str, Any]):
+        self._response = response
+        self.text = ""
+        self.finish_reason: Optional[str] = response.get("finish_reason")
+        self.input_tokens: Optional[int] = response.get("input_tokens")
+        self.output_tokens: Optional[int] = response.get("output_tokens")
+        self.cached_tokens: Optional[int] = response.get("cached_tokens")
+        # Latency of the original request, keeps chunk sizing identical on replay
+        self.latency: Optional[float] = response.get("latency")
+        # Model that answered, when it differs from the requested one (a router's route)
+        self.model: Optional[str] = response.get("model")
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self._response.get("truncated"))
+
+    def __iter__(self) -> Iterator[str]:
+        self.text = self._response["text"]
+        if self.text:
+            yield self.text
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingStream:
+    """Passes a live stream through and caches it once it was read to the end"""
+
+    def __init__(self, stream, cache: ResponseCache, key: str, model: str):
+        self._stream = stream
+        self._cache = cache
+        self._key = key
+        self._model = model
+        self._started = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._stream
+        self.latency = time.monotonic() - self._started
+        self._cache.put(self._key, {
+            "text": self._stream.text,
+            "finish_reason": getattr(self._stream, "finish_reason", None),
+            "truncated": self._stream.truncated,
+            "input_tokens": self._stream.input_tokens,
+            "output_tokens": self._stream.output_tokens,
+            "cached_tokens": self._stream.cached_tokens,
+            "latency": self.latency,
+            "model": getattr(self._stream, "model", None),
+        }, self._model)
+
+    def close(self) -> None:
+        self._stream.close()
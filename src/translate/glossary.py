@@ -0,0 +1,97 @@
+"""
+Glossary matching for translation prompts
+
+`GlossaryMatcher` builds Aho-Corasick automata over the source and target terms
+of a glossary once, so a chunk of raw texts is scanned in linear time for the
+entries it needs, and translations are checked for the matching target terms
+without any extra model call.
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        # State 0 is the root, every state has its transitions, failure link and matched pattern indices
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._add(pattern, index)
+        self._link()
+
+    def _add(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(index)
+
+    def _link(self) -> None:
+        # Breadth-first, so the failure target of a state is always finished before the state
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        """Indices of the patterns occurring in the text"""
+        found: Set[int] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class GlossaryMatcher:
+    """
+    Finds the glossary entries used by raw texts and checks translations for their target terms
+
+    Target terms are matched case-insensitively.
+    """
+
+    def __init__(self, glossary: Dict[str, str]):
+        self.sources = list(glossary)
+        self.targets = [glossary[source] for source in self.sources]
+        self._source_automaton = AhoCorasick(self.sources)
+        self._target_automaton = AhoCorasick(target.lower() for target in self.targets)
+
+    def entries(self, raw_texts: Iterable[str]) -> Dict[str, str]:
+        """Glossary entries occurring in any of the texts, in glossary order"""
+        found: Set[int] = set()
+        for text in raw_texts:
+            found |= self._source_automaton.search(text)
+        return {self.sources[index]: self.targets[index] for index in sorted(found)}
+
+    def violations(self, raw: str, translated: str) -> List[Tuple[str, str]]:
+        """`(source, target)` entries used by the raw text whose target term is missing from the translation"""
+        required = self._source_automaton.search(raw)
+        if not required:
+            return []
+        present = self._target_automaton.search(translated.lower())
+        return [(self.sources[index], self.targets[index]) for index in sorted(required - present)]
+
+
+def format_glossary(entries: Dict[str, str]) -> str:
+    """Glossary lines as listed in the prompts"""
+    return '\n'.join([f"- {k} - {v}" for k, v in entries.items()])
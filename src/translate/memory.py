@@ -0,0 +1,227 @@
+"""
+Fuzzy translation memory over the already translated raw texts
+
+Many new texts differ from a translated one by a word or a number. The memory
+keeps a character bigram inverted index per locale: a query counts the bigrams
+it shares with every indexed raw text, keeps the best candidates by Dice
+coefficient and verifies them with a bounded edit distance. The similarity score
+is `1 - distance / longer length`. Raw texts are compared by their canonical key,
+so width and spacing variants of a translated text are exact matches.
+"""
+
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..model.canonical import canonical_key
+from ..model.localization import TranslatedItem, load_archive
+
+# Author of translations prefilled from the memory, counted as machine translations
+memory_author = "translation-memory"
+
+default_threshold = 0.8
+
+_number_pattern = re.compile(r"\d+")
+
+
+class FuzzyMatch(NamedTuple):
+    raw: str
+    text: str
+    author: str
+    score: float
+
+
+def edit_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """
+    Levenshtein distance of two strings
+
+    Args:
+        a: First string
+        b: Second string
+        max_distance: Stop once the distance exceeds this bound and return `max_distance + 1`
+
+    Returns:
+        Number of single character insertions, deletions and substitutions
+    """
+    # A common prefix and suffix do not change the distance
+    prefix = 0
+    shortest = min(len(a), len(b))
+    while prefix < shortest and a[prefix] == b[prefix]:
+        prefix += 1
+    a = a[prefix:]
+    b = b[prefix:]
+    suffix = 0
+    shortest -= prefix
+    while suffix < shortest and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    if suffix:
+        a = a[:-suffix]
+        b = b[:-suffix]
+
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    if len(a) - len(b) > max_distance:
+        return max_distance + 1
+    if not b:
+        return min(len(a), max_distance + 1)
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+def similarity(a: str, b: str, min_score: float = 0.0) -> float:
+    """Edit distance similarity in [0, 1], 0.0 when it is below `min_score`"""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    max_distance = int((1 - min_score) * longest)
+    distance = edit_distance(a, b, max_distance)
+    if distance > max_distance:
+        return 0.0
+    return 1 - distance / longest
+
+
+def _grams(text: str) -> set:
+    # Padded bigrams, so one and two character texts still share grams with their variants
+    padded = f"\x02{text}\x03"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class TranslationMemory:
+    """
+    Bigram index of translated raw texts, one per locale
+
+    Args:
+        locales: Locales to index
+        candidates: Candidates verified by edit distance per query
+    """
+
+    def __init__(self, locales: Sequence[str], candidates: int = 8):
+        self.locales = list(locales)
+        self.candidates = candidates
+        # Per locale: (raw, text, author) entries, their canonical keys and bigram counts,
+        # canonical key -> entry position, and bigram -> entry positions
+        self._entries: Dict[str, List[Tuple[str, str, str]]] = {locale: [] for locale in self.locales}
+        self._keys: Dict[str, List[str]] = {locale: [] for locale in self.locales}
+        self._sizes: Dict[str, List[int]] = {locale: [] for locale in self.locales}
+        self._positions: Dict[str, Dict[str, int]] = {locale: {} for locale in self.locales}
+        self._postings: Dict[str, Dict[str, List[int]]] = {locale: {} for locale in self.locales}
+
+    @classmethod
+    def from_items(cls, items: Iterable[TranslatedItem], locales: Sequence[str], candidates: int = 8) -> "TranslationMemory":
+        memory = cls(locales, candidates)
+        for item in items:
+            memory.add(item)
+        return memory
+
+    def add(self, item: TranslatedItem) -> None:
+        """Index the translations of an item, the first translation of a canonical raw text wins"""
+        key = canonical_key(item.raw)
+        grams = None
+        for locale in self.locales:
+            positions = self._positions[locale]
+            if key in positions or not item.has_text(locale):
+                continue
+            if grams is None:
+                grams = _grams(key)
+            entries = self._entries[locale]
+            position = len(entries)
+            positions[key] = position
+            entries.append((item.raw, item.get_text(locale), item.get_author(locale)))
+            self._keys[locale].append(key)
+            self._sizes[locale].append(len(grams))
+            postings = self._postings[locale]
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = [position]
+                else:
+                    posting.append(position)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def match(self, raw: str, locale: str, threshold: float = 0.0) -> Optional[FuzzyMatch]:
+        """
+        Most similar translated raw text of a locale
+
+        Args:
+            raw: Raw text to look up
+            locale: Locale whose translations are searched
+            threshold: Minimum similarity score
+
+        Returns:
+            The best match scoring at least `threshold`, or None
+        """
+        entries = self._entries[locale]
+        key = canonical_key(raw)
+        position = self._positions[locale].get(key)
+        if position is not None:
+            return FuzzyMatch(*entries[position], 1.0)
+
+        grams = _grams(key)
+        postings = self._postings[locale]
+        shared = Counter()
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is not None:
+                shared.update(posting)
+        if not shared:
+            return None
+
+        # Candidate filter: most shared bigrams first, then by Dice coefficient
+        sizes = self._sizes[locale]
+        size = len(grams)
+        candidates = shared.most_common(self.candidates * 4)
+        candidates.sort(key=lambda candidate: -2 * candidate[1] / (size + sizes[candidate[0]]))
+
+        keys = self._keys[locale]
+        best = None
+        best_score = threshold
+        for position, _ in candidates[:self.candidates]:
+            score = similarity(key, keys[position], best_score)
+            if score and (best is None or score > best_score):
+                best = position
+                best_score = score
+        if best is None:
+            return None
+        return FuzzyMatch(*entries[best], best_score)
+
+
+def archived_items(archive_dir: Path) -> Iterator[TranslatedItem]:
+    """Items pruned from the data tables into the per-table archives of `archive_dir`"""
+    for file in sorted(Path(archive_dir).glob("*.jsonl")):
+        yield from load_archive(file)
+
+
+def substitute_numbers(raw: str, match: FuzzyMatch) -> Optional[str]:
+    """
+    Translation of `raw` derived from a match differing only in numbers
+
+    The numbers of the matched raw text must appear in the same order in its
+    translation; they are replaced by the numbers of `raw`. Both raw texts are
+    compared by their canonical key.
+
+    Returns:
+        The derived translation, or None when the texts differ in more than numbers
+    """
+    key = canonical_key(raw)
+    match_key = canonical_key(match.raw)
+    if key == match_key:
+        return match.text
+    if _number_pattern.sub("#", key) != _number_pattern.sub("#", match_key):
+        return None
+    old_numbers = _number_pattern.findall(match_key)
+    if _number_pattern.findall(match.text) != old_numbers:
+        return None
+    new_numbers = iter(_number_pattern.findall(key))
+    return _number_pattern.sub(lambda _: next(new_numbers), match.text)
@@ -1,9 +1,11 @@
 from pathlib import Path
-import json
 import random
-from src.model.localization import I18nLanguage
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.model.localization import I18nLanguage, TranslatedItem, load_items, machine_author_keywords
+from src.translate.glossary import GlossaryMatcher, format_glossary
 
-author_exclude_keyword = ["ai", "claude", "llm"]
+author_exclude_keyword = machine_author_keywords
 
 def get_reference_prompt(input_file: Path, locale: I18nLanguage, limit: int = 30) -> str:
     """
@@ -17,31 +19,37 @@ def get_reference_prompt(input_file: Path, locale: I18nLanguage, limit: int = 30
     Returns:
         Formatted string with original text and translations
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    return build_reference_prompt(load_items(input_file), locale, limit)
+
+def build_reference_prompt(data: List[TranslatedItem], locale: I18nLanguage, limit: int = 30, seed: Optional[int] = None) -> str:
+    """
+    Generate reference prompt from already loaded translation items
     
+    Args:
+        data: Items of a translation table
+        locale: Target locale for translation examples
+        limit: Maximum number of examples to include
+        seed: Seed of the example sampling, the same data then gives the same examples (default: None, sampled anew)
+        
+    Returns:
+        Formatted string with original text and translations
+    """
     # Filter items that have translations for the specified locale
     valid_items = []
     locale_key = locale.value
     
     for item in data:
-        if (isinstance(item, dict) and 
-            "raw" in item and 
-            "translation" in item and
-            locale_key in item["translation"] and
-            item["translation"][locale_key].get("text", "").strip()):
+        if item.has_text(locale_key):
             
             # Check if author contains any excluded keywords
-            author = item["translation"][locale_key].get("author", "").lower()
+            author = item.get_author(locale_key).lower()
             if any(keyword in author for keyword in author_exclude_keyword):
                 continue
             
-            raw_text = item["raw"]
-            translated_text = item["translation"][locale_key]["text"]
-            valid_items.append((raw_text, translated_text))
+            valid_items.append((item.raw, item.get_text(locale_key)))
     
     # Shuffle the items randomly
-    random.shuffle(valid_items)
+    random.Random(seed).shuffle(valid_items)
     
     # Take only the first 'limit' items
     selected_items = valid_items[:limit]
@@ -51,4 +59,52 @@ def get_reference_prompt(input_file: Path, locale: I18nLanguage, limit: int = 30
     for raw_text, translated_text in selected_items:
         result_lines.append(f"{raw_text}: {translated_text}")
     
-    return '\n'.join(result_lines)
\ No newline at end of file
+    return '\n'.join(result_lines)
+
+def combine_prompts(prompts: Dict[str, str]) -> str:
+    """
+    Combine the prompts of several target locales into one prompt for multi-locale requests
+    
+    Args:
+        prompts: Prompt text of every target locale, in output order
+        
+    Returns:
+        Prompt asking for every locale at once, followed by the per-locale requirements
+    """
+    locales = ', '.join(prompts)
+    sections = [
+        "## Targets\n"
+        f"Translate every Japanese text into each of these languages in one pass: {locales}.\n"
+        "Follow the requirements of each target language below; they only apply to that language's translation."
+    ]
+    for locale, prompt in prompts.items():
+        sections.append(f"# Target language: {locale}\n{prompt}")
+    return '\n\n'.join(sections)
+
+
+class TranslationPrompt:
+    """
+    Builds the prompt of each chunk with only the glossary entries its raw texts use,
+    and checks translations against those entries afterwards
+    
+    Args:
+        modules: Prompt module (`glossary`, `build_prompt`) of every target locale, in output order
+    """
+
+    def __init__(self, modules: Dict[str, ModuleType]):
+        self.modules = modules
+        self.matchers = {locale: GlossaryMatcher(module.glossary) for locale, module in modules.items()}
+
+    def build(self, raw_texts: Iterable[str]) -> str:
+        raw_texts = list(raw_texts)
+        prompts = {
+            locale: module.build_prompt(format_glossary(self.matchers[locale].entries(raw_texts)))
+            for locale, module in self.modules.items()
+        }
+        if len(prompts) == 1:
+            return next(iter(prompts.values()))
+        return combine_prompts(prompts)
+
+    def glossary_violations(self, raw: str, locale: str, translated: str) -> List[Tuple[str, str]]:
+        """Glossary `(source, target)` entries of the raw text not followed by the translation"""
+        return self.matchers[locale].violations(raw, translated)
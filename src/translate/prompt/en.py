@@ -35,7 +35,9 @@ You are an experienced localization translator, and you need to translate the ba
 Translate Japanese into **English** (do not translate into other languages), ensuring that the language is natural and fluent, and that the context is coherent, while corresponding to each line of content.
 """
 
-prompt = f"""{prompt_base}
+def build_prompt(glossary_entries: str) -> str:
+    """Prompt listing the given glossary lines"""
+    return f"""{prompt_base}
 ## Detailed Requirements
 - Language: Translate Japanese into the target language.
 - Number of lines: The output should have the same number of lines as the input. Do not output any additional explanatory text.
@@ -46,4 +48,7 @@ prompt = f"""{prompt_base}
 {glossary_entries}
 
 Additionally, users may provide supplementary specific translation terms, which you should adhere to if provided.
-"""
\ No newline at end of file
+"""
+
+
+prompt = build_prompt(glossary_entries)
\ No newline at end of file
@@ -35,7 +35,9 @@ prompt_base = """##角色
 将日文翻译成**简体中文**（不要翻译为其它语言），在每行内容对应的前提下，确保语言自然流畅，并使得上下文通顺。
 """
 
-prompt = f"""{prompt_base}
+def build_prompt(glossary_entries: str) -> str:
+    """Prompt listing the given glossary lines"""
+    return f"""{prompt_base}
 ## 详细要求
 - 语言：将日文翻译为目标语言。
 - 行数：输出应与输入的行数相同。不要输出任何额外的说明性文字。
@@ -46,4 +48,7 @@ prompt = f"""{prompt_base}
 {glossary_entries}
 
 此外，用户还可能会补充额外的特定翻译术语，如果提供请你遵守。
-"""
\ No newline at end of file
+"""
+
+
+prompt = build_prompt(glossary_entries)
\ No newline at end of file
@@ -0,0 +1,394 @@
+"""
+Latency-aware routing of requests over several LLM providers
+
+`LLMRouter` holds one `LLMAPIClient` per configured provider/model and keeps a
+moving average of the time to the first streamed text and of the error rate of
+each. Every request goes to the best route; errors before the first text fail
+over to the next one, and a route failing repeatedly is skipped for a growing
+cooldown. With hedging, a duplicate request goes to the next route once the
+first has not answered within its p95 latency; whichever streams first wins and
+the other stream is closed.
+
+The router has the `stream_chat_completion` / `chat_completion` interface of
+`LLMAPIClient`, so it can be passed to `translate_file` as the API client.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from .api import APIConfig, APIProvider, LLMAPIClient
+from .telemetry import percentile
+
+
+class RouteStats:
+    """Moving latency and error rate of one route"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 100):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.wins = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+    def success(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * latency
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.samples.append(latency)
+        self.consecutive_errors = 0
+
+    def failure(self, cooldown: float) -> None:
+        self.errors += 1
+        self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= 2:
+            # Back off exponentially while a route keeps failing
+            self.cooldown_until = time.monotonic() + min(cooldown * 2 ** (self.consecutive_errors - 2), 600)
+
+    def p95(self) -> Optional[float]:
+        # Too few samples make a meaningless percentile
+        return percentile(list(self.samples), 95) if len(self.samples) >= 5 else None
+
+    def score(self) -> float:
+        """Expected latency, penalized by the error rate; untried routes come first"""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 4 * self.error_rate) * (1 + 0.5 * self.in_flight)
+
+
+class LLMRouter:
+    """
+    Routes chat completions over several `LLMAPIClient`s
+
+    Args:
+        clients: One client per provider/model, the first is the default route
+        hedge: Send a duplicate request to the next route after the p95 latency (default: False)
+        hedge_min_delay: Lower bound of the hedge delay in seconds (default: 1.0)
+        cooldown: Seconds a route is skipped after two consecutive errors, doubled for every further one (default: 30)
+    """
+
+    def __init__(self, clients: List[LLMAPIClient], hedge: bool = False, hedge_min_delay: float = 1.0, cooldown: float = 30.0):
+        if not clients:
+            raise ValueError("LLMRouter needs at least one client")
+        self.clients = clients
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.cooldown = cooldown
+        self.routes = [self.route_name(client) for client in clients]
+        self._stats = {name: RouteStats() for name in self.routes}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def route_name(client: LLMAPIClient) -> str:
+        return f"{client.config.provider.value}:{client.config.model}"
+
+    @property
+    def config(self) -> APIConfig:
+        """Configuration of the default route, its model keys the response cache"""
+        return self.clients[0].config
+
+    def ranked(self) -> List[int]:
+        """Route indexes from best to worst, routes in cooldown last"""
+        now = time.monotonic()
+        with self._lock:
+            keys = []
+            for i, name in enumerate(self.routes):
+                stats = self._stats[name]
+                keys.append((stats.cooldown_until > now, stats.score(), i))
+        return [i for _, _, i in sorted(keys)]
+
+    def hedge_delay(self, index: int) -> Optional[float]:
+        if not self.hedge or len(self.clients) < 2:
+            return None
+        with self._lock:
+            p95 = self._stats[self.routes[index]].p95()
+        return max(self.hedge_min_delay, p95) if p95 is not None else None
+
+    def _started(self, index: int) -> None:
+        with self._lock:
+            stats = self._stats[self.routes[index]]
+            stats.requests += 1
+            stats.in_flight += 1
+
+    def _finished(self, index: int, latency: Optional[float], error: bool = False, won: bool = False, hedged: bool = False) -> None:
+        """Record the outcome of one request; without latency and error only the in-flight count changes"""
+        with self._lock:
+            stats = self._stats[self.routes[index]]
+            stats.in_flight -= 1
+            if error:
+                stats.failure(self.cooldown)
+            elif latency is not None:
+                stats.success(latency)
+            stats.wins += 1 if won else 0
+            stats.hedges += 1 if hedged else 0
+
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> "RoutedStream":
+        """
+        Send a streaming chat completion request to the best route
+
+        Returns:
+            RoutedStream yielding the text deltas of the winning route
+        """
+        return RoutedStream(self, messages, temperature, max_tokens, kwargs)
+
+    def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Send a chat completion request, failing over to the next route on errors
+
+        The response is in the format of the route that answered, use
+        `extract_response_content` of the router to read it.
+        """
+        last_error: Optional[Exception] = None
+        for index in self.ranked():
+            self._started(index)
+            started = time.monotonic()
+            try:
+                response = self.clients[index].chat_completion(messages, temperature, max_tokens, **kwargs)
+            except Exception as e:
+                self._finished(index, None, error=True)
+                print(f"Warning: route {self.routes[index]} failed: {e}")
+                last_error = e
+                continue
+            self._finished(index, time.monotonic() - started, won=True)
+            response["_route"] = index
+            return response
+        raise last_error
+
+    def extract_response_content(self, response: Dict[str, Any]) -> str:
+        return self.clients[response.get("_route", 0)].extract_response_content(response)
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "route": name,
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "wins": stats.wins,
+                    "hedges": stats.hedges,
+                    "latency": stats.latency,
+                    "p95": stats.p95(),
+                    "error_rate": stats.error_rate,
+                }
+                for name, stats in self._stats.items()
+            ]
+
+    def summary(self) -> str:
+        lines = [f"{'route':<40} {'req':>5} {'err':>5} {'win':>5} {'hedge':>6} {'ewma s':>7} {'p95 s':>7} {'err %':>6}"]
+        for row in self.stats():
+            latency = f"{row['latency']:.2f}" if row["latency"] is not None else "-"
+            p95 = f"{row['p95']:.2f}" if row["p95"] is not None else "-"
+            lines.append(
+                f"{row['route']:<40} {row['requests']:>5} {row['errors']:>5} {row['wins']:>5} {row['hedges']:>6} "
+                f"{latency:>7} {p95:>7} {row['error_rate'] * 100:>6.1f}"
+            )
+        return "\n".join(lines)
+
+
+class _Attempt:
+    """One request of a routed stream, iterated by a background thread"""
+
+    def __init__(self, index: int, hedged: bool):
+        self.index = index
+        self.hedged = hedged
+        self.started = time.monotonic()
+        self.stream = None
+        self.cancelled = False
+        self.finished = False
+        self.first_token: Optional[float] = None
+
+
+class RoutedStream:
+    """
+    Streaming response of an `LLMRouter`, with the `ChatStream` interface
+
+    Every attempt pushes `(attempt, kind, value)` events into one queue; the
+    first attempt to deliver text wins and the others are cancelled.
+    """
+
+    def __init__(self, router: LLMRouter, messages, temperature, max_tokens, kwargs):
+        self._router = router
+        self._request = (messages, temperature, max_tokens, kwargs)
+        self._events: "queue.Queue" = queue.Queue()
+        self._attempts: List[_Attempt] = []
+        self.text = ""
+        self.finish_reason: Optional[str] = None
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+        # Route that answered and its model, and whether a hedged request was sent
+        self.route: Optional[str] = None
+        self.model: Optional[str] = None
+        self.hedged = False
+        self._truncated = False
+
+    @property
+    def truncated(self) -> bool:
+        return self._truncated
+
+    def _launch(self, index: int, hedged: bool = False) -> _Attempt:
+        attempt = _Attempt(index, hedged)
+        self._attempts.append(attempt)
+        self._router._started(index)
+        threading.Thread(target=self._run, args=(attempt,), name=f"route-{self._router.routes[index]}", daemon=True).start()
+        return attempt
+
+    def _run(self, attempt: _Attempt) -> None:
+        messages, temperature, max_tokens, kwargs = self._request
+        try:
+            attempt.stream = self._router.clients[attempt.index].stream_chat_completion(messages, temperature, max_tokens, **kwargs)
+            if attempt.cancelled:
+                attempt.stream.close()
+                return
+            for delta in attempt.stream:
+                if attempt.cancelled:
+                    break
+                self._events.put((attempt, "delta", delta))
+            self._events.put((attempt, "end", None))
+        except Exception as e:
+            self._events.put((attempt, "error", e))
+
+    def _finish(self, attempt: _Attempt, latency: Optional[float] = None, error: bool = False, won: bool = False) -> None:
+        """Stop an attempt and record its outcome once"""
+        attempt.cancelled = True
+        if attempt.stream is not None:
+            # Closing the response interrupts the blocked read of its thread
+            try:
+                attempt.stream.close()
+            except Exception:
+                pass
+        if not attempt.finished:
+            attempt.finished = True
+            self._router._finished(attempt.index, latency, error=error, won=won, hedged=attempt.hedged)
+
+    def __iter__(self) -> Iterator[str]:
+        router = self._router
+        order = router.ranked()
+        next_route = 0
+        running: List[_Attempt] = []
+        last_error: Optional[Exception] = None
+
+        def launch_next(hedged: bool = False) -> None:
+            nonlocal next_route
+            running.append(self._launch(order[next_route], hedged))
+            next_route += 1
+
+        launch_next()
+        try:
+            # Wait for the first text of any attempt
+            while True:
+                hedge = len(running) == 1 and next_route < len(order)
+                delay = router.hedge_delay(running[0].index) if hedge else None
+                try:
+                    attempt, kind, value = self._events.get(timeout=delay)
+                except queue.Empty:
+                    # No text within the p95 latency of the route, race a duplicate request
+                    self.hedged = True
+                    launch_next(hedged=True)
+                    continue
+                if attempt.cancelled:
+                    continue
+                if kind == "error":
+                    running.remove(attempt)
+                    self._finish(attempt, error=True)
+                    last_error = value
+                    print(f"Warning: route {router.routes[attempt.index]} failed: {value}")
+                    if not running:
+                        if next_route >= len(order):
+                            raise last_error
+                        launch_next()
+                    continue
+                break
+
+            winner = attempt
+            winner.first_token = time.monotonic() - winner.started
+            self.route = router.routes[winner.index]
+            self.model = router.clients[winner.index].config.model
+            for other in running:
+                if other is not winner:
+                    # The loser is cut off before its first text, so its latency is unknown;
+                    # recording the elapsed time would pull the slow route's average down
+                    self._finish(other)
+
+            while kind != "end":
+                if kind == "delta":
+                    self.text += value
+                    yield value
+                attempt, kind, value = self._events.get()
+                while attempt is not winner:
+                    attempt, kind, value = self._events.get()
+                if kind == "error":
+                    self._finish(winner, error=True)
+                    raise value
+
+            stream = winner.stream
+            self.finish_reason = stream.finish_reason
+            self._truncated = stream.truncated
+            self.input_tokens = stream.input_tokens
+            self.output_tokens = stream.output_tokens
+            self.cached_tokens = stream.cached_tokens
+            self._finish(winner, winner.first_token, won=True)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for attempt in self._attempts:
+            self._finish(attempt)
+
+
+def load_router(file: Path) -> LLMRouter:
+    """
+    Build a router from a JSON file
+
+    Format:
+        {"hedge": true, "routes": [{"provider": "openai", "model": "gpt-4o-mini",
+          "base_url": "https://api.openai.com/v1", "api_key_env": "OPENAI_API_KEY"}, ...]}
+
+    `api_key` may be given instead of `api_key_env`; `temperature`, `max_tokens`,
+    `timeout` and `max_retries` are passed to `APIConfig`.
+    """
+    with open(file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    clients = []
+    for route in data["routes"]:
+        provider = APIProvider(route["provider"])
+        api_key = route.get("api_key") or os.environ.get(route.get("api_key_env", ""), "")
+        if not api_key:
+            raise ValueError(f"No API key for route {route['provider']}:{route.get('model')}, set {route.get('api_key_env') or 'api_key'}")
+        config = APIConfig(provider=provider, api_key=api_key, base_url="", model=route.get("model", ""))
+        for key in ("temperature", "max_tokens", "timeout", "max_retries"):
+            if key in route:
+                setattr(config, key, route[key])
+        client = LLMAPIClient(config)
+        config.base_url = route.get("base_url") or client._get_default_base_url(provider)
+        config.model = config.model or client._get_default_model(provider)
+        clients.append(client)
+    return LLMRouter(
+        clients,
+        hedge=data.get("hedge", False),
+        hedge_min_delay=data.get("hedge_min_delay", 1.0),
+        cooldown=data.get("cooldown", 30.0)
+    )
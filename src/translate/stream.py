@@ -0,0 +1,165 @@
+"""
+Streaming helpers for translation requests
+
+`JsonObjectStreamParser` turns streamed text deltas into JSON object members as
+soon as each one is complete, so a truncated response still yields its completed
+prefix. `open_stream` gives the Anthropic SDK client and `LLMAPIClient` the same
+streaming interface, optionally replayed from or recorded into a `ResponseCache`.
+"""
+
+import json
+from typing import Any, Iterator, List, Optional, Tuple
+
+from .cache import CachedStream, RecordingStream, ResponseCache, cache_key
+
+
+class JsonObjectStreamParser:
+    """
+    Incremental parser for a streamed JSON object
+
+    Text before the opening `{` is skipped. Each call to `feed` returns the
+    `(key, value)` pairs completed by the new text.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self.started = False
+        self.finished = False
+        self.count = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        if self.finished:
+            return []
+        self._buffer += text
+        if not self.started:
+            start = self._buffer.find("{")
+            if start < 0:
+                return []
+            self._buffer = self._buffer[start + 1:]
+            self.started = True
+
+        pairs = []
+        pos = 0
+        buffer = self._buffer
+        while True:
+            # Skip whitespace and separators between members
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "}":
+                self.finished = True
+                pos += 1
+                break
+            try:
+                key, end = self._decoder.raw_decode(buffer, pos)
+                while end < len(buffer) and buffer[end] in " \t\r\n":
+                    end += 1
+                if end >= len(buffer):
+                    break
+                if buffer[end] != ":":
+                    raise ValueError(f"Expected ':' after object key at {end}")
+                end += 1
+                while end < len(buffer) and buffer[end] in " \t\r\n":
+                    end += 1
+                value, end = self._decoder.raw_decode(buffer, end)
+            except json.JSONDecodeError:
+                # Member not complete yet
+                break
+            if end >= len(buffer) and not isinstance(value, (str, list, dict)):
+                # A number or literal may continue in the next delta
+                break
+            pairs.append((str(key), value))
+            pos = end
+        self._buffer = buffer[pos:]
+        self.count += len(pairs)
+        return pairs
+
+
+class AnthropicStream:
+    """Adapts `anthropic.Anthropic().messages.stream(...)` to the `ChatStream` interface"""
+
+    def __init__(self, api_client, model: str, prompt: str, max_tokens: int):
+        self._manager = api_client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        self._stream = None
+        self.text = ""
+        self.finish_reason: Optional[str] = None
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.finish_reason == "max_tokens"
+
+    def __iter__(self) -> Iterator[str]:
+        self._stream = self._manager.__enter__()
+        try:
+            for delta in self._stream.text_stream:
+                self.text += delta
+                yield delta
+            message = self._stream.get_final_message()
+            self.finish_reason = message.stop_reason
+            usage = getattr(message, "usage", None)
+            if usage is not None:
+                self.input_tokens = usage.input_tokens
+                self.output_tokens = usage.output_tokens
+                self.cached_tokens = getattr(usage, "cache_read_input_tokens", None)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream = None
+            self._manager.__exit__(None, None, None)
+
+
+def open_stream(api_client, model: str, prompt: str, max_tokens: int, cache: Optional[ResponseCache] = None):
+    """
+    Start a streaming request with either an Anthropic SDK client or an `LLMAPIClient`
+
+    Args:
+        cache: Response cache replaying identical requests and recording new ones (default: None)
+
+    Returns:
+        Iterable of text deltas exposing `text`, `truncated`, token usage and `close()`
+    """
+    messages = [{"role": "user", "content": prompt}]
+    key = None
+    if cache is not None and cache.mode != "off":
+        config = getattr(api_client, "config", None)
+        params = {"max_tokens": max_tokens}
+        if config is not None:
+            params["provider"] = config.provider.value
+            params["temperature"] = config.temperature
+        model = client_model_name(api_client, model)
+        key = cache_key(model, params, messages)
+        cached = cache.get(key)
+        if cached is not None:
+            return CachedStream(cached)
+
+    if hasattr(api_client, "stream_chat_completion"):
+        stream = api_client.stream_chat_completion(messages, max_tokens=max_tokens)
+    else:
+        stream = AnthropicStream(api_client, model, prompt, max_tokens)
+    if key is not None and cache.writable:
+        return RecordingStream(stream, cache, key, model)
+    return stream
+
+
+def client_model_name(api_client, default: str) -> str:
+    """Model name of a client, keys its cached responses"""
+    config = getattr(api_client, "config", None)
+    return getattr(config, "model", None) or default
+
+
+def stream_model_name(api_client, stream, default: str) -> str:
+    """Model name recorded as translation author, the route that answered for an `LLMRouter`"""
+    return getattr(stream, "model", None) or client_model_name(api_client, default)
@@ -0,0 +1,209 @@
+"""
+Per-chunk telemetry of translation runs
+
+Every processed chunk becomes one event appended to a JSONL file: queue wait,
+request latency, time to the first streamed text, token usage, retries,
+validation failures and applied items. `Telemetry` can also keep a Prometheus
+textfile (node_exporter textfile collector format) with running totals, and
+`summarize` aggregates events by table for `main.py translate-stats`.
+"""
+
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Name used for chunks of `translate --all`, which mix texts of several tables;
+# their events list the tables in `tables` and are summarized per table
+all_tables = "(all)"
+
+metric_prefix = "linkura_translate"
+
+
+class Telemetry:
+    """
+    Collects chunk events of one translation run
+
+    Args:
+        jsonl_file: File the events are appended to (default: None, keep in memory only)
+        prometheus_file: Prometheus textfile rewritten after every chunk (default: None)
+    """
+
+    def __init__(self, jsonl_file: Optional[Path] = None, prometheus_file: Optional[Path] = None):
+        self.jsonl_file = Path(jsonl_file) if jsonl_file else None
+        self.prometheus_file = Path(prometheus_file) if prometheus_file else None
+        self.run_id = uuid.uuid4().hex[:12]
+        self.events: List[dict] = []
+        # Running Prometheus totals per table, updated with every event
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, table: str, **fields) -> dict:
+        """Record one chunk event, returns the event"""
+        event = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "run": self.run_id,
+            "table": table,
+        }
+        event.update(fields)
+        self.events.append(event)
+        if self.jsonl_file:
+            self.jsonl_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.jsonl_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        for table, part in split_by_table(event):
+            table_totals = self._totals.setdefault(table, {})
+            for key, metric in (
+                ("applied", "items_applied_total"),
+                ("input_tokens", "input_tokens_total"),
+                ("output_tokens", "output_tokens_total"),
+                ("cached_tokens", "cached_tokens_total"),
+                ("retries", "retries_total"),
+                ("validation_failures", "validation_failures_total"),
+                ("latency_share", "request_latency_seconds_sum"),
+                ("queue_wait_share", "queue_wait_seconds_sum"),
+                ("chunks", "chunks_total"),
+                ("truncated_chunks", "truncated_chunks_total"),
+            ):
+                table_totals[metric] = table_totals.get(metric, 0) + part[key]
+        if self.prometheus_file:
+            self.write_prometheus()
+        return event
+
+    def write_prometheus(self) -> None:
+        """Rewrite the textfile atomically with the totals of this run, per table like `summarize`"""
+        totals = self._totals
+        lines = []
+        metrics = sorted({metric for table_totals in totals.values() for metric in table_totals})
+        for metric in metrics:
+            name = f"{metric_prefix}_{metric}"
+            lines.append(f"# TYPE {name} {'counter' if metric.endswith(('_total', '_sum')) else 'gauge'}")
+            for table, table_totals in sorted(totals.items()):
+                if metric in table_totals:
+                    lines.append(f'{name}{{table="{table}"}} {table_totals[metric]:g}')
+        lines.append(f"# TYPE {metric_prefix}_last_chunk_timestamp_seconds gauge")
+        lines.append(f"{metric_prefix}_last_chunk_timestamp_seconds {time.time():.0f}")
+
+        self.prometheus_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.prometheus_file.with_name(self.prometheus_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_file, self.prometheus_file)
+
+
+def load_events(jsonl_file: Path) -> List[dict]:
+    """Read the events of a telemetry file, skipping broken lines"""
+    events = []
+    with open(jsonl_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Linear interpolation percentile, `p` between 0 and 100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def split_by_table(event: dict) -> Iterator[Tuple[str, dict]]:
+    """
+    `(table, part)` parts of a chunk event, whose counters add up to the event
+
+    A chunk mixing several tables (`tables`: `{table: {"items", "applied"}}`) is
+    shared by the tables in proportion to their part of the chunk's texts: each
+    part has the table's applied texts, and the chunk itself (`chunks`,
+    `truncated_chunks`, `error_chunks`), its tokens, retries, validation failures,
+    latency and queue wait (`latency_share`, `queue_wait_share`) scaled by that
+    share. `latency` stays the whole chunk latency for percentiles, since every
+    text waited for it. A chunk of one table is one part with share 1.
+    """
+    tables = event.get("tables") or {event.get("table", ""): {"items": 1, "applied": event.get("applied") or 0}}
+    total = sum(counts["items"] for counts in tables.values()) or 1
+    for table, counts in tables.items():
+        share = counts["items"] / total
+        part = dict(event, applied=counts["applied"], share=share)
+        for key in ("input_tokens", "output_tokens", "cached_tokens", "retries", "validation_failures"):
+            part[key] = (event.get(key) or 0) * share
+        part["latency_share"] = (event.get("latency") or 0) * share
+        part["queue_wait_share"] = (event.get("queue_wait") or 0) * share
+        part["chunks"] = share
+        part["truncated_chunks"] = share if event.get("truncated") else 0
+        part["error_chunks"] = share if event.get("error") else 0
+        yield table, part
+
+
+def _count(value: float):
+    # Counters shared by several tables are fractional, whole ones stay integers
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+
+def summarize(events: Iterable[dict]) -> List[dict]:
+    """
+    Aggregate chunk events by table, chunks of several tables are shared out by `split_by_table`
+    so the rows add up to the chunks, retries and failures that happened
+
+    Returns:
+        One row per table, sorted by total latency descending
+    """
+    groups: Dict[str, List[dict]] = {}
+    for event in events:
+        for table, part in split_by_table(event):
+            groups.setdefault(table, []).append(part)
+
+    rows = []
+    for table, parts in groups.items():
+        latencies = [part.get("latency") or 0 for part in parts]
+        applied = sum(part["applied"] for part in parts)
+        chunks = sum(part["chunks"] for part in parts)
+        input_tokens = sum(part["input_tokens"] for part in parts)
+        output_tokens = sum(part["output_tokens"] for part in parts)
+        cached_tokens = sum(part["cached_tokens"] for part in parts)
+        rows.append({
+            "table": table,
+            "chunks": _count(chunks),
+            "applied": applied,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_total": sum(part["latency_share"] for part in parts),
+            "queue_wait_mean": sum(part["queue_wait_share"] for part in parts) / chunks if chunks else 0.0,
+            "input_per_item": input_tokens / applied if applied else 0.0,
+            "output_per_item": output_tokens / applied if applied else 0.0,
+            "cached_ratio": cached_tokens / input_tokens if input_tokens else 0.0,
+            "retries": _count(sum(part["retries"] for part in parts)),
+            "validation_failures": _count(sum(part["validation_failures"] for part in parts)),
+            "truncated": _count(sum(part["truncated_chunks"] for part in parts)),
+            "errors": _count(sum(part["error_chunks"] for part in parts)),
+        })
+    rows.sort(key=lambda row: -row["latency_total"])
+    return rows
+
+
+def format_summary(rows: List[dict]) -> str:
+    if not rows:
+        return "No telemetry events"
+    lines = [
+        f"{'table':<32} {'chunks':>6} {'items':>7} {'p50 s':>7} {'p95 s':>7} {'wait s':>7} "
+        f"{'in/item':>8} {'out/item':>8} {'cached':>7} {'retry':>6} {'invalid':>7} {'trunc':>6}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['table']:<32} {row['chunks']:>6g} {row['applied']:>7} {row['latency_p50']:>7.1f} "
+            f"{row['latency_p95']:>7.1f} {row['queue_wait_mean']:>7.1f} {row['input_per_item']:>8.1f} "
+            f"{row['output_per_item']:>8.1f} {row['cached_ratio']:>7.0%} {row['retries']:>6g} "
+            f"{row['validation_failures']:>7g} {row['truncated']:>6g}"
+        )
+    return "\n".join(lines)
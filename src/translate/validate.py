@@ -0,0 +1,30 @@
+"""
+Local checks of model translations before they are written
+"""
+
+import re
+from collections import Counter
+from typing import Any, Optional
+
+# Markup that must survive translation unchanged: `$10$` style values, `{0}` placeholders and line breaks
+markup_pattern = re.compile(r"\$[^$\n]*\$|\{\d+\}|<br>")
+
+
+def validate_translation(raw: str, translated: Any) -> Optional[str]:
+    """
+    Check one translation against its raw text
+
+    Returns:
+        Reason the translation is rejected, or None if it is acceptable
+    """
+    if not isinstance(translated, str):
+        return f"not a string: {type(translated).__name__}"
+    if not translated.strip():
+        return "empty translation"
+    raw_markup = Counter(markup_pattern.findall(raw))
+    translated_markup = Counter(markup_pattern.findall(translated))
+    if raw_markup != translated_markup:
+        missing = list((raw_markup - translated_markup).elements())
+        extra = list((translated_markup - raw_markup).elements())
+        return f"markup mismatch, missing {missing} extra {extra}"
+    return None
@@ -0,0 +1,431 @@
+"""
+Work queue sharing one translation job between several runners
+
+A coordinator builds the job once from the data directory: every unique raw
+text missing a target locale is stored in a SQLite database together with the
+prompt reference examples, grouped into leases of a fixed number of texts. The
+database only needs to be reachable by every runner, e.g. on an NFS mount
+(rollback journal, no WAL, so it works without shared memory).
+
+Runners claim one lease at a time with an expiry, translate its texts with
+their own API client and report translations after every chunk, which also
+renews the lease. A lease of a crashed runner expires and is claimed again, only
+its texts without a reported translation are sent again. Translations are keyed
+by (raw, locale) and the first report wins, so a late runner never duplicates
+or overwrites results. The coordinator finally merges all results into the
+tables in one pass.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from ..model.canonical import group_raws, variant_author
+from ..model.localization import I18nLanguage, TranslatedItem
+from ..model.storage import TranslationStore
+from . import as_languages, get_prompt, get_reference, translate_texts
+from .cache import ResponseCache
+from .telemetry import Telemetry, all_tables
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'pending',
+    runner TEXT,
+    expires REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_leases_state ON leases(state, expires);
+CREATE TABLE IF NOT EXISTS texts (
+    raw TEXT PRIMARY KEY,
+    lease_id INTEGER NOT NULL REFERENCES leases(id),
+    position INTEGER NOT NULL,
+    locales TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_texts_lease ON texts(lease_id, position);
+CREATE TABLE IF NOT EXISTS results (
+    raw TEXT NOT NULL,
+    locale TEXT NOT NULL,
+    text TEXT NOT NULL,
+    author TEXT NOT NULL,
+    runner TEXT NOT NULL,
+    reported REAL NOT NULL,
+    PRIMARY KEY (raw, locale)
+) WITHOUT ROWID;
+"""
+
+# Lease states
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_runner_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    SQLite database holding one translation job
+
+    Args:
+        db_file: Queue database, shared by the coordinator and all runners
+        timeout: Seconds to wait for the database lock held by another runner (default: 60)
+    """
+
+    def __init__(self, db_file: Path, timeout: float = 60):
+        self.db_file = Path(db_file)
+        self.conn = sqlite3.connect(str(self.db_file), timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two runners never
+        # read the same pending lease before one of them updates it
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @property
+    def locales(self) -> List[str]:
+        return json.loads(self.meta("locales", "[]"))
+
+    def create(self, needs: Dict[str, List[str]], locales: List[str], reference: str, lease_items: int) -> int:
+        """
+        Fill an empty queue with a job
+
+        Returns:
+            Number of leases
+        """
+        if self.meta("locales") is not None:
+            raise ValueError(f"Queue {self.db_file} already holds a job")
+        raws = list(needs)
+        lease_count = (len(raws) + lease_items - 1) // lease_items
+        self._transaction()
+        try:
+            self.conn.executemany("INSERT INTO meta(key, value) VALUES (?, ?)", [
+                ("locales", json.dumps(locales)),
+                ("reference", reference),
+                ("created", str(time.time())),
+            ])
+            self.conn.executemany("INSERT INTO leases(id) VALUES (?)", [(i,) for i in range(lease_count)])
+            self.conn.executemany(
+                "INSERT INTO texts(raw, lease_id, position, locales) VALUES (?, ?, ?, ?)",
+                [(raw, i // lease_items, i, ",".join(needs[raw])) for i, raw in enumerate(raws)]
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return lease_count
+
+    def claim(self, runner: str, lease_seconds: float) -> Optional[int]:
+        """Claim the next pending or expired lease, returns its id or None when nothing is left"""
+        now = time.time()
+        self._transaction()
+        try:
+            row = self.conn.execute(
+                "SELECT id FROM leases WHERE state = ? OR (state = ? AND expires < ?) ORDER BY attempts, id LIMIT 1",
+                (PENDING, LEASED, now)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE leases SET state = ?, runner = ?, expires = ? WHERE id = ?",
+                (LEASED, runner, now + lease_seconds, row[0])
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return row[0]
+
+    def needs(self, lease_id: int) -> Dict[str, List[str]]:
+        """Texts of a lease with the locales that have no reported translation yet"""
+        reported: Dict[str, set] = {}
+        for raw, locale in self.conn.execute(
+            "SELECT r.raw, r.locale FROM results r JOIN texts t ON t.raw = r.raw WHERE t.lease_id = ?",
+            (lease_id,)
+        ):
+            reported.setdefault(raw, set()).add(locale)
+        needs = {}
+        for raw, locales in self.conn.execute(
+            "SELECT raw, locales FROM texts WHERE lease_id = ? ORDER BY position", (lease_id,)
+        ):
+            missing = [locale for locale in locales.split(",") if locale not in reported.get(raw, ())]
+            if missing:
+                needs[raw] = missing
+        return needs
+
+    def report(self, lease_id: int, runner: str, results: List[Tuple[str, str, str, str]], lease_seconds: float) -> int:
+        """
+        Store `(raw, locale, text, author)` results and renew the lease if the runner still holds it
+
+        Returns:
+            Number of new results, translations reported earlier by any runner are kept
+        """
+        now = time.time()
+        self._transaction()
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO results(raw, locale, text, author, runner, reported) VALUES (?, ?, ?, ?, ?, ?)",
+                [(raw, locale, text, author, runner, now) for raw, locale, text, author in results]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute(
+                "UPDATE leases SET expires = ? WHERE id = ? AND runner = ? AND state = ?",
+                (now + lease_seconds, lease_id, runner, LEASED)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def release(self, lease_id: int, runner: str, max_attempts: int) -> str:
+        """Finish a lease: done when every text has all its translations, otherwise pending again or failed"""
+        self._transaction()
+        try:
+            complete = not self.needs(lease_id)
+            state, holder, attempts = self.conn.execute(
+                "SELECT state, runner, attempts FROM leases WHERE id = ?", (lease_id,)
+            ).fetchone()
+            # An expired lease claimed by another runner stays with that runner unless it is complete
+            if complete or (state == LEASED and holder == runner):
+                attempts += 0 if complete else 1
+                state = DONE if complete else (FAILED if attempts >= max_attempts else PENDING)
+                self.conn.execute(
+                    "UPDATE leases SET state = ?, attempts = ?, expires = 0, runner = ? WHERE id = ?",
+                    (state, attempts, runner, lease_id)
+                )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return state
+
+    def status(self) -> dict:
+        now = time.time()
+        states = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+        for state, expires, count in self.conn.execute("SELECT state, expires < ?, COUNT(*) FROM leases GROUP BY state, expires < ?", (now, now)):
+            # Expired leases are claimable again
+            states[PENDING if state == LEASED and expires else state] += count
+        texts, wanted = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(locales) - LENGTH(REPLACE(locales, ',', '')) + 1), 0) FROM texts"
+        ).fetchone()
+        runners = dict(self.conn.execute("SELECT runner, COUNT(*) FROM results GROUP BY runner ORDER BY runner"))
+        return {
+            "leases": states,
+            "texts": texts,
+            "translations": wanted,
+            "reported": sum(runners.values()),
+            "runners": runners,
+            "merged": self.meta("merged") is not None,
+        }
+
+    def results(self) -> Dict[str, Dict[str, Tuple[str, str]]]:
+        """`{raw: {locale: (text, author)}}` of every reported translation"""
+        results: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        for raw, locale, text, author in self.conn.execute("SELECT raw, locale, text, author FROM results"):
+            results.setdefault(raw, {})[locale] = (text, author)
+        return results
+
+    def mark_merged(self) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('merged', ?)", (str(time.time()),))
+
+
+def _index_tables(store: TranslationStore) -> Tuple[Dict[str, List[TranslatedItem]], Dict[str, List[Tuple[str, int]]]]:
+    tables: Dict[str, List[TranslatedItem]] = {}
+    index: Dict[str, List[Tuple[str, int]]] = {}
+    for table in store.tables():
+        tables[table] = store.load(table)
+        for position, item in enumerate(tables[table]):
+            index.setdefault(item.raw, []).append((table, position))
+    return tables, index
+
+
+def init_queue(queue: WorkQueue, store: TranslationStore, target_language: Union[I18nLanguage, Sequence[I18nLanguage]], lease_items: int = 48) -> Tuple[int, int]:
+    """
+    Create the job of a queue from the tables of a store
+
+    Raw texts translated in some table are left out, `merge_queue` copies those
+    translations to their untranslated occurrences like `translate_all`. Width and
+    spacing variants (same `canonical_key`) are queued once, as their first raw text.
+
+    Returns:
+        (number of unique texts, number of leases)
+    """
+    languages = as_languages(target_language)
+    locale_keys = [language.value for language in languages]
+    tables, index = _index_tables(store)
+
+    needs: Dict[str, List[str]] = {}
+    for raws in group_raws(index).values():
+        locations = [location for raw in raws for location in index[raw]]
+        for locale_key in locale_keys:
+            if not any(tables[table][position].has_text(locale_key) for table, position in locations):
+                needs.setdefault(raws[0], []).append(locale_key)
+
+    reference = get_reference([item for items in tables.values() for item in items], languages)
+    lease_count = queue.create(needs, locale_keys, reference, lease_items)
+    return len(needs), lease_count
+
+
+def run_queue(
+    api_client,
+    queue: WorkQueue,
+    runner: Optional[str] = None,
+    chunk_size: int = 24,
+    lease_seconds: float = 600,
+    max_attempts: int = 3,
+    telemetry: Optional[Telemetry] = None,
+    cache: Optional[ResponseCache] = None,
+    max_failures: int = 3
+) -> int:
+    """
+    Claim and translate leases until none is left
+
+    Translations are reported after every chunk. A lease that raises or translates
+    nothing is released, which charges it an attempt (failed after `max_attempts`),
+    and the runner claims the next one; only after `max_failures` such leases in
+    a row the runner gives up, raising the last error if there was one.
+
+    Returns:
+        Number of translations reported by this runner
+    """
+    runner = runner or default_runner_id()
+    locales = queue.locales
+    languages = [I18nLanguage(locale) for locale in locales]
+    prompt = get_prompt(languages)
+    reference = queue.meta("reference", "")
+    reported = 0
+    failures = 0
+    last_error: Optional[Exception] = None
+
+    while True:
+        lease_id = queue.claim(runner, lease_seconds)
+        if lease_id is None:
+            break
+        needs = queue.needs(lease_id)
+        print(f"[{runner}] Claimed lease {lease_id} with {len(needs)} texts")
+        buffered: List[Tuple[str, str, str, str]] = []
+        translated_count = 0
+
+        def apply_item(raw: str, locale_key: str, translated: str, author: str) -> None:
+            nonlocal translated_count
+            translated_count += 1
+            buffered.append((raw, locale_key, translated, author))
+
+        def finish_chunk(chunk_idx: int, applied_count: int) -> None:
+            nonlocal reported
+            reported += queue.report(lease_id, runner, buffered, lease_seconds)
+            buffered.clear()
+
+        error: Optional[Exception] = None
+        try:
+            if needs:
+                translate_texts(
+                    api_client,
+                    needs,
+                    prompt,
+                    reference,
+                    chunk_size,
+                    apply_item,
+                    finish_chunk,
+                    locales,
+                    max_attempts=max_attempts,
+                    telemetry=telemetry,
+                    table=all_tables,
+                    cache=cache
+                )
+        except Exception as e:
+            error = e
+            print(f"[{runner}] Lease {lease_id} failed: {type(e).__name__}: {e}")
+        finally:
+            if buffered:
+                reported += queue.report(lease_id, runner, buffered, lease_seconds)
+            state = queue.release(lease_id, runner, max_attempts)
+            print(f"[{runner}] Lease {lease_id} {state}")
+
+        if error is not None or (needs and not translated_count):
+            failures += 1
+            last_error = error or last_error
+            if failures >= max_failures:
+                message = f"[{runner}] Giving up after {failures} failed leases in a row"
+                if last_error is not None:
+                    raise RuntimeError(message) from last_error
+                print(message)
+                return reported
+        else:
+            failures = 0
+            last_error = None
+
+    print(f"[{runner}] No leases left, reported {reported} translations")
+    return reported
+
+
+def merge_queue(queue: WorkQueue, store: TranslationStore) -> Tuple[int, int]:
+    """
+    Write the reported translations into every occurrence of their raw text
+
+    Untranslated duplicates and variants of texts translated in another table get
+    that translation, variants as `variant_author`. Only missing translations are filled, so merging twice is harmless.
+
+    Returns:
+        (number of written translations, number of copied translations)
+    """
+    locales = queue.locales
+    results = queue.results()
+    tables, index = _index_tables(store)
+    written = 0
+    copied = 0
+    for raws in group_raws(index).values():
+        locations = [(raw, table, position) for raw in raws for table, position in index[raw]]
+        for locale in locales:
+            missing = [(raw, table) for raw, table, position in locations if not tables[table][position].has_text(locale)]
+            if not missing:
+                continue
+            if len(missing) < len(locations):
+                sources = [(raw, tables[table][position]) for raw, table, position in locations if tables[table][position].has_text(locale)]
+                for raw, table in missing:
+                    # A duplicate keeps the author of the same raw text, a variant gets `variant_author`
+                    source = next((item for source_raw, item in sources if source_raw == raw), None)
+                    if source is not None:
+                        store.set_translation(table, raw, locale, source.get_text(locale), source.get_author(locale))
+                    else:
+                        store.set_translation(table, raw, locale, sources[0][1].get_text(locale), variant_author)
+                copied += len(missing)
+                continue
+            # Reported for whichever variant was queued
+            result = next((results[raw][locale] for raw in raws if locale in results.get(raw, {})), None)
+            if result is None:
+                continue
+            text, author = result
+            written += len(missing)
+            for raw, table in missing:
+                store.set_translation(table, raw, locale, text, author)
+    store.flush()
+    queue.mark_merged()
+    return written, copied